@@ -0,0 +1,386 @@
+"""Микробенчмарки горячих участков обработки вакансий
+
+python bench.py              - все замеры
+python bench.py normalize    - только выбранные (keywords, categories, normalize, relevance)
+
+Тексты берутся из БД (таблица vacancies), если она недоступна - из локального
+кэша деталей, в крайнем случае генерируются синтетические описания.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+import zlib
+from config import CACHE_CONFIG, CATEGORIES, KEYWORDS, PIPELINE_CONFIG
+from keyword_matcher import ahocorasick
+from category_rules import CategoryRules
+from text_normalizer import html_to_text, normalize_text
+from main import (HHParser, HIGH_PRIORITY_KEYWORDS, LOW_PRIORITY_KEYWORDS, RULES, SCORER,
+                  MEDIUM_PRIORITY_KEYWORDS, TARGET_KEYWORDS)
+import hh_parser_tym
+
+
+def load_samples(limit=2000):
+    """-> (источник, [{'name', 'description', 'skills'}])"""
+    try:
+        from storage import VACANCY_DETAILS_JOIN, connection
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT v.name, COALESCE(d.description, ''), COALESCE(d.skills, '')
+                FROM {VACANCY_DETAILS_JOIN}
+                WHERE d.description <> ''
+                ORDER BY v.id DESC
+                LIMIT %s
+            """, (limit,))
+            rows = cursor.fetchall()
+            cursor.close()
+        if rows:
+            return 'БД', [{'name': n, 'description': d, 'skills': s} for n, d, s in rows]
+    except Exception as e:
+        print(f"⚠️ БД недоступна ({e}), пробуем кэш деталей")
+
+    cache_path = os.path.join(CACHE_CONFIG['dir'], 'vacancy_details.sqlite')
+    if os.path.exists(cache_path):
+        conn = sqlite3.connect(cache_path)
+        bodies = conn.execute("SELECT body FROM details LIMIT ?", (limit,)).fetchall()
+        conn.close()
+        samples = []
+        for (body,) in bodies:
+            detail = json.loads(zlib.decompress(body))
+            samples.append({
+                'name': detail.get('name', ''),
+                'description': detail.get('description', ''),
+                'skills': ', '.join(s['name'] for s in detail.get('key_skills', []))
+            })
+        if samples:
+            return 'кэш деталей', samples
+
+    return 'синтетика', synthetic_samples(limit)
+
+
+def synthetic_samples(count, seed=42):
+    """Описания из ключевых слов конфига вперемешку с обычным текстом"""
+    rng = random.Random(seed)
+    filler = ('мы ищем в команду сотрудника опыт работы приветствуется задачи обязанности '
+              'требования условия график офис компания развитие обучение').split()
+    vocabulary = KEYWORDS + [kw for rule in CATEGORIES.values() for kw in rule['keywords']]
+    samples = []
+    for _ in range(count):
+        words = [rng.choice(vocabulary) if rng.random() < 0.03 else rng.choice(filler)
+                 for _ in range(rng.randint(150, 400))]
+        samples.append({
+            'name': f"{rng.choice(vocabulary)} {rng.choice(filler)}",
+            'description': ' '.join(words),
+            'skills': ', '.join(rng.sample(vocabulary, 4))
+        })
+    return samples
+
+
+def measure(func, samples, repeat=3):
+    """Лучшее время из repeat прогонов func по всем образцам, сек"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for sample in samples:
+            func(sample)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(title, samples, variants):
+    """variants: [(подпись, func)] - первая строка считается базой для сравнения"""
+    print(f"\n⏱️ {title} ({len(samples)} вакансий)")
+    baseline = None
+    for label, func in variants:
+        elapsed = measure(func, samples)
+        baseline = baseline or elapsed
+        print(f"  {label:40} {elapsed * 1000:9.1f} мс | {len(samples) / elapsed:9.0f} вак/сек "
+              f"| x{baseline / elapsed:.2f}")
+
+
+# --- keywords: циклы `kw in text` против одного прохода автомата -------------
+
+def legacy_main_keywords(vacancy):
+    """main.py до автомата: фильтр по названию, категория и релевантность отдельными циклами"""
+    title = vacancy['name'].lower()
+    any(keyword in title for keyword in TARGET_KEYWORDS)
+
+    text = f" {title} {vacancy['description'].lower()} {vacancy['skills'].lower()} "
+    for category_name, category_data in sorted(CATEGORIES.items(), key=lambda x: x[1]['priority']):
+        has_keywords = any(f' {kw} ' in text for kw in category_data['keywords'])
+        has_exclude = any(f' {kw} ' in text for kw in category_data.get('exclude', []))
+        if has_keywords and not has_exclude:
+            break
+
+    score = 0
+    for tier, weight in ((HIGH_PRIORITY_KEYWORDS, 3), (MEDIUM_PRIORITY_KEYWORDS, 2),
+                         (LOW_PRIORITY_KEYWORDS, 1)):
+        for keyword in tier:
+            if keyword in text:
+                score += weight
+    return score
+
+
+def legacy_tyumen_keywords(vacancy):
+    """hh_parser_tym.py до автомата: исключения по названию и уровень по описанию"""
+    name = vacancy['name'].lower()
+    any(excl in name for excl in hh_parser_tym.CONTEXT_EXCLUDE)
+    any(ctx in name for ctx in hh_parser_tym.ADMIN_CONTEXT_EXCLUDE)
+    any(level in name for level in hh_parser_tym.SENIOR_TERMS)
+    text = f"{name} {vacancy['description'].lower()}"
+    any(term in text for term in hh_parser_tym.IT_EXCLUDE_TERMS)
+    any(kw in text for kw in hh_parser_tym.BEGINNER_TERMS)
+    any(tech in text for tech in hh_parser_tym.IT_TECH_TERMS)
+
+
+def bench_keywords(samples):
+    parser = HHParser()
+    target = frozenset(kw.lower() for kw in TARGET_KEYWORDS)
+
+    def main_keywords(vacancy):
+        not target.isdisjoint(RULES.rules.matcher.find(vacancy['name']))
+        hits = parser.scan_vacancy(vacancy)
+        parser.categorize_vacancy(vacancy, hits)
+        return parser.calculate_relevance([vacancy], [hits])
+
+    matcher = hh_parser_tym.MATCHER
+
+    def tyumen_keywords(vacancy):
+        name_hits = matcher.find(vacancy['name'])
+        not name_hits.isdisjoint(hh_parser_tym.CONTEXT_EXCLUDE)
+        not name_hits.isdisjoint(hh_parser_tym.ADMIN_CONTEXT_EXCLUDE)
+        not name_hits.isdisjoint(hh_parser_tym.SENIOR_TERMS)
+        text_hits = matcher.find(f"{vacancy['name']} {vacancy['description']}")
+        not text_hits.isdisjoint(hh_parser_tym.IT_EXCLUDE_TERMS)
+        not text_hits.isdisjoint(hh_parser_tym.BEGINNER_TERMS)
+        not text_hits.isdisjoint(hh_parser_tym.IT_TECH_TERMS)
+
+    backend = 'pyahocorasick' if ahocorasick else 'чистый Python'
+    print(f"\n  автомат: {backend}, шаблонов main.py {len(RULES.rules.matcher.patterns)}, "
+          f"hh_parser_tym.py {len(matcher.patterns)}")
+    report("Ключевые слова main.py", samples, [
+        ("циклы kw in text", legacy_main_keywords),
+        ("автомат Ахо-Корасик", main_keywords),
+    ])
+    report("Ключевые слова hh_parser_tym.py", samples, [
+        ("циклы kw in text", legacy_tyumen_keywords),
+        ("автомат Ахо-Корасик", tyumen_keywords),
+    ])
+
+
+# --- categories: categorize_vacancy до и после компиляции правил ---------------
+
+def legacy_categorize(vacancy):
+    """categorize_vacancy до CategoryRules: импорт и сортировка CATEGORIES на каждый вызов"""
+    text = f" {vacancy['name'].lower()} {vacancy['description'].lower()} {vacancy['skills'].lower()} "
+
+    from config import CATEGORIES
+    for category_name, category_data in sorted(CATEGORIES.items(), key=lambda x: x[1]['priority']):
+        has_keywords = any(f' {kw} ' in text for kw in category_data['keywords'])
+        has_exclude = any(f' {kw} ' in text for kw in category_data.get('exclude', []))
+        if has_keywords and not has_exclude:
+            return category_name
+    return 'other'
+
+
+def bench_categories(samples):
+    rules = CategoryRules(CATEGORIES)
+    texts = {id(v): f"{v['name']} {v['description']} {v['skills']}" for v in samples}
+    words_by_id = {id(v): rules.scan(texts[id(v)])[1] for v in samples}
+
+    def compiled(vacancy):
+        return rules.categorize(rules.scan(texts[id(vacancy)])[1])
+
+    def compiled_with_refresh(vacancy):
+        RULES.refresh()
+        return rules.categorize(rules.scan(texts[id(vacancy)])[1])
+
+    def categorize_only(vacancy):
+        return rules.categorize(words_by_id[id(vacancy)])
+
+    report("Категоризация CATEGORIES", samples, [
+        ("импорт + сортировка + f' {kw} ' in text", legacy_categorize),
+        ("CategoryRules: scan + categorize", compiled),
+        ("  то же + RULES.refresh()", compiled_with_refresh),
+        ("  только categorize по готовым словам", categorize_only),
+    ])
+
+    started = time.perf_counter()
+    CategoryRules(CATEGORIES, *RULES.extra_keyword_lists)
+    print(f"  пересборка правил при изменении: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    changed = sum(1 for v in samples if legacy_categorize(v) != compiled(v))
+    print(f"  категория изменилась (границы слов по знакам препинания): {changed} из {len(samples)}")
+
+
+# --- normalize: цепочка clean_* против одного прохода -------------------------
+
+def legacy_clean_text(text):
+    text = text.encode('utf-8', 'ignore').decode('utf-8')
+    return re.sub(r'[^\w\s\.\,\-\+\!\?\:\;\(\)\"\']', '', text).strip()
+
+
+def legacy_clean_text_safe(text, max_length=2000):
+    text = text.encode('utf-8', 'ignore').decode('utf-8')
+    cleaned = re.sub(r'[^\w\s\.\,\-\+\!\?\(\)\:\;\@\#\%\&\=\*\\\/]', '', text)
+    cleaned = re.sub(r'\s+', ' ', cleaned)
+    return cleaned.strip()[:max_length]
+
+
+def legacy_clean_html_tags(text):
+    text = re.sub(r'(\w+)>', r'<\1>', text)
+    clean_text = re.sub(r'</?[^>]*>', '', text)
+    for entity, replacement in {'&nbsp;': ' ', '&amp;': '&', '&lt;': '<',
+                                '&gt;': '>', '&quot;': '"', '&apos;': "'"}.items():
+        clean_text = clean_text.replace(entity, replacement)
+    return re.sub(r'\s+', ' ', clean_text).strip()
+
+
+def html_description(vacancy, min_size=20000):
+    """Большое HTML-описание: настоящее из кэша или размеченный текст образца"""
+    description = vacancy['description']
+    if '<' not in description:
+        sentences = [s for s in description.split('. ') if s] or ['описание']
+        items = ''.join(f"<li>{s}&nbsp;&mdash; &quot;важно&quot;</li>" for s in sentences[1:6])
+        description = (f"<p><strong>{vacancy['name']}</strong></p><p>{sentences[0]}.</p>"
+                       f"<ul>{items}</ul><p>Условия: офис &amp; удаленка 🚀</p>")
+    return description * max(1, min_size // max(len(description), 1))
+
+
+def bench_normalize(samples):
+    pages = {id(v): html_description(v) for v in samples}
+
+    def legacy(vacancy):
+        # Описание: clean_html_tags в парсере и clean_text_safe в save_to_db,
+        # название: clean_text в парсере и clean_text_safe в save_to_db
+        description = legacy_clean_text_safe(legacy_clean_html_tags(pages[id(vacancy)])[:2000], 3000)
+        name = legacy_clean_text_safe(legacy_clean_text(vacancy['name']), 500)
+        return description, name
+
+    def single_pass(vacancy):
+        return html_to_text(pages[id(vacancy)], 2000), normalize_text(vacancy['name'], 500)
+
+    size = sum(len(page) for page in pages.values()) / len(pages)
+    report(f"Нормализация текста, HTML ~{size / 1024:.0f} КБ", samples, [
+        ("clean_html_tags + clean_text_safe", legacy),
+        ("html_to_text / normalize_text", single_pass),
+        ("  html_to_text без лимита (весь документ)", lambda v: html_to_text(pages[id(v)])),
+    ])
+
+    not_idempotent = sum(1 for v in samples
+                         if normalize_text(html_to_text(pages[id(v)], 2000)) != html_to_text(pages[id(v)], 2000))
+    print(f"  повторная нормализация изменила текст: {not_idempotent} из {len(samples)}")
+
+
+# --- relevance: calculate_relevance по одной против пачки на numpy -------------
+
+def legacy_main_relevance(vacancy, found):
+    """calculate_relevance из main.py до RelevanceScorer"""
+    score = 0
+    for tier, weight in ((HIGH_PRIORITY_KEYWORDS, 3), (MEDIUM_PRIORITY_KEYWORDS, 2),
+                         (LOW_PRIORITY_KEYWORDS, 1)):
+        for keyword in tier:
+            if keyword in found:
+                score += weight
+    if vacancy.get('salary_from') or vacancy.get('salary_to'):
+        score += 2
+    score += {'remote': 3, 'hybrid': 2, 'office': 1}.get(vacancy['work_format'], 0)
+    return min(score, 10)
+
+
+def legacy_tyumen_relevance(vacancy, text_hits):
+    """calculate_relevance из hh_parser_tym.py до RelevanceScorer"""
+    score = 5 + {'noExperience': 3, 'between1And3': 2, 'between3And6': 1}.get(vacancy['experience'], 0)
+    score += {'remote': 2, 'hybrid': 1}.get(vacancy['work_format'], 0)
+    salary_from = vacancy['salary_from']
+    if salary_from:
+        if 30000 <= salary_from <= 60000:
+            score += 2
+        elif salary_from > 60000:
+            score -= 1
+    if not text_hits.isdisjoint(hh_parser_tym.BEGINNER_TERMS):
+        score += 2
+    if vacancy['category'] in hh_parser_tym.IT_CATEGORIES:
+        if not text_hits.isdisjoint(hh_parser_tym.IT_TECH_TERMS):
+            score += 1
+    return min(max(score, 1), 10)
+
+
+def bench_relevance(samples, repeat=3):
+    rng = random.Random(7)
+    tyumen_categories = hh_parser_tym.IT_CATEGORIES + ['office_manager', 'clerk', 'archivist']
+    vacancies = []
+    for sample in samples:
+        salary = rng.choice([None, None, 25000, 45000, 60000, 90000, 150000])
+        vacancies.append(dict(sample,
+                              salary_from=salary,
+                              salary_to=rng.choice([None, salary and salary + 20000]),
+                              work_format=rng.choice(['remote', 'hybrid', 'office']),
+                              experience=rng.choice(['noExperience', 'between1And3', 'between3And6']),
+                              category=rng.choice(tyumen_categories)))
+
+    main_hits = [HHParser.scan_vacancy(v)[0] for v in vacancies]
+    tyumen_hits = [hh_parser_tym.MATCHER.find(f"{v['name']} {v['description']}") for v in vacancies]
+    batch_size = PIPELINE_CONFIG['score_batch_size']
+
+    def one_by_one(legacy, hits):
+        return lambda: [legacy(v, found) for v, found in zip(vacancies, hits)]
+
+    def in_batches(scorer, hits):
+        return lambda: [score
+                        for start in range(0, len(vacancies), batch_size)
+                        for score in scorer.score_batch(vacancies[start:start + batch_size],
+                                                        hits[start:start + batch_size])]
+
+    print(f"\n⏱️ Релевантность по готовым совпадениям ({len(vacancies)} вакансий, "
+          f"пачка {batch_size}, столбцов main {len(SCORER.columns)})")
+    for title, legacy, scorer, hits in (
+            ("main.py", legacy_main_relevance, SCORER, main_hits),
+            ("hh_parser_tym.py", legacy_tyumen_relevance, hh_parser_tym.SCORER, tyumen_hits)):
+        rows, columns = scorer.hit_matrix(vacancies, hits)
+        variants = [("по одной, циклы по уровням", one_by_one(legacy, hits)),
+                    (f"RelevanceScorer пачками по {batch_size}", in_batches(scorer, hits)),
+                    ("RelevanceScorer одной пачкой", lambda: scorer.score_batch(vacancies, hits)),
+                    ("  новые веса по готовой матрице",
+                     lambda: scorer.score_matrix(rows, columns, len(vacancies)))]
+        baseline = None
+        for label, func in variants:
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - started)
+            baseline = baseline or best
+            print(f"  {title:17} {label:32} {best * 1000:9.1f} мс | x{baseline / best:.2f}")
+
+        mismatches = sum(1 for a, b in zip(variants[0][1](), variants[2][1]()) if a != b)
+        print(f"  {title:17} расхождений с прежним расчетом: {mismatches}")
+
+
+BENCHMARKS = {
+    'keywords': bench_keywords,
+    'categories': bench_categories,
+    'normalize': bench_normalize,
+    'relevance': bench_relevance,
+}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Микробенчмарки парсера вакансий")
+    arg_parser.add_argument('names', nargs='*',
+                            help=f"какие замеры запустить: {', '.join(BENCHMARKS)} (по умолчанию все)")
+    arg_parser.add_argument('--limit', type=int, default=2000, help="сколько вакансий взять")
+    args = arg_parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        arg_parser.error(f"неизвестные замеры: {', '.join(unknown)}")
+
+    source, samples = load_samples(args.limit)
+    print(f"📦 Образцы: {len(samples)} вакансий ({source})")
+
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](samples)
@@ -0,0 +1,106 @@
+import importlib
+import json
+import os
+import threading
+import time
+
+import config
+from classification_memo import fingerprint
+from config import RULES_CONFIG
+from keyword_matcher import KeywordMatcher
+
+
+class CategoryRules:
+    """CATEGORIES, скомпилированные один раз: порядок по приоритету и множества слов
+
+    Автомат строится из ключевых слов и исключений всех категорий плюс
+    дополнительных списков вызывающего кода, так что одного scan() хватает
+    и для категории, и для остальных проверок текста.
+    """
+
+    def __init__(self, categories, *extra_keyword_lists):
+        ordered = sorted(categories.items(), key=lambda x: x[1]['priority'])
+        self.rules = [
+            (name,
+             frozenset(kw.lower() for kw in rule['keywords']),
+             frozenset(kw.lower() for kw in rule.get('exclude', ())))
+            for name, rule in ordered
+        ]
+        # Версия правил для ключей памяти классификации
+        self.version = fingerprint(self.rules)
+        self.matcher = KeywordMatcher(
+            *(keywords for _, keywords, _ in self.rules),
+            *(exclude for _, _, exclude in self.rules),
+            *extra_keyword_lists
+        )
+
+    def scan(self, text):
+        return self.matcher.scan(text)
+
+    def categorize(self, words):
+        """Первая по приоритету категория, чье слово есть в тексте, а исключений нет"""
+        for name, keywords, exclude in self.rules:
+            if not keywords.isdisjoint(words) and exclude.isdisjoint(words):
+                return name
+        return 'other'
+
+
+class RuleWatcher:
+    """Правила категорий, которые пересобираются при изменении config.py или файла правил
+
+    Файл правил (HH_RULES_FILE) - JSON той же структуры, что CATEGORIES, и
+    если он задан, заменяет CATEGORIES из конфига. Проверка времени изменения
+    файлов идет из refresh() не чаще раза в check_interval секунд, между
+    вызовами refresh() набор правил в rules не меняется.
+    """
+
+    def __init__(self, *extra_keyword_lists, rules_file=None, check_interval=None):
+        self.extra_keyword_lists = extra_keyword_lists
+        self.rules_file = rules_file or RULES_CONFIG['rules_file']
+        self.check_interval = RULES_CONFIG['check_interval'] if check_interval is None else check_interval
+        self.lock = threading.Lock()
+
+        self.mtimes = self._mtimes()
+        self.checked_at = time.monotonic()
+        self.rules = CategoryRules(self._load_categories(reload_config=False), *extra_keyword_lists)
+
+    def _mtimes(self):
+        paths = [config.__file__] + ([self.rules_file] if self.rules_file else [])
+        mtimes = []
+        for path in paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def _load_categories(self, reload_config=True):
+        if self.rules_file and os.path.exists(self.rules_file):
+            with open(self.rules_file, encoding='utf-8') as f:
+                return json.load(f)
+        if reload_config:
+            importlib.reload(config)
+        return config.CATEGORIES
+
+    def refresh(self):
+        """Пересобираем правила, если файлы изменились -> True если правила новые"""
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return False
+
+        with self.lock:
+            self.checked_at = now
+            mtimes = self._mtimes()
+            if mtimes == self.mtimes:
+                return False
+            self.mtimes = mtimes
+
+            try:
+                self.rules = CategoryRules(self._load_categories(), *self.extra_keyword_lists)
+            except Exception as e:
+                # Ошибка в правке правил не должна ронять долгий запуск - работаем на старых
+                print(f"⚠️ Не удалось перечитать правила категорий: {e}")
+                return False
+
+        print(f"🔄 Правила категорий перечитаны: {len(self.rules.rules)} категорий")
+        return True
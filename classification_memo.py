@@ -0,0 +1,97 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+from config import MEMO_CONFIG
+from storage import load_memo, save_memo
+
+
+def fingerprint(value):
+    """Стабильный между запусками и процессами sha1 структуры (множества сортируются)"""
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=sorted)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def content_key(version, *parts):
+    """Ключ памяти: sha1 версии правил и полей, от которых зависит результат"""
+    digest = hashlib.sha1(version.encode('utf-8'))
+    for part in parts:
+        digest.update(b'\x1f')
+        digest.update(str(part if part is not None else '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ClassificationMemo:
+    """Память (категория, релевантность, навыки из текста) по хэшу содержимого вакансии
+
+    Перепощенные и мультигородские вакансии приходят с теми же названием,
+    описанием и навыками - для них результат берется из памяти, а не
+    считается заново. Версия правил (CATEGORIES, веса) входит в ключ, поэтому
+    после их изменения старые записи просто перестают находиться.
+
+    Уровни: LRU в процессе на max_entries ключей и, если включено, таблица
+    classification_memo в PostgreSQL (общая для запусков и процессов пула).
+    Ошибка таблицы отключает ее до конца запуска, классификация не падает.
+    """
+
+    def __init__(self, max_entries=None, persistent=None):
+        self.max_entries = max_entries or MEMO_CONFIG['max_entries']
+        self.persistent = MEMO_CONFIG['persistent'] if persistent is None else persistent
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _disable_persistent(self, error):
+        print(f"⚠️ Таблица classification_memo недоступна, работаем только с памятью процесса: {error}")
+        self.persistent = False
+
+    def get_many(self, keys):
+        """-> {ключ: (категория, релевантность, навыки)} для известных ключей"""
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.entries.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                self.entries.move_to_end(key)
+                found[key] = value
+
+        if missing and self.persistent:
+            try:
+                stored = load_memo(list(set(missing)))
+            except Exception as e:
+                self._disable_persistent(e)
+                stored = {}
+            for key, value in stored.items():
+                self._remember(key, value)
+            found.update(stored)
+            self.persistent_hits += sum(1 for key in missing if key in stored)
+
+        self.hits += len(keys) - len(missing)
+        self.misses += sum(1 for key in missing if key not in found)
+        return found
+
+    def put_many(self, values):
+        """Запоминаем {ключ: (категория, релевантность, навыки)} новых результатов"""
+        for key, value in values.items():
+            self._remember(key, value)
+        if values and self.persistent:
+            try:
+                save_memo(values)
+            except Exception as e:
+                self._disable_persistent(e)
+
+    def summary(self):
+        total = self.hits + self.persistent_hits + self.misses
+        hit_rate = (self.hits + self.persistent_hits) / total * 100 if total else 0
+        return (f"🧠 Память классификации: из процесса {self.hits}, из таблицы {self.persistent_hits}, "
+                f"посчитано {self.misses} | hit rate {hit_rate:.0f}%")
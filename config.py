@@ -11,6 +11,125 @@ DB_CONFIG = {
     'port': os.getenv('DB_PORT', '5432')
 }
 
+# ПУЛ СОЕДИНЕНИЙ С БД (общий для всех скриптов, см. storage.py)
+POOL_CONFIG = {
+    'min_connections': 1,
+    'max_connections': int(os.getenv('DB_POOL_MAX', '10'))
+}
+
+# НАСТРОЙКИ ЗАГРУЗКИ С API HH.RU
+FETCH_CONFIG = {
+    'max_workers': int(os.getenv('HH_MAX_WORKERS', '8')),  # Сколько деталей качаем параллельно
+    'detail_timeout': 10
+}
+
+# ПОТОКОВАЯ ОБРАБОТКА: страницы -> фильтры -> детали -> классификация -> БД
+PIPELINE_CONFIG = {
+    'buffer_size': 200,          # Сколько элементов стадия может приготовить впрок
+    'db_batch_size': 100,        # Сколько вакансий сохраняем в БД за раз
+    'score_batch_size': 50,      # Сколько вакансий оцениваем одним векторным расчетом
+    'process_chunk_size': 200,   # Пачка для процесса пула (--workers) - крупная, чтобы окупить pickle
+    'process_min_batch': 40,     # Пачку меньше считаем в своем процессе, без пересылки
+    'rescore_batch_size': 5000   # Пачка строк при пересчете релевантности всей таблицы
+}
+
+# ОГРАНИЧЕНИЕ ЧАСТОТЫ ЗАПРОСОВ (token bucket, общий на процесс)
+RATE_LIMIT_CONFIG = {
+    'rate': float(os.getenv('HH_RATE', '5')),  # Стартовая скорость, запросов/сек
+    'min_rate': 0.5,             # Ниже не опускаемся даже после серии 429
+    'max_rate': float(os.getenv('HH_MAX_RATE', '20')),
+    'burst': 5,                  # Размер ведра - сколько запросов можно сделать залпом
+    'ramp_up_after': 20,         # Сколько успешных ответов подряд до ускорения
+    'max_retries': 5,            # Повторы одного запроса после 429/503/капчи
+    'max_backoff': 60            # Максимальная пауза между повторами, сек
+}
+
+# ИНКРЕМЕНТАЛЬНЫЙ ОБХОД (по умолчанию грузим только опубликованное с прошлого запуска)
+CRAWL_CONFIG = {
+    'overlap_minutes': 30   # Запас назад от прошлого запуска - чтобы не потерять вакансии на стыке
+}
+
+# СЕКЦИИ ТАБЛИЦЫ VACANCIES по месяцам created_date (partitions.py)
+PARTITION_CONFIG = {
+    'months_ahead': 2,   # Сколько будущих месяцев держать созданными (проверяется при каждом запуске)
+    'retention_months': int(os.getenv('HH_RETENTION_MONTHS', '12')),  # Сколько месяцев хранить
+    'retention_mode': os.getenv('HH_RETENTION_MODE', 'archive'),     # drop, detach или archive
+    'archive_schema': 'archive'   # Куда переносятся секции в режиме archive
+}
+
+# АРХИВ ИСХОДНОГО JSON ВАКАНСИЙ в vacancy_details.raw_json (сжатый zlib): --reprocess
+# парсеров разбирает его заново текущими фильтрами и правилами без обращения к API.
+# Около 2-4 КБ на вакансию, HH_STORE_RAW=0 - не хранить
+RAW_PAYLOAD_CONFIG = {
+    'store': os.getenv('HH_STORE_RAW', '1') == '1',
+    'compress_level': 6,
+    'reprocess_batch_size': int(os.getenv('HH_REPROCESS_BATCH', '500'))
+}
+
+# ЛОКАЛЬНЫЙ КЭШ ДЕТАЛЕЙ ВАКАНСИЙ (/vacancies/{id})
+CACHE_CONFIG = {
+    'enabled': os.getenv('HH_CACHE', '1') != '0',
+    'dir': os.getenv('HH_CACHE_DIR', '.cache'),
+    'ttl_hours': 24,     # Свежая запись отдается без запроса, старая - перепроверяется (ETag)
+    'max_mb': 200        # При превышении вытесняем давно не использованные записи
+}
+
+# ПРАВИЛА КАТЕГОРИЙ (перечитываются на лету при изменении config.py или файла правил)
+RULES_CONFIG = {
+    'rules_file': os.getenv('HH_RULES_FILE'),   # JSON в формате CATEGORIES, заменяет их
+    'check_interval': 5                          # Как часто проверять изменения, сек
+}
+
+# ПАМЯТЬ КЛАССИФИКАЦИИ: категория и релевантность по хэшу содержимого вакансии
+# (ключ включает версию правил и весов - их изменение само сбрасывает память)
+MEMO_CONFIG = {
+    'enabled': os.getenv('HH_MEMO', '1') != '0',
+    'max_entries': 50000,                               # LRU в каждом процессе
+    'persistent': os.getenv('HH_MEMO_DB', '0') == '1'   # Таблица classification_memo в БД
+}
+
+# РАБОТОДАТЕЛИ: канонический ключ company_key при загрузке (ООО "Ромашка", Ромашка АО -> ромашка),
+# по нему просмотр собирает все вакансии работодателя. HH_COMPANY_KEY=0 - не заполнять
+COMPANY_CONFIG = {
+    'normalize': os.getenv('HH_COMPANY_KEY', '1') != '0'
+}
+
+# КУРСЫ ВАЛЮТ для зарплат (рублей за единицу), пока таблица currency_rates пуста или недоступна.
+# Обновить таблицу по справочнику HH: python currency.py update
+CURRENCY_CONFIG = {
+    'default_rates': {'RUR': 1, 'USD': 90, 'EUR': 100, 'KZT': 0.18, 'BYR': 28, 'UZS': 0.007}
+}
+
+# ВЕСА РЕЛЕВАНТНОСТИ (relevance.py): балл = base + сумма весов найденных признаков,
+# обрезанная до [min, max]. После изменения весов: python main.py --rescore
+RELEVANCE_PROFILES = {
+    'main': {
+        'base': 0,
+        'min': 0,
+        'max': 10,
+        'keyword_tiers': {'high': 3, 'medium': 2, 'low': 1},   # За каждое найденное слово уровня
+        'keyword_groups': {},                                  # Один раз, если найдено любое слово группы
+        'salary_specified': 2,                                 # Указана зарплата (от или до)
+        'salary_bands': [],                                    # Диапазоны salary_from, границы включительно
+        'work_format': {'remote': 3, 'hybrid': 2, 'office': 1},
+        'experience': {}
+    },
+    'tyumen': {
+        'base': 5,
+        'min': 1,
+        'max': 10,
+        'keyword_tiers': {},
+        'keyword_groups': {'beginner': 2, 'it_tech': 1},
+        'salary_specified': 0,
+        'salary_bands': [
+            {'min': 30000, 'max': 60000, 'weight': 2},   # Для начинающих
+            {'min': 60001, 'max': None, 'weight': -1}    # Высокая ЗП - может быть сложно
+        ],
+        'work_format': {'remote': 2, 'hybrid': 1},
+        'experience': {'noExperience': 3, 'between1And3': 2, 'between3And6': 1}
+    }
+}
+
 # КЛЮЧЕВЫЕ СЛОВА ДЛЯ ПОИСКА В API
 KEYWORDS = [
     # Automation & RPA
@@ -1,29 +1,160 @@
--- Удаляем старую таблицу если существует
-DROP TABLE IF EXISTS vacancies;
+-- Триграммы для неточного поиска работодателей и названий
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
--- Создаем новую таблицу с полными полями
-CREATE TABLE vacancies (
+-- Удаляем старые таблицы если существуют
+DROP TABLE IF EXISTS vacancy_details CASCADE;
+DROP TABLE IF EXISTS vacancies CASCADE;
+DROP TABLE IF EXISTS vacancy_keys CASCADE;
+
+-- Реестр вакансий: уникальность hh_id (в секционированной таблице уникальный индекс
+-- обязан включать created_date), id и дата создания новой вакансии, цель ссылок vacancy_skills
+CREATE TABLE vacancy_keys (
     id SERIAL PRIMARY KEY,
-    hh_id INTEGER UNIQUE,
+    hh_id INTEGER NOT NULL UNIQUE,
+    created_date TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_vacancy_keys_date ON vacancy_keys(created_date);
+
+-- Вакансии секционированы по месяцам created_date: запросы "за N дней" читают только
+-- свежие секции, старые месяцы убираются целиком (python partitions.py retention).
+-- Секции vacancies_ГГГГ_ММ создает python partitions.py ensure и каждый запуск парсера.
+-- Здесь только узкие колонки списков, фильтров и статистики, тексты - в vacancy_details
+CREATE TABLE vacancies (
+    id INTEGER NOT NULL,            -- из vacancy_keys
+    hh_id INTEGER NOT NULL,
     name VARCHAR(500),
     company VARCHAR(255),
+    company_key VARCHAR(255),       -- канонический ключ работодателя (company_key в text_normalizer.py)
+    crawl_profile VARCHAR(50),      -- профиль обхода парсера (CRAWL_PROFILE, tyumen_<тип запроса>)
     salary_from INTEGER,
     salary_to INTEGER,
+    -- Зарплата в рублях диапазоном: "от" без "до" открыт вверх, "до" без "от" - вниз.
+    -- Фильтр по зарплате в просмотре - пересечение диапазонов по GiST-индексу
+    salary_rub int4range GENERATED ALWAYS AS (CASE
+        WHEN salary_from IS NULL AND salary_to IS NULL THEN NULL
+        WHEN salary_from > salary_to THEN int4range(salary_to, salary_from, '[]')
+        ELSE int4range(salary_from, salary_to, '[]')
+    END) STORED,
     url VARCHAR(500),
-    skills TEXT,
-    description TEXT,
     category VARCHAR(50),
     relevance_score INTEGER DEFAULT 0,
     work_format VARCHAR(20),        -- NEW: remote/hybrid/office
     city VARCHAR(100),              -- NEW: город вакансии
-    created_date TIMESTAMP DEFAULT NOW(),
-    responded BOOLEAN DEFAULT FALSE
-);
+    created_date TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_date TIMESTAMP,         -- NEW: когда перезагружена (--refresh-days)
+    responded BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (id, created_date)
+) PARTITION BY RANGE (created_date);
+
+-- Строки вне созданных месяцев (секции создаются заранее, обычно пуста)
+CREATE TABLE vacancies_default PARTITION OF vacancies DEFAULT;
+
+-- "Холодная" часть вакансии: тексты и исходный JSON, читаются только для показанных
+-- строк (VACANCY_DETAILS_JOIN в storage.py). Те же месячные секции vacancy_details_ГГГГ_ММ,
+-- убираются вместе с секциями vacancies - поэтому, как и у vacancies, без внешнего ключа
+CREATE TABLE vacancy_details (
+    vacancy_id INTEGER NOT NULL,        -- из vacancy_keys
+    created_date TIMESTAMP NOT NULL,    -- как у строки vacancies, ключ секции
+    skills TEXT,
+    description TEXT,
+    raw_json BYTEA,                     -- сжатый JSON поиска и детали, архив для --reprocess
+    -- Полнотекстовый поиск (view_vacancies.py): russian - словоформы, simple - слова как есть
+    -- (python, 1С, ETL). Заполняется при записи выражением search_vector_sql в storage.py
+    search_vector tsvector,
+    PRIMARY KEY (vacancy_id, created_date)
+) PARTITION BY RANGE (created_date);
+
+CREATE TABLE vacancy_details_default PARTITION OF vacancy_details DEFAULT;
 
 -- Индексы для быстрого поиска
 CREATE INDEX IF NOT EXISTS idx_vacancies_date ON vacancies(created_date);
 CREATE INDEX IF NOT EXISTS idx_vacancies_category ON vacancies(category);
-CREATE INDEX IF NOT EXISTS idx_vacancies_score ON vacancies(relevance_score);
-CREATE INDEX IF NOT EXISTS idx_vacancies_salary ON vacancies(salary_from, salary_to);
+-- Порядок постраничного просмотра (keyset в view_vacancies.py), INCLUDE - колонки фильтров:
+-- поиск ключа страницы и подсчет выборки обходятся без чтения самих строк
+CREATE INDEX IF NOT EXISTS idx_vacancies_browse
+    ON vacancies (relevance_score DESC, created_date DESC, id DESC)
+    INCLUDE (category, work_format, salary_from, salary_to);
+CREATE INDEX IF NOT EXISTS idx_vacancies_salary_rub ON vacancies USING GIST (salary_rub);
 CREATE INDEX IF NOT EXISTS idx_vacancies_work_format ON vacancies(work_format);  -- NEW
-CREATE INDEX IF NOT EXISTS idx_vacancies_city ON vacancies(city);                -- NEW
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_vacancies_city ON vacancies(city);                -- NEW
+CREATE INDEX IF NOT EXISTS idx_vacancy_details_search ON vacancy_details USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_vacancies_company_trgm ON vacancies USING GIN (company gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_vacancies_name_trgm ON vacancies USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_vacancies_employer ON vacancies ((COALESCE(company_key, company)));
+
+-- Навыки: справочник и связь с вакансиями (key_skills + найденные в описании).
+-- Запрос "вакансии с Airflow" идет по индексам, а не LIKE по тексту skills
+CREATE TABLE IF NOT EXISTS skills (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE   -- нижний регистр, см. skill_names в text_normalizer.py
+);
+
+CREATE TABLE IF NOT EXISTS vacancy_skills (
+    vacancy_id INTEGER NOT NULL REFERENCES vacancy_keys(id) ON DELETE CASCADE,
+    skill_id INTEGER NOT NULL REFERENCES skills(id),
+    PRIMARY KEY (vacancy_id, skill_id)
+);
+CREATE INDEX IF NOT EXISTS idx_vacancy_skills_skill ON vacancy_skills(skill_id, vacancy_id);
+
+-- Дневные итоги для статистики просмотра: пополняются тем же запросом, что пишет
+-- вакансии (storage.py), окно любой длины читается без обхода vacancies.
+-- Удаление старых секций итоги не трогает - статистика за прошлые месяцы остается
+CREATE TABLE IF NOT EXISTS vacancy_stats_daily (
+    day DATE NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    work_format VARCHAR(20) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    vacancies INTEGER NOT NULL,
+    salary_count INTEGER NOT NULL,      -- сколько вакансий с зарплатой (от или до)
+    salary_sum BIGINT NOT NULL,         -- сумма COALESCE(salary_from, salary_to) по ним
+    PRIMARY KEY (day, category, work_format, city)
+);
+
+-- Курсы валют к рублю для зарплат (currency.py): рублей за единицу валюты HH.
+-- Пока таблица пуста, действуют курсы CURRENCY_CONFIG из config.py
+CREATE TABLE IF NOT EXISTS currency_rates (
+    code VARCHAR(3) PRIMARY KEY,        -- RUR, USD, EUR, KZT, ...
+    rate NUMERIC(14, 6) NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Состояние инкрементального обхода: время начала последнего успешного запуска
+CREATE TABLE IF NOT EXISTS crawl_state (
+    profile VARCHAR(100) PRIMARY KEY,   -- профиль поиска (main, tyumen_office, ...)
+    last_crawl TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Отсеянные фильтрами элементы поиска (HH_STORE_RAW=1): сжатый JSON в формате raw_json,
+-- по одному на вакансию и профиль. --reprocess прогоняет их через текущие фильтры,
+-- строки старше срока хранения удаляет python partitions.py retention
+CREATE TABLE IF NOT EXISTS rejected_items (
+    crawl_profile VARCHAR(50) NOT NULL,
+    hh_id INTEGER NOT NULL,
+    payload BYTEA NOT NULL,
+    seen_date TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (crawl_profile, hh_id)
+);
+CREATE INDEX IF NOT EXISTS idx_rejected_items_seen ON rejected_items(seen_date);
+
+-- Память классификации (HH_MEMO_DB=1): результат по sha1 содержимого и версии правил.
+-- Записи старых версий больше не находятся, их можно чистить по created_at
+CREATE TABLE IF NOT EXISTS classification_memo (
+    content_hash CHAR(40) PRIMARY KEY,
+    category VARCHAR(50),
+    relevance_score INTEGER,
+    skills TEXT[],                      -- навыки, найденные в тексте
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Для уже существующей таблицы:
+-- ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS updated_date TIMESTAMP;
+-- Таблицы навыков и их заполнение для старых вакансий: python migrate.py skills
+-- Колонка search_vector и ее GIN-индекс: python migrate.py search
+-- company_key для старых вакансий и триграммные индексы: python migrate.py company
+-- Профиль обхода crawl_profile для старых вакансий (по категории): python migrate.py profile
+-- Перевод старой таблицы на секции и реестр vacancy_keys: python migrate.py partitions
+-- Дневные итоги по уже сохраненным вакансиям (и их пересборка): python migrate.py stats
+-- Индекс постраничного просмотра вместо idx_vacancies_score: python migrate.py browse
+-- Колонка salary_rub с GiST-индексом и таблица currency_rates: python migrate.py salary
+-- Вынос текстов из vacancies в vacancy_details (с замером до/после): python migrate.py split
@@ -0,0 +1,75 @@
+"""Курсы валют к рублю для зарплат
+
+python currency.py update   - обновить таблицу currency_rates по справочнику HH (/dictionaries)
+python currency.py show     - курсы, которыми сейчас пересчитываются зарплаты
+"""
+import argparse
+
+from config import CURRENCY_CONFIG
+from hh_client import API_URL, HHSession
+from storage import load_currency_rates, save_currency_rates
+
+
+class CurrencyRates:
+    """Рублей за единицу валюты: таблица currency_rates, без нее - CURRENCY_CONFIG
+
+    Курсы читаются из БД один раз на процесс при первой конвертации (в том
+    числе в процессах пула --workers), поэтому все парсеры переводят зарплаты
+    в рубли одинаково. Зарплата в неизвестной валюте считается неуказанной -
+    лучше без зарплаты, чем с выдуманной.
+    """
+
+    def __init__(self, rates=None):
+        self.rates = rates
+
+    def load(self):
+        """(Пере)читать курсы: значения по умолчанию, поверх - таблица"""
+        rates = dict(CURRENCY_CONFIG['default_rates'])
+        try:
+            rates.update(load_currency_rates())
+        except Exception as e:
+            print(f"⚠️ Таблица currency_rates недоступна, курсы из config.py: {e}")
+        self.rates = rates
+
+    def to_rub(self, amount, currency):
+        if not amount:
+            return None
+        if self.rates is None:
+            self.load()
+        rate = self.rates.get(currency or 'RUR')
+        return int(round(amount * rate)) if rate is not None else None
+
+    def salary(self, salary_data):
+        """salary из ответа API -> (от, до) в рублях"""
+        if not salary_data:
+            return None, None
+        currency = salary_data.get('currency')
+        return (self.to_rub(salary_data.get('from'), currency),
+                self.to_rub(salary_data.get('to'), currency))
+
+
+RATES = CurrencyRates()
+
+
+def fetch_hh_rates(session):
+    """Курсы из справочника HH: там rate - единиц валюты за рубль, переворачиваем"""
+    response = session.get(f"{API_URL}/dictionaries", timeout=10)
+    response.raise_for_status()
+    return {currency['code']: round(1 / currency['rate'], 6)
+            for currency in response.json().get('currency', [])
+            if currency.get('rate')}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Курсы валют для зарплат")
+    arg_parser.add_argument('command', choices=['update', 'show'])
+    args = arg_parser.parse_args()
+
+    if args.command == 'update':
+        rates = fetch_hh_rates(HHSession('HH-Parser/1.0'))
+        save_currency_rates(rates)
+        print(f"✅ Обновлено курсов: {len(rates)}")
+
+    RATES.load()
+    for code, rate in sorted(RATES.rates.items()):
+        print(f"  {code:4} | {rate:>12,.6f} руб.")
@@ -0,0 +1,131 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from config import CACHE_CONFIG
+
+
+class DetailCache:
+    """Персистентный SQLite-кэш ответов /vacancies/{id}
+
+    Хранит сжатое тело ответа вместе с ETag/Last-Modified. Пока запись моложе
+    TTL, она отдается без обращения к API; после - перепроверяется условным
+    GET (304 продлевает запись). При превышении лимита размера вытесняются
+    записи, к которым дольше всего не обращались (LRU).
+    """
+
+    def __init__(self, path=None, ttl_hours=None, max_mb=None):
+        if path is None:
+            os.makedirs(CACHE_CONFIG['dir'], exist_ok=True)
+            path = os.path.join(CACHE_CONFIG['dir'], 'vacancy_details.sqlite')
+
+        self.ttl = (ttl_hours or CACHE_CONFIG['ttl_hours']) * 3600
+        self.max_bytes = (max_mb or CACHE_CONFIG['max_mb']) * 1024 * 1024
+
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+        # Детали качаются из нескольких потоков - одно соединение под локом
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS details (
+                vacancy_id TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_details_accessed ON details(accessed_at)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM details").fetchone()[0]
+
+    def get(self, vacancy_id):
+        """-> (detail, etag, last_modified, is_fresh) или None
+
+        Свежая запись считается попаданием, устаревшая - ждет перепроверки.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM details WHERE vacancy_id = ?",
+                (str(vacancy_id),)
+            ).fetchone()
+            if not row:
+                return None
+            is_fresh = time.time() - row[3] < self.ttl
+            if is_fresh:
+                self.hits += 1
+            self.conn.execute(
+                "UPDATE details SET accessed_at = ? WHERE vacancy_id = ?",
+                (time.time(), str(vacancy_id))
+            )
+            self.conn.commit()
+
+        body, etag, last_modified, _ = row
+        detail = json.loads(zlib.decompress(body))
+        return detail, etag, last_modified, is_fresh
+
+    def put(self, vacancy_id, detail, etag=None, last_modified=None):
+        body = zlib.compress(json.dumps(detail, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute(
+                "SELECT size FROM details WHERE vacancy_id = ?", (str(vacancy_id),)
+            ).fetchone()
+            self.conn.execute("""
+                INSERT OR REPLACE INTO details
+                (vacancy_id, body, etag, last_modified, fetched_at, accessed_at, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (str(vacancy_id), body, etag, last_modified, now, now, len(body)))
+            self.misses += 1
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def touch(self, vacancy_id):
+        """Сервер ответил 304 - запись снова свежая"""
+        now = time.time()
+        with self.lock:
+            self.revalidated += 1
+            self.conn.execute(
+                "UPDATE details SET fetched_at = ?, accessed_at = ? WHERE vacancy_id = ?",
+                (now, now, str(vacancy_id))
+            )
+            self.conn.commit()
+
+    def _evict(self):
+        """Удаляем самые давно использованные записи до 90% лимита"""
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT vacancy_id, size FROM details ORDER BY accessed_at")
+        evicted = []
+        for vacancy_id, size in rows:
+            if self.total_bytes <= target:
+                break
+            evicted.append((vacancy_id,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM details WHERE vacancy_id = ?", evicted)
+
+    def summary(self):
+        total = self.hits + self.revalidated + self.misses
+        hit_rate = (self.hits + self.revalidated) / total * 100 if total else 0
+        return (f"🗄️ Кэш деталей: попаданий {self.hits}, перепроверено (304) {self.revalidated}, "
+                f"загружено {self.misses} | hit rate {hit_rate:.0f}% | "
+                f"размер {self.total_bytes / 1024 / 1024:.1f} МБ")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_default_cache():
+    """Кэш по настройкам CACHE_CONFIG (None если отключен через HH_CACHE=0)"""
+    if not CACHE_CONFIG['enabled']:
+        return None
+    return DetailCache()
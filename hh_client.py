@@ -0,0 +1,217 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from config import FETCH_CONFIG, RATE_LIMIT_CONFIG
+
+API_URL = "https://api.hh.ru"
+
+# Ответы, после которых надо притормозить и повторить запрос
+THROTTLE_STATUSES = (429, 503)
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket с адаптивной скоростью (AIMD)
+
+    После 429/503 скорость делится пополам и ведро блокируется на паузу,
+    после серии успешных ответов скорость плавно растет обратно до max_rate.
+    """
+
+    def __init__(self, rate=None, burst=None, min_rate=None, max_rate=None, ramp_up_after=None):
+        self.rate = rate or RATE_LIMIT_CONFIG['rate']
+        self.burst = burst or RATE_LIMIT_CONFIG['burst']
+        self.min_rate = min_rate or RATE_LIMIT_CONFIG['min_rate']
+        self.max_rate = max_rate or RATE_LIMIT_CONFIG['max_rate']
+        self.ramp_up_after = ramp_up_after or RATE_LIMIT_CONFIG['ramp_up_after']
+
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.healthy_streak = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Ждем, пока в ведре появится токен"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.blocked_until:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.blocked_until - now
+            time.sleep(wait)
+
+    def on_success(self):
+        """Здоровый ответ: после серии таких - аддитивно ускоряемся"""
+        with self.lock:
+            self.healthy_streak += 1
+            if self.healthy_streak >= self.ramp_up_after and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + 1)
+                self.healthy_streak = 0
+
+    def on_throttle(self, pause):
+        """429/503/капча: скорость пополам, ведро пустое, все потоки ждут паузу"""
+        with self.lock:
+            self.healthy_streak = 0
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_limiter():
+    """Один лимитер на процесс - все сессии ходят в один и тот же API"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = TokenBucket()
+        return _shared_limiter
+
+
+def parse_retry_after(response):
+    """Retry-After в секундах или HTTP-датой -> секунды (None если заголовка нет)"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(response):
+    """HH отвечает 429/503 при перегрузке и 403 с captcha_required при подозрении на бота"""
+    if response.status_code in THROTTLE_STATUSES:
+        return True
+    return response.status_code == 403 and b'captcha' in response.content
+
+
+class HHSession(requests.Session):
+    """requests.Session, все запросы которой идут через общий token bucket
+
+    На 429/503/капчу запрос повторяется с растущей паузой (с учетом Retry-After),
+    поэтому вызывающий код получает либо нормальный ответ, либо последний отказ.
+    """
+
+    def __init__(self, user_agent, limiter=None, max_retries=None, max_backoff=None):
+        super().__init__()
+        self.headers.update({
+            'User-Agent': user_agent,
+            'Accept': 'application/json'
+        })
+        self.limiter = limiter or get_shared_limiter()
+        self.max_retries = RATE_LIMIT_CONFIG['max_retries'] if max_retries is None else max_retries
+        self.max_backoff = max_backoff or RATE_LIMIT_CONFIG['max_backoff']
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            response = super().request(method, url, *args, **kwargs)
+
+            if not is_throttled(response):
+                self.limiter.on_success()
+                return response
+
+            # Экспоненциальная пауза с джиттером, но Retry-After от сервера важнее
+            pause = parse_retry_after(response)
+            if pause is None:
+                pause = min(self.max_backoff, 2 ** attempt) * random.uniform(0.8, 1.2)
+            pause = min(pause, self.max_backoff)
+            self.limiter.on_throttle(pause)
+
+            if attempt < self.max_retries:
+                print(f"⏳ HH ответил {response.status_code}, пауза {pause:.1f} сек "
+                      f"(попытка {attempt + 1}/{self.max_retries})")
+
+        return response
+
+
+class DetailFetcher:
+    """Параллельная загрузка /vacancies/{id} через ограниченный пул потоков
+
+    Если передан DetailCache, свежие детали берутся из него без запроса,
+    а устаревшие перепроверяются условным GET (If-None-Match/If-Modified-Since).
+    """
+
+    def __init__(self, session, max_workers=None, timeout=None, cache=None):
+        self.session = session
+        self.cache = cache
+        self.max_workers = max_workers or FETCH_CONFIG['max_workers']
+        self.timeout = timeout or FETCH_CONFIG['detail_timeout']
+
+        # Пул соединений не меньше числа потоков, иначе urllib3 будет их выбрасывать
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+
+    def fetch_one(self, vacancy_id, timeout=None):
+        """Детали одной вакансии, пустой dict при любой ошибке
+
+        Если перепроверить устаревшую запись кэша не удалось (таймаут, 5xx,
+        исчерпаны повторы 429), отдается она - лучше старое описание, чем никакого.
+        """
+        cached = self.cache.get(vacancy_id) if self.cache else None
+        if cached and cached[3]:
+            return cached[0]
+
+        headers = {}
+        if cached:
+            _, etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        try:
+            response = self.session.get(
+                f"{API_URL}/vacancies/{vacancy_id}",
+                headers=headers,
+                timeout=timeout or self.timeout
+            )
+            if response.status_code == 304 and cached:
+                self.cache.touch(vacancy_id)
+                return cached[0]
+            if response.status_code == 200:
+                detail = response.json()
+                if self.cache:
+                    self.cache.put(vacancy_id, detail,
+                                   response.headers.get('ETag'),
+                                   response.headers.get('Last-Modified'))
+                return detail
+            print(f"Ошибка получения деталей вакансии {vacancy_id}: HTTP {response.status_code}")
+        except Exception as e:
+            print(f"Ошибка получения деталей вакансии {vacancy_id}: {e}")
+        return cached[0] if cached else {}
+
+    def fetch_many(self, vacancy_ids, timeout=None):
+        """Детали пачки вакансий параллельно -> {vacancy_id: detail}"""
+        vacancy_ids = list(dict.fromkeys(vacancy_ids))
+        if not vacancy_ids:
+            return {}
+
+        if len(vacancy_ids) == 1:
+            return {vacancy_ids[0]: self.fetch_one(vacancy_ids[0], timeout)}
+
+        workers = min(self.max_workers, len(vacancy_ids))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            details = pool.map(lambda vid: self.fetch_one(vid, timeout), vacancy_ids)
+            return dict(zip(vacancy_ids, details))
@@ -1,9 +1,10 @@
 import requests
-import psycopg2
 import time
 import re
 from datetime import datetime, timedelta
-from config import DB_CONFIG, KEYWORDS, GEO_CONFIG
+from config import KEYWORDS, GEO_CONFIG
+from storage import connection, insert_vacancy_rows
+from currency import RATES
 
 class HHParser:
     def __init__(self):
@@ -96,20 +97,8 @@ class HHParser:
         return 'office'
     
     def parse_salary(self, salary_data):
-        """Корректная обработка зарплаты"""
-        if not salary_data:
-            return None, None
-        
-        salary_from = salary_data.get('from')
-        salary_to = salary_data.get('to')
-        
-        if salary_data.get('currency') != 'RUR':
-            if salary_from:
-                salary_from = salary_from * 70
-            if salary_to:
-                salary_to = salary_to * 70
-        
-        return salary_from, salary_to
+        """Зарплата в рублях по общим курсам (currency.py)"""
+        return RATES.salary(salary_data)
     
     def categorize_vacancy(self, vacancy):
         """Категоризация на основе конфига с приоритетами"""
@@ -266,19 +255,7 @@ class HHParser:
                         # 🔥 ВСЕ фильтры пройдены - сохраняем вакансию
                         
                         # Обработка зарплаты
-                        salary_data = item.get('salary')
-                        salary_from = None
-                        salary_to = None
-                        
-                        if salary_data:
-                            salary_from = salary_data.get('from')
-                            salary_to = salary_data.get('to')
-                            
-                            if salary_data.get('currency') != 'RUR':
-                                if salary_from:
-                                    salary_from = salary_from * 70
-                                if salary_to:
-                                    salary_to = salary_to * 70
+                        salary_from, salary_to = self.parse_salary(item.get('salary'))
                         
                         # Получаем полное описание
                         vacancy_detail = self.get_vacancy_details(vacancy_id)
@@ -329,54 +306,40 @@ class HHParser:
         return all_vacancies
 
 def save_to_db(vacancies):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    
     new_count = 0
     duplicate_count = 0
     error_count = 0
     
     parser = HHParser()  # создаем парсер для очистки
     
+    # Строки в порядке VACANCY_COLUMNS (storage.py): вакансия пишется в vacancies
+    # и vacancy_details общим запросом парсеров, без ключа работодателя, профиля и JSON
+    rows = []
     for vac in vacancies:
-        try:
-            # ИСПОЛЬЗУЕМ ТОЛЬКО clean_text_safe для всех полей
-            clean_vac = (
-                vac['hh_id'],
-                parser.clean_text_safe(vac['name'])[:500],
-                parser.clean_text_safe(vac['company'])[:255], 
-                vac['salary_from'], 
-                vac['salary_to'], 
-                vac['url'][:500],
-                parser.clean_text_safe(vac['skills'])[:1000],
-                parser.clean_text_safe(vac['description'])[:3000],
-                parser.clean_text_safe(vac['category'])[:50],
-                vac['relevance_score'], 
-                parser.clean_text_safe(vac['work_format'])[:20], 
-                parser.clean_text_safe(vac['city'])[:100]
-            )
-            
-            cursor.execute("""
-                INSERT INTO vacancies 
-                (hh_id, name, company, salary_from, salary_to, url, skills, 
-                 description, category, relevance_score, work_format, city)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (hh_id) DO NOTHING
-                RETURNING id
-            """, clean_vac)
-            
-            if cursor.fetchone():
-                new_count += 1
-            else:
-                duplicate_count += 1
-                
-        except Exception as e:
-            error_count += 1
-            print(f"❌ Ошибка сохранения вакансии {vac['hh_id']}: {e}")
+        # ИСПОЛЬЗУЕМ ТОЛЬКО clean_text_safe для всех полей
+        rows.append((
+            vac['hh_id'],
+            parser.clean_text_safe(vac['name'])[:500],
+            parser.clean_text_safe(vac['company'])[:255], 
+            vac['salary_from'], 
+            vac['salary_to'], 
+            vac['url'][:500],
+            parser.clean_text_safe(vac['skills'])[:1000],
+            parser.clean_text_safe(vac['description'])[:3000],
+            parser.clean_text_safe(vac['category'])[:50],
+            vac['relevance_score'], 
+            parser.clean_text_safe(vac['work_format'])[:20], 
+            parser.clean_text_safe(vac['city'])[:100],
+            None,
+            None,
+            None
+        ))
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with connection() as conn:
+        new_count, duplicate_count, failed = insert_vacancy_rows(conn, rows)
+    for row, e in failed:
+        error_count += 1
+        print(f"❌ Ошибка сохранения вакансии {row[0]}: {e}")
     
     return new_count, duplicate_count, error_count
 
@@ -1,498 +1,709 @@
-import requests
-import psycopg2
-import time
-import re
-import html
+import argparse
+import heapq
+import threading
+from collections import deque
+from functools import partial
 from datetime import datetime
-import os
-from dotenv import load_dotenv
+from hh_client import DetailFetcher, HHSession
+from detail_cache import open_default_cache
+from classification_memo import ClassificationMemo, content_key
+from config import COMPANY_CONFIG, MEMO_CONFIG, RAW_PAYLOAD_CONFIG
+from keyword_matcher import KeywordMatcher
+from text_normalizer import FIELD_LIMITS, company_key, html_to_text, normalize_text, skill_names
+from relevance import RelevanceScorer
+from search_planner import SearchPlanner
+from currency import RATES
+from partitions import ensure_partitions
+from pipeline import BatchSink, ProcessStage, batched, buffered
+from storage import (connection, incremental_date_from, insert_vacancy_rows, iter_raw_payloads,
+                     iter_rejected_items, load_known_ids, pack_raw_payload, save_rejected_items,
+                     set_watermark, validate_vacancy_row)
 
-load_dotenv()
-
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'database': os.getenv('DB_NAME', 'hh_parser'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'port': os.getenv('DB_PORT', '5432')
+# Раздельные запросы для разных категорий
+SEARCH_QUERIES = {
+    'office': (
+        '"офис-менеджер" OR "помощник руководителя" OR "помощник директора" OR '
+        '"делопроизводитель" OR "архивариус" OR "документовед" OR '
+        '"канцелярия" OR "офисный работник" OR "ресепшионист" OR '
+        '"оператор данных" OR "ввод данных" OR "обработка документов" OR '
+        '"регистратор документов" OR "секретарь-делопроизводитель"'
+    ),
+    'it_tech': (
+        '"системный аналитик" OR "бизнес-аналитик" OR "data analyst" OR '
+        '"аналитик данных" OR "sql" OR "базы данных" OR '
+        '"1с разработчик" OR "1с программист" OR "программист 1с" OR '
+        '"тестировщик" OR "qa engineer" OR "qa специалист" OR '
+        '"junior разработчик" OR "младший программист" OR "стажер программист" OR '
+        '"стажер it" OR "junior it" OR "начальный уровень программист"'
+    )
 }
 
+IT_CATEGORIES = ['it_analyst', 'it_developer', 'it_1c', 'it_tester']
+# Категории, которые дает только запрос office (см. categorize_vacancy)
+OFFICE_CATEGORIES = ['office_manager', 'assistant', 'clerk', 'archivist',
+                     'document_specialist', 'receptionist', 'data_operator']
+
+# Для IT: признаки завышенных требований в полном описании
+IT_EXCLUDE_TERMS = [
+    'senior', 'lead', 'team lead', 'архитектор',
+    'руководитель', 'управление командой',
+    '5+ лет', '6+ лет', '7+ лет', 'более 5 лет',
+    'опыт от 5 лет', 'опыт от 6 лет'
+]
+
+# Контекстные исключения по названию - общие для ВСЕХ категорий
+CONTEXT_EXCLUDE = [
+    # Продажи и торговля
+    'продаж', 'менеджер по продажам', 'продавец', 'торговый',
+    'консультант по продажам', 'мерчендайзер', 'кассир',
+    'товаровед', 'закупк', 'снабжен',
+
+    # Клиентский сервис и звонки
+    'оператор call', 'оператор колл', 'диспетчер',
+    'телефонный оператор', 'прием звонков', 'звонк',
+    'call-центр', 'колл-центр', 'клиентский сервис',
+    'обслуживание клиентов', 'консультирование',
+
+    # Управление и высокие позиции
+    'руководитель', 'директор', 'начальник', 'управляющий',
+    'заместитель директора', 'зам. директора', 'генеральный',
+    'ведущий', 'старший', 'senior', 'team lead', 'руковод',
+
+    # Неподходящие профессии
+    'водитель', 'курьер', 'экспедитор', 'грузчик',
+    'упаковщик', 'кладовщик', 'комплектовщик',
+    'охрана', 'охранник', 'консьерж',
+    'повар', 'официант', 'бармен', 'промоутер',
+    'мастер', 'техник', 'механик', 'электрик',
+    'монтажник', 'сварщик', 'слесарь',
+    'медсестра', 'медбрат', 'врач', 'фельдшер',
+    'воспитатель', 'учитель', 'преподаватель',
+    'уборщик', 'уборщица', 'клининг', 'дворник',
+    'парикмахер', 'визажист', 'массажист', 'косметолог',
+
+    # Маркетинг и SMM
+    'маркетолог', 'smm', 'таргетолог', 'копирайтер',
+    'контент-менеджер', 'дизайнер', 'иллюстратор',
+
+    # HR и рекрутинг
+    'hr', 'рекрутер', 'менеджер по персоналу',
+
+    # Логистика
+    'логист', 'диспетчер грузоперевозок',
+
+    # Инженеры (не IT)
+    'инженер', 'проектировщик', 'конструктор', 'технолог',
+
+    # Сфера услуг (сауны, фитнес и т.д.)
+    'саун', 'спа', 'фитнес', 'тренажер', 'зал',
+    'бассейн', 'косметолог', 'массаж', 'салон',
+    'гостиниц', 'отель', 'ресторан', 'кафе', 'бар',
+    'клуб', 'развлекательный центр',
+
+    # Авто и транспорт
+    'авто', 'автомобил', 'шиномонтаж', 'автомойк',
+    'автосервис', 'стоянк', 'парковк',
+
+    # Производство и склад
+    'склад', 'производств', 'цех', 'завод',
+    'фабрик', 'оборудован', 'механизм',
+
+    # Слишком высокий уровень
+    'архитектор', 'devops', 'sre', 'security',
+    'сетевой инженер', 'системный администратор',
+    'главный', 'ведущий', 'principal', 'architect'
+]
+
+# Для "Администратор": признаки администратора салона, магазина, клиники и т.п.
+ADMIN_CONTEXT_EXCLUDE = [
+    'саун', 'спа', 'клуб', 'кафе', 'ресторан', 'бар',
+    'гостиниц', 'отель', 'фитнес', 'тренажер', 'зал',
+    'клиник', 'больниц', 'стоматолог', 'поликлиник',
+    'авто', 'автомойк', 'стоянк', 'парковк',
+    'склад', 'производств', 'цех', 'завод',
+    'магазин', 'торгов', 'школ', 'детск', 'садик'
+]
+
+# Для опыта 3-6 лет: признаки senior/lead в названии
+SENIOR_TERMS = ['senior', 'ведущий', 'старший', 'lead', 'руководитель']
+
+# Релевантность: бонус для начинающих и за технологии в IT
+BEGINNER_TERMS = ['без опыта', 'начинающий', 'стажер', 'студент', 'обучение']
+IT_TECH_TERMS = ['python', 'sql', '1с', 'excel', 'tableau']
+
+# Фрагменты, по которым categorize_vacancy и classify определяют категорию и формат
+CATEGORY_TERMS = [
+    'аналитик', 'системн', 'бизнес', 'данн', 'sql', 'баз данн', 'data analyst', 'специалист',
+    '1с', '1c', 'программист', 'разработчик',
+    'тестировщик', 'qa', 'quality assurance',
+    'junior разработчик', 'младший программист', 'стажер программист', 'программист стажер',
+    'senior', 'ведущий', 'старший',
+    'офис-менеджер', 'офисный', 'помощник руководителя', 'помощник директора',
+    'ассистент руководителя', 'делопроизводитель', 'канцелярия', 'архивариус', 'архив',
+    'документовед', 'документ', 'ресепшионист', 'приемная',
+    'оператор данн', 'ввод данн', 'обработк данн',
+    'администратор', 'удален', 'remote', 'гибрид', 'hybrid'
+]
+
+# Релевантность пачками (relevance.py), веса - RELEVANCE_PROFILES['tyumen'].
+# Бонус за технологии дается только IT-категориям
+SCORER = RelevanceScorer('tyumen', keyword_groups={
+    'beginner': (BEGINNER_TERMS, None),
+    'it_tech': (IT_TECH_TERMS, IT_CATEGORIES)
+})
+
+# Память релевантности по содержимому (своя в каждом процессе пула)
+MEMO = ClassificationMemo() if MEMO_CONFIG['enabled'] else None
+
+# Один автомат на все списки - каждый текст сканируется один раз
+MATCHER = KeywordMatcher(
+    CONTEXT_EXCLUDE, ADMIN_CONTEXT_EXCLUDE, IT_EXCLUDE_TERMS, SENIOR_TERMS,
+    BEGINNER_TERMS, IT_TECH_TERMS, CATEGORY_TERMS
+)
+
 class TyumenOfficeITJobs:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'HH-Tyumen-Office-IT/1.0',
-            'Accept': 'application/json'
-        })
-    
-    def clean_text_safe(self, text, max_length=2000):
-        if not text:
-            return ""
-        try:
-            text = html.unescape(text)
-            cleaned = re.sub(r'[^\w\s\.\,\-\+\!\?\:\;\(\)\"\'\/\\\@\#\$\&\*\=\[\]\{\}\<\>\|\~\`\n\rа-яА-ЯёЁ]', ' ', text, flags=re.UNICODE)
-            cleaned = re.sub(r'\s+', ' ', cleaned)
-            return cleaned.strip()[:max_length]
-        except Exception:
-            return ""
-    
-    def clean_html_tags(self, text):
-        if not text:
-            return ""
-        text = re.sub(r'<[^>]+>', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
-    
-    def get_tyumen_vacancies_strict(self):
-        """СТРОГИЙ поиск: офисные + IT/технические вакансии"""
-        url = "https://api.hh.ru/vacancies"
-        all_vacancies = []
-        
-        # Раздельные запросы для разных категорий
-        search_queries = {
-            'office': (
-                '"офис-менеджер" OR "помощник руководителя" OR "помощник директора" OR '
-                '"делопроизводитель" OR "архивариус" OR "документовед" OR '
-                '"канцелярия" OR "офисный работник" OR "ресепшионист" OR '
-                '"оператор данных" OR "ввод данных" OR "обработка документов" OR '
-                '"регистратор документов" OR "секретарь-делопроизводитель"'
-            ),
-            'it_tech': (
-                '"системный аналитик" OR "бизнес-аналитик" OR "data analyst" OR '
-                '"аналитик данных" OR "sql" OR "базы данных" OR '
-                '"1с разработчик" OR "1с программист" OR "программист 1с" OR '
-                '"тестировщик" OR "qa engineer" OR "qa специалист" OR '
-                '"junior разработчик" OR "младший программист" OR "стажер программист" OR '
-                '"стажер it" OR "junior it" OR "начальный уровень программист"'
-            )
-        }
+    def __init__(self, max_workers=None, known_ids=None, process_workers=None):
+        # Все запросы идут через общий лимитер с повтором на 429/503
+        self.session = HHSession('HH-Tyumen-Office-IT/1.0')
+        self.cache = open_default_cache()
+        self.fetcher = DetailFetcher(self.session, max_workers=max_workers, cache=self.cache)
+        self.planner = SearchPlanner(self.session, max_workers=max_workers)
         
-        for category_type, search_query in search_queries.items():
+        # hh_id, уже сохраненные в БД: их детали не качаем и не обрабатываем повторно
+        self.known_ids = known_ids if known_ids is not None else set()
+        self.skipped_known = 0
+        self.completed_types = []
+        self.seen_ids = set()
+        
+        # Отсеянные кандидаты - в архив для --reprocess
+        self.rejected = BatchSink(self.archive_rejected) if RAW_PAYLOAD_CONFIG['store'] else None
+        self.rejected_lock = threading.Lock()
+        
+        # Процессы для CPU-стадии classify (--workers), 0/1 - в текущем процессе
+        self.process_workers = process_workers
+    
+    def iter_search_pages(self, date_from_by_type):
+        """Стадия 1: страницы поиска по каждому типу запроса -> (тип, items)"""
+        for category_type, search_query in SEARCH_QUERIES.items():
             print(f"\n🔍 Поиск {category_type.upper()} вакансий Тюмени...")
             print(f"📝 Запрос: {search_query[:80]}...")
             
             params = {
                 'text': search_query,
                 'area': 95,  # Тюмень
-                'per_page': 100,
-                'page': 0,
-                'period': 30,
             }
             
+            date_from = date_from_by_type.get(category_type)
+            if date_from:
+                print(f"⏩ Только опубликованные с {date_from:%d.%m.%Y %H:%M}")
+            
             try:
-                response = self.session.get(url, params=params, timeout=15)
-                data = response.json()
+                # За 30 дней без ограничения в 5 страниц: планировщик сам
+                # дробит окно, если вакансий больше, чем отдает API
+                for page_label, items in self.planner.iter_pages(params, date_from=date_from, days=30):
+                    yield category_type, items
                 
-                found = data.get('found', 0)
-                pages = min(data.get('pages', 1), 5)
+                if self.planner.failed_pages == 0:
+                    self.completed_types.append(category_type)
                 
-                print(f"📨 Найдено по запросу: {found}")
-                
-                for page in range(pages):
-                    if page > 0:
-                        params['page'] = page
-                        response = self.session.get(url, params=params, timeout=15)
-                        data = response.json()
+            except Exception as e:
+                print(f"⚠️ Ошибка запроса: {e}")
+                continue
+    
+    def check_item(self, item, category_type):
+        """Фильтры одного элемента поиска -> кандидат с предварительной категорией или None"""
+        vacancy_id = item['id']
+        name = item.get('name', '').lower()
+        city = item.get('area', {}).get('name', 'Не указан')
+        
+        # ФИЛЬТР 1: ТОЛЬКО Тюмень
+        if not ('тюмен' in city.lower()):
+            return None
+        
+        # ФИЛЬТР 2: КОНТЕКСТНЫЕ ИСКЛЮЧЕНИЯ (CONTEXT_EXCLUDE)
+        
+        # Все списки проверяются по одному проходу автомата по названию
+        name_hits = MATCHER.find(name)
+        
+        if not name_hits.isdisjoint(CONTEXT_EXCLUDE):
+            return None
+        
+        # Дополнительные проверки для "Администратор"
+        if 'администратор' in name_hits:
+            if not name_hits.isdisjoint(ADMIN_CONTEXT_EXCLUDE):
+                return None
+        
+        # ФИЛЬТР 3: Получаем сниппет для проверки
+        snippet = item.get('snippet', {})
+        requirement = snippet.get('requirement', '').lower()
+        responsibility = snippet.get('responsibility', '').lower()
+        snippet_text = f"{requirement} {responsibility}"
+        
+        # ФИЛЬТР 4: Проверяем что это подходящая категория
+        category = self.categorize_vacancy(name, snippet_text, category_type, name_hits)
+        
+        if category == 'excluded':
+            return None
+        
+        # ФИЛЬТР 5: Опыт (только для начинающих/младших)
+        experience_id = item.get('experience', {}).get('id', '')
+        
+        # Для IT: разрешаем до 6 лет, но проверяем уровень
+        allowed_experience = ['noExperience', 'between1And3', 'between3And6']
+        
+        if experience_id not in allowed_experience:
+            return None
+        
+        # Для опытных IT проверяем что не senior/lead
+        if experience_id == 'between3And6' or experience_id == 'moreThan6':
+            if not name_hits.isdisjoint(SENIOR_TERMS):
+                return None
+        
+        return (item, vacancy_id, name, city, category,
+                snippet_text, experience_id, category_type)
+    
+    def filter_items(self, pages):
+        """Стадия 2: фильтры по данным поиска -> кандидаты с предварительной категорией
+        
+        Отсеянные элементы копятся в архиве rejected_items (HH_STORE_RAW=1):
+        --reprocess проверит их заново, когда фильтры изменятся.
+        """
+        for category_type, items in pages:
+            for item in items:
+                try:
+                    vacancy_id = item['id']
+                    
+                    # ФИЛЬТР 0: Уже есть в БД или уже найдена другим запросом
+                    if int(vacancy_id) in self.known_ids:
+                        self.skipped_known += 1
+                        continue
+                    if int(vacancy_id) in self.seen_ids:
+                        continue
                     
-                    for item in data.get('items', []):
-                        try:
-                            vacancy_id = item['id']
-                            name = item.get('name', '').lower()
-                            city = item.get('area', {}).get('name', 'Не указан')
-                            
-                            # ФИЛЬТР 1: ТОЛЬКО Тюмень
-                            if not ('тюмен' in city.lower()):
-                                continue
-                            
-                            # ФИЛЬТР 2: КОНТЕКСТНЫЕ ИСКЛЮЧЕНИЯ
-                            # Общие исключения для ВСЕХ категорий
-                            context_exclude = [
-                                # Продажи и торговля
-                                'продаж', 'менеджер по продажам', 'продавец', 'торговый',
-                                'консультант по продажам', 'мерчендайзер', 'кассир',
-                                'товаровед', 'закупк', 'снабжен',
-                                
-                                # Клиентский сервис и звонки
-                                'оператор call', 'оператор колл', 'диспетчер',
-                                'телефонный оператор', 'прием звонков', 'звонк',
-                                'call-центр', 'колл-центр', 'клиентский сервис',
-                                'обслуживание клиентов', 'консультирование',
-                                
-                                # Управление и высокие позиции
-                                'руководитель', 'директор', 'начальник', 'управляющий',
-                                'заместитель директора', 'зам. директора', 'генеральный',
-                                'ведущий', 'старший', 'senior', 'team lead', 'руковод',
-                                
-                                # Неподходящие профессии
-                                'водитель', 'курьер', 'экспедитор', 'грузчик',
-                                'упаковщик', 'кладовщик', 'комплектовщик',
-                                'охрана', 'охранник', 'консьерж',
-                                'повар', 'официант', 'бармен', 'промоутер',
-                                'мастер', 'техник', 'механик', 'электрик',
-                                'монтажник', 'сварщик', 'слесарь',
-                                'медсестра', 'медбрат', 'врач', 'фельдшер',
-                                'воспитатель', 'учитель', 'преподаватель',
-                                'уборщик', 'уборщица', 'клининг', 'дворник',
-                                'парикмахер', 'визажист', 'массажист', 'косметолог',
-                                
-                                # Маркетинг и SMM
-                                'маркетолог', 'smm', 'таргетолог', 'копирайтер',
-                                'контент-менеджер', 'дизайнер', 'иллюстратор',
-                                
-                                # HR и рекрутинг
-                                'hr', 'рекрутер', 'менеджер по персоналу',
-                                
-                                # Логистика
-                                'логист', 'диспетчер грузоперевозок',
-                                
-                                # Инженеры (не IT)
-                                'инженер', 'проектировщик', 'конструктор', 'технолог',
-                                
-                                # Сфера услуг (сауны, фитнес и т.д.)
-                                'саун', 'спа', 'фитнес', 'тренажер', 'зал',
-                                'бассейн', 'косметолог', 'массаж', 'салон',
-                                'гостиниц', 'отель', 'ресторан', 'кафе', 'бар',
-                                'клуб', 'развлекательный центр',
-                                
-                                # Авто и транспорт
-                                'авто', 'автомобил', 'шиномонтаж', 'автомойк',
-                                'автосервис', 'стоянк', 'парковк',
-                                
-                                # Производство и склад
-                                'склад', 'производств', 'цех', 'завод',
-                                'фабрик', 'оборудован', 'механизм',
-                                
-                                # Слишком высокий уровень
-                                'архитектор', 'devops', 'sre', 'security',
-                                'сетевой инженер', 'системный администратор',
-                                'главный', 'ведущий', 'principal', 'architect'
-                            ]
-                            
-                            excluded = False
-                            for excl in context_exclude:
-                                if excl in name:
-                                    excluded = True
-                                    break
-                            
-                            if excluded:
-                                continue
-                            
-                            # Дополнительные проверки для "Администратор"
-                            if 'администратор' in name:
-                                admin_context_exclude = [
-                                    'саун', 'спа', 'клуб', 'кафе', 'ресторан', 'бар',
-                                    'гостиниц', 'отель', 'фитнес', 'тренажер', 'зал',
-                                    'клиник', 'больниц', 'стоматолог', 'поликлиник',
-                                    'авто', 'автомойк', 'стоянк', 'парковк',
-                                    'склад', 'производств', 'цех', 'завод',
-                                    'магазин', 'торгов', 'школ', 'детск', 'садик'
-                                ]
-                                
-                                if any(ctx in name for ctx in admin_context_exclude):
-                                    continue
-                            
-                            # ФИЛЬТР 3: Получаем сниппет для проверки
-                            snippet = item.get('snippet', {})
-                            requirement = snippet.get('requirement', '').lower()
-                            responsibility = snippet.get('responsibility', '').lower()
-                            snippet_text = f"{requirement} {responsibility}"
-                            
-                            # ФИЛЬТР 4: Проверяем что это подходящая категория
-                            category = self.categorize_vacancy(name, snippet_text, category_type)
-                            
-                            if category == 'excluded':
-                                continue
-                            
-                            # ФИЛЬТР 5: Опыт (только для начинающих/младших)
-                            experience_id = item.get('experience', {}).get('id', '')
-                            
-                            # Для IT: разрешаем до 6 лет, но проверяем уровень
-                            allowed_experience = ['noExperience', 'between1And3', 'between3And6']
-                            
-                            if experience_id not in allowed_experience:
-                                continue
-                            
-                            # Для опытных IT проверяем что не senior/lead
-                            if experience_id == 'between3And6' or experience_id == 'moreThan6':
-                                if any(level in name for level in ['senior', 'ведущий', 'старший', 'lead', 'руководитель']):
-                                    continue
-                            
-                            # ФИЛЬТР 6: Получаем полное описание для IT
-                            if category in ['it_analyst', 'it_developer', 'it_1c', 'it_tester']:
-                                try:
-                                    detail_response = self.session.get(
-                                        f"https://api.hh.ru/vacancies/{vacancy_id}",
-                                        timeout=3
-                                    )
-                                    if detail_response.status_code == 200:
-                                        vacancy_detail = detail_response.json()
-                                        full_description = vacancy_detail.get('description', '').lower()
-                                        
-                                        # Для IT: проверяем что не высокие требования
-                                        it_exclude_terms = [
-                                            'senior', 'lead', 'team lead', 'архитектор',
-                                            'руководитель', 'управление командой',
-                                            '5+ лет', '6+ лет', '7+ лет', 'более 5 лет',
-                                            'опыт от 5 лет', 'опыт от 6 лет'
-                                        ]
-                                        
-                                        if any(term in full_description for term in it_exclude_terms):
-                                            continue
-                                        
-                                        description_text = full_description
-                                    else:
-                                        description_text = snippet_text
-                                except:
-                                    description_text = snippet_text
-                            else:
-                                description_text = snippet_text
-                            
-                            # ВСЕ ФИЛЬТРЫ ПРОЙДЕНЫ - обрабатываем
-                            
-                            # Зарплата
-                            salary_data = item.get('salary')
-                            salary_from = None
-                            salary_to = None
-                            
-                            if salary_data:
-                                salary_from = salary_data.get('from')
-                                salary_to = salary_data.get('to')
-                                
-                                if salary_data.get('currency') != 'RUR':
-                                    rate = 90 if salary_data.get('currency') == 'USD' else 100 if salary_data.get('currency') == 'EUR' else 1
-                                    if salary_from:
-                                        salary_from = int(salary_from * rate)
-                                    if salary_to:
-                                        salary_to = int(salary_to * rate)
-                            
-                            # Формат работы
-                            schedule = item.get('schedule', {})
-                            schedule_id = schedule.get('id', '')
-                            
-                            if schedule_id == 'remote':
-                                work_format = 'remote'
-                            elif schedule_id == 'flexible':
-                                work_format = 'hybrid'
-                            else:
-                                work_format = 'office'
-                            
-                            # Уточняем по названию
-                            if 'удален' in name or 'remote' in name:
-                                work_format = 'remote'
-                            elif 'гибрид' in name or 'hybrid' in name:
-                                work_format = 'hybrid'
-                            
-                            # Навыки
-                            skills_list = item.get('key_skills', [])
-                            skills = ', '.join([skill['name'] for skill in skills_list])
-                            
-                            # Описание
-                            cleaned_description = self.clean_html_tags(description_text)
-                            cleaned_description = self.clean_text_safe(cleaned_description)[:2000]
-                            
-                            # Релевантность
-                            relevance_score = self.calculate_relevance(name, description_text, 
-                                                                      experience_id, work_format, 
-                                                                      salary_from, category)
-                            
-                            # Формируем вакансию
-                            vacancy = {
-                                'hh_id': int(vacancy_id),
-                                'name': self.clean_text_safe(item.get('name', '')),
-                                'company': self.clean_text_safe(item.get('employer', {}).get('name', '')),
-                                'salary_from': salary_from,
-                                'salary_to': salary_to,
-                                'url': item.get('alternate_url', f'https://hh.ru/vacancy/{vacancy_id}'),
-                                'skills': self.clean_text_safe(skills)[:500],
-                                'description': cleaned_description,
-                                'work_format': work_format,
-                                'city': city,
-                                'category': category,
-                                'relevance_score': relevance_score
-                            }
-                            
-                            # Проверяем дубликаты
-                            if not any(v['hh_id'] == vacancy['hh_id'] for v in all_vacancies):
-                                all_vacancies.append(vacancy)
-                                
-                                salary_display = ""
-                                if salary_from or salary_to:
-                                    salary_display = f" ({salary_from or '?'}-{salary_to or '?'} руб)"
-                                
-                                exp_display = ""
-                                if experience_id == 'noExperience':
-                                    exp_display = " | без опыта"
-                                elif experience_id == 'between1And3':
-                                    exp_display = " | 1-3 года"
-                                
-                                print(f"✅ {category}: {vacancy['name'][:50]}{exp_display}{salary_display}")
-                            
-                        except Exception as e:
-                            continue
+                    candidate = self.check_item(item, category_type)
                     
-                    time.sleep(0.5)
+                except Exception as e:
+                    print(f"⚠️ Ошибка обработки вакансии {item.get('id')}: {e}")
+                    continue
                 
-            except Exception as e:
-                print(f"⚠️ Ошибка запроса: {e}")
+                if candidate:
+                    yield candidate
+                else:
+                    self.reject(item, category_type)
+    
+    def reject(self, item, category_type, vacancy_detail=None):
+        """Отсеянный кандидат - в архив rejected_items (фильтры и classify - разные потоки)"""
+        if self.rejected is None:
+            return
+        with self.rejected_lock:
+            self.rejected.add((f"tyumen_{category_type}", item, vacancy_detail))
+    
+    @staticmethod
+    def archive_rejected(rejected):
+        """Пачка отсеянных в rejected_items - ошибка архива обход не останавливает"""
+        try:
+            return save_rejected_items(rejected)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить отсеянные элементы поиска: {e}")
+            return 0, 0, len(rejected)
+    
+    def enrich(self, candidates):
+        """Стадия 3: полные описания для IT - параллельными пачками"""
+        for batch in batched(candidates, self.fetcher.max_workers * 4):
+            it_ids = [c[1] for c in batch if c[4] in IT_CATEGORIES]
+            details = self.fetcher.fetch_many(it_ids, timeout=3)
+            for candidate in batch:
+                yield candidate, details.get(candidate[1])
+    
+    def classify(self, enriched, archive=True):
+        """Стадия 4: ФИЛЬТР 6 по полному описанию, очистка, релевантность пачками -> вакансии
+        
+        С process_workers > 1 пачки обрабатываются в пуле процессов (classify_batch),
+        результаты возвращаются в исходном порядке.
+        """
+        # Результаты идут в порядке входа - по ним находится кандидат отсеянной вакансии
+        pending = deque()
+        
+        def remember(entries):
+            for entry in entries:
+                pending.append(entry)
+                yield entry
+        
+        stage = ProcessStage(partial(classify_batch, archive=archive), self.process_workers)
+        for vacancy, error in stage.run(remember(enriched)):
+            candidate, vacancy_detail = pending.popleft()
+            if error:
+                print(f"⚠️ Ошибка обработки вакансии {candidate[1]}: {error}")
+                continue
+            if vacancy is None:
+                # ФИЛЬТР 6 по полному описанию - в архив вместе с деталями
+                self.reject(candidate[0], candidate[7], vacancy_detail)
                 continue
+            
+            # Проверяем дубликаты
+            if vacancy['hh_id'] in self.seen_ids:
+                continue
+            self.seen_ids.add(vacancy['hh_id'])
+            
+            salary_display = ""
+            if vacancy['salary_from'] or vacancy['salary_to']:
+                salary_display = f" ({vacancy['salary_from'] or '?'}-{vacancy['salary_to'] or '?'} руб)"
+            
+            exp_display = ""
+            if vacancy['experience'] == 'noExperience':
+                exp_display = " | без опыта"
+            elif vacancy['experience'] == 'between1And3':
+                exp_display = " | 1-3 года"
+            
+            print(f"✅ {vacancy['category']}: {vacancy['name'][:50]}{exp_display}{salary_display}")
+            
+            yield vacancy
+    
+    @staticmethod
+    def build_vacancy(item, vacancy_id, name, city, category, snippet_text, experience_id,
+                      category_type, vacancy_detail, archive=True):
+        """Вакансия без релевантности -> (вакансия, текст для релевантности) или None, если отсеяна
+
+        archive=False (--reprocess) - исходный JSON уже в архиве, заново не упаковываем.
+        """
+        if vacancy_detail:
+            full_description = vacancy_detail.get('description', '').lower()
+            
+            # Для IT: проверяем что не высокие требования
+            if not MATCHER.find(full_description).isdisjoint(IT_EXCLUDE_TERMS):
+                return None
+            
+            description_text = full_description
+        else:
+            description_text = snippet_text
+        
+        # ВСЕ ФИЛЬТРЫ ПРОЙДЕНЫ - обрабатываем
         
-        print(f"\n🎯 ИТОГО найдено подходящих вакансий: {len(all_vacancies)}")
-        return all_vacancies
+        # Зарплата в рублях по общим курсам (currency.py)
+        salary_from, salary_to = RATES.salary(item.get('salary'))
+        
+        # Формат работы
+        schedule = item.get('schedule', {})
+        schedule_id = schedule.get('id', '')
+        
+        if schedule_id == 'remote':
+            work_format = 'remote'
+        elif schedule_id == 'flexible':
+            work_format = 'hybrid'
+        else:
+            work_format = 'office'
+        
+        # Уточняем по названию
+        name_hits = MATCHER.find(name)
+        if 'удален' in name_hits or 'remote' in name_hits:
+            work_format = 'remote'
+        elif 'гибрид' in name_hits or 'hybrid' in name_hits:
+            work_format = 'hybrid'
+        
+        # Навыки: key_skills отдают только детали вакансии (загружаются для IT)
+        skills_list = (vacancy_detail or {}).get('key_skills') or item.get('key_skills', [])
+        skills = ', '.join([skill['name'] for skill in skills_list])
+        
+        # Описание
+        cleaned_description = html_to_text(description_text, 2000)
+        
+        # Формируем вакансию - текстовые поля нормализуются один раз здесь,
+        # experience нужен только для релевантности и в БД не пишется
+        company = normalize_text(item.get('employer', {}).get('name', ''), FIELD_LIMITS['company'])
+        vacancy = {
+            'hh_id': int(vacancy_id),
+            'name': normalize_text(item.get('name', ''), FIELD_LIMITS['name']),
+            'company': company,
+            'company_key': company_key(company) if COMPANY_CONFIG['normalize'] else None,
+            'crawl_profile': f"tyumen_{category_type}",
+            'salary_from': salary_from,
+            'salary_to': salary_to,
+            'url': item.get('alternate_url', f'https://hh.ru/vacancy/{vacancy_id}'),
+            'skills': normalize_text(skills, 500),
+            'skill_names': skill_names([skill['name'] for skill in skills_list]),
+            'description': cleaned_description,
+            'work_format': work_format,
+            'city': normalize_text(city, FIELD_LIMITS['city']),
+            'category': category,
+            'experience': experience_id,
+            # Исходный JSON для разбора заново без API (vacancy_details.raw_json),
+            # профиль хранит тип запроса - от него зависит категория
+            'raw_json': (pack_raw_payload(item, vacancy_detail, f"tyumen_{category_type}")
+                         if archive and RAW_PAYLOAD_CONFIG['store'] else None)
+        }
+        
+        return vacancy, f"{name} {description_text}"
     
-    def categorize_vacancy(self, name, snippet_text, search_type):
+    def get_tyumen_vacancies_strict(self, date_from_by_type=None):
+        """СТРОГИЙ поиск: офисные + IT/технические вакансии
+        
+        date_from_by_type - начало окна для каждого типа запроса (инкрементальный
+        режим); типы, обход которых прошел без ошибок, попадают в completed_types.
+        
+        Генератор: страницы, фильтры, детали и классификация работают конвейером
+        через ограниченные очереди, вакансии отдаются по мере готовности.
+        """
+        self.completed_types = []
+        self.seen_ids = set()  # hh_id уже найденных вакансий - проверка дубликатов за O(1)
+        found_count = 0
+        
+        pages = buffered(self.iter_search_pages(date_from_by_type or {}))
+        candidates = self.filter_items(pages)
+        enriched = buffered(self.enrich(candidates))
+        
+        for vacancy in self.classify(enriched):
+            found_count += 1
+            yield vacancy
+        
+        if self.rejected is not None:
+            self.rejected.flush()
+        
+        print(f"\n🎯 ИТОГО найдено подходящих вакансий: {found_count}")
+        print(f"⏭️ Пропущено уже сохраненных в БД: {self.skipped_known}")
+    
+    def categorize_vacancy(self, name, snippet_text, search_type, name_hits=None):
         """Категоризация с проверкой соответствия"""
-        text = f"{name} {snippet_text}"
+        # Совпадения по названию и по названию со сниппетом - из автомата
+        if name_hits is None:
+            name_hits = MATCHER.find(name)
+        text_hits = name_hits | MATCHER.find(snippet_text)
         
         # IT/Технические категории (строго по ключевым словам)
-        if 'аналитик' in name and ('системн' in text or 'бизнес' in text or 'данн' in text):
+        if 'аналитик' in name_hits and ('системн' in text_hits or 'бизнес' in text_hits or 'данн' in text_hits):
             return 'it_analyst'
         
-        if 'sql' in text or 'баз данн' in text or 'data analyst' in text:
-            if 'аналитик' in name or 'специалист' in name:
+        if 'sql' in text_hits or 'баз данн' in text_hits or 'data analyst' in text_hits:
+            if 'аналитик' in name_hits or 'специалист' in name_hits:
                 return 'it_analyst'
         
-        if '1с' in name or '1c' in name:
-            if any(kw in text for kw in ['программист', 'разработчик', 'специалист']):
+        if '1с' in name_hits or '1c' in name_hits:
+            if any(kw in text_hits for kw in ['программист', 'разработчик', 'специалист']):
                 return 'it_1c'
         
-        if any(kw in name for kw in ['тестировщик', 'qa', 'quality assurance']):
+        if any(kw in name_hits for kw in ['тестировщик', 'qa', 'quality assurance']):
             return 'it_tester'
         
-        if any(kw in name for kw in ['junior разработчик', 'младший программист', 
-                                     'стажер программист', 'программист стажер']):
-            if not any(kw in name for kw in ['senior', 'ведущий', 'старший']):
+        if any(kw in name_hits for kw in ['junior разработчик', 'младший программист', 
+                                          'стажер программист', 'программист стажер']):
+            if not any(kw in name_hits for kw in ['senior', 'ведущий', 'старший']):
                 return 'it_developer'
         
         # Офисные категории
         if search_type == 'office':
-            if 'офис-менеджер' in name or 'офисный' in name:
+            if 'офис-менеджер' in name_hits or 'офисный' in name_hits:
                 return 'office_manager'
             
-            if any(kw in name for kw in ['помощник руководителя', 'помощник директора', 
-                                        'ассистент руководителя']):
+            if any(kw in name_hits for kw in ['помощник руководителя', 'помощник директора', 
+                                              'ассистент руководителя']):
                 return 'assistant'
             
-            if 'делопроизводитель' in name or 'канцелярия' in name:
+            if 'делопроизводитель' in name_hits or 'канцелярия' in name_hits:
                 return 'clerk'
             
-            if 'архивариус' in name or 'архив' in name:
+            if 'архивариус' in name_hits or 'архив' in name_hits:
                 return 'archivist'
             
-            if 'документовед' in name or 'документ' in name:
+            if 'документовед' in name_hits or 'документ' in name_hits:
                 return 'document_specialist'
             
-            if 'ресепшионист' in name or 'приемная' in name:
+            if 'ресепшионист' in name_hits or 'приемная' in name_hits:
                 return 'receptionist'
             
-            if any(kw in name for kw in ['оператор данн', 'ввод данн', 'обработк данн']):
+            if any(kw in name_hits for kw in ['оператор данн', 'ввод данн', 'обработк данн']):
                 return 'data_operator'
         
         return 'excluded'  # Не подходит ни под одну категорию
     
-    def calculate_relevance(self, name, description, experience_id, work_format, salary_from, category):
-        """Расчет релевантности"""
-        score = 5
-        text = f"{name} {description}"
-        
-        # Опыт
-        if experience_id == 'noExperience':
-            score += 3
-        elif experience_id == 'between1And3':
-            score += 2
-        elif experience_id == 'between3And6':
-            score += 1
-        
-        # Формат работы
-        if work_format == 'remote':
-            score += 2
-        elif work_format == 'hybrid':
-            score += 1
-        
-        # Зарплата (оптимальный диапазон)
-        if salary_from:
-            if 30000 <= salary_from <= 60000:  # Для начинающих
-                score += 2
-            elif salary_from > 60000:  # Высокая ЗП - может быть сложно
-                score -= 1
-        
-        # Ключевые слова для начинающих
-        if any(kw in text for kw in ['без опыта', 'начинающий', 'стажер', 'студент', 'обучение']):
-            score += 2
-        
-        # Для IT: бонус за конкретные технологии
-        if category in ['it_analyst', 'it_developer', 'it_1c', 'it_tester']:
-            if any(tech in text for tech in ['python', 'sql', '1с', 'excel', 'tableau']):
-                score += 1
-        
-        return min(max(score, 1), 10)  # Ограничиваем 1-10
+    @staticmethod
+    def calculate_relevance(vacancies, text_hits):
+        """Релевантность пачки: опыт, формат, зарплата, слова для начинающих и технологии IT"""
+        return SCORER.score_batch(vacancies, text_hits)
 
-def save_to_db_strict(vacancies):
-    """Сохранение в БД"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+def classify_batch(batch, archive=True):
+    """Вакансии из пачки (кандидат, детали) с релевантностью -> [(вакансия, ошибка)]
     
-    new_count = 0
-    duplicate_count = 0
-    error_count = 0
+    (вакансия, None) - готова, (None, None) - отсеяна по полному описанию,
+    (None, текст ошибки) - не разобрана. Функция уровня модуля: с --workers
+    ее выполняют процессы пула. Релевантность берется из памяти по хэшу текста
+    и полей, от которых она зависит, считается (пачкой) только для нового.
+    """
+    results = []
+    by_key = {}  # ключ содержимого -> (текст, вакансии пачки с таким содержимым)
+    for candidate, vacancy_detail in batch:
+        try:
+            built = TyumenOfficeITJobs.build_vacancy(*candidate, vacancy_detail, archive)
+        except Exception as e:
+            results.append((None, str(e)))
+            continue
+        if not built:
+            results.append((None, None))
+            continue
+        vacancy, text = built
+        results.append((vacancy, None))
+        key = content_key(SCORER.version, text, vacancy['category'], vacancy['experience'],
+                          vacancy['work_format'], vacancy['salary_from'], vacancy['salary_to'])
+        by_key.setdefault(key, (text, []))[1].append(vacancy)
     
-    parser = TyumenOfficeITJobs()
+    known = MEMO.get_many(list(by_key)) if MEMO else {}
+    new_keys = [key for key in by_key if key not in known]
+    if new_keys:
+        vacancies = [by_key[key][1][0] for key in new_keys]
+        text_hits = [MATCHER.find(by_key[key][0]) for key in new_keys]
+        scores = TyumenOfficeITJobs.calculate_relevance(vacancies, text_hits)
+        computed = {key: (vacancy['category'], score, ())
+                    for key, vacancy, score in zip(new_keys, vacancies, scores)}
+        if MEMO:
+            MEMO.put_many(computed)
+        known.update(computed)
+    
+    for key, (_, vacancies) in by_key.items():
+        _, score, _ = known[key]
+        for vacancy in vacancies:
+            vacancy['relevance_score'] = score
+    return results
+
+def save_to_db_strict(vacancies, refresh=False):
+    """Сохранение в БД (текстовые поля уже нормализованы в classify)"""
+    rows = []
+    error_count = 0
     
     for vac in vacancies:
         try:
-            clean_data = (
+            clean_row = (
                 vac['hh_id'],
-                parser.clean_text_safe(vac['name'])[:500],
-                parser.clean_text_safe(vac['company'])[:255],
+                vac['name'],
+                vac['company'],
                 vac['salary_from'],
                 vac['salary_to'],
                 vac['url'][:500],
-                parser.clean_text_safe(vac['skills'])[:1000],
-                parser.clean_text_safe(vac['description'])[:3000],
-                parser.clean_text_safe(vac['category'])[:50],
+                vac['skills'],
+                vac['description'],
+                vac['category'],
                 vac['relevance_score'],
-                vac['work_format'][:20],
-                parser.clean_text_safe(vac['city'])[:100]
+                vac['work_format'],
+                vac['city'],
+                vac['company_key'],
+                vac['crawl_profile'],
+                vac.get('raw_json')
             )
             
-            cursor.execute("""
-                INSERT INTO vacancies 
-                (hh_id, name, company, salary_from, salary_to, url, skills, 
-                 description, category, relevance_score, work_format, city)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (hh_id) DO NOTHING
-                RETURNING id
-            """, clean_data)
-            
-            if cursor.fetchone():
-                new_count += 1
-            else:
-                duplicate_count += 1
+            validate_vacancy_row(clean_row)
+            rows.append(clean_row)
                 
         except Exception as e:
             error_count += 1
             print(f"❌ Ошибка сохранения вакансии {vac['hh_id']}: {e}")
     
-    conn.commit()
+    # Одна вставка на всю пачку вместо запроса на каждую вакансию, навыки - в той же транзакции
+    skills = {vac['hh_id']: vac.get('skill_names', ()) for vac in vacancies}
+    with connection() as conn:
+        new_count, duplicate_count, failed = insert_vacancy_rows(conn, rows, refresh=refresh,
+                                                                 skills=skills)
+    for row, e in failed:
+        error_count += 1
+        print(f"❌ Ошибка сохранения вакансии {row[0]}: {e}")
     
-    # Статистика
-    cursor.execute("SELECT COUNT(*) FROM vacancies WHERE city LIKE '%Тюмен%'")
-    total_tyumen = cursor.fetchone()[0]
+    return new_count, duplicate_count, error_count
+
+def reprocess_archive(process_workers=None):
+    """Архив исходного JSON через текущие фильтры, категории и релевантность - без сети
+    
+    Элементы поиска идут через filter_items под своим типом запроса (из
+    профиля tyumen_<тип>), детали - из архива, если они были загружены и
+    вакансия по-прежнему IT. Прошедшие фильтры перезаписываются пачками как
+    при --refresh-days, не прошедшие остаются в БД как были.
+    
+    Затем так же проверяются отсеянные при обходе кандидаты (rejected_items).
+    Детали IT-вакансий - из архива или локального кэша деталей, без них
+    описанием служит сниппет, как при таймауте деталей во время обхода.
+    -> (проверено, записано, не прошли фильтры)
+    """
+    parser = TyumenOfficeITJobs(process_workers=process_workers)
+    parser.rejected = None  # разбор архива его не пополняет
+    profiles = {f"tyumen_{category_type}": category_type for category_type in SEARCH_QUERIES}
+    sink = BatchSink(lambda batch: save_to_db_strict(batch, refresh=True))
+    checked = 0
+    passed = 0
+    
+    def replay(payloads, archive):
+        """Пачка архива через filter_items и classify; archive=True - отсеянные кандидаты"""
+        details = {payload['item']['id']: payload['detail'] for payload in payloads}
+        pages = [(category_type, [payload['item'] for payload in payloads
+                                  if profiles[payload['profile']] == category_type])
+                 for category_type in SEARCH_QUERIES]
+        
+        def enrich(candidates):
+            for candidate in candidates:
+                vacancy_detail = None
+                if candidate[4] in IT_CATEGORIES:
+                    vacancy_detail = details[candidate[1]]
+                    if vacancy_detail is None and archive and parser.cache:
+                        cached = parser.cache.get(candidate[1])
+                        vacancy_detail = cached[0] if cached else None
+                yield candidate, vacancy_detail
+        
+        return parser.classify(enrich(parser.filter_items(pages)), archive=archive)
     
-    cursor.execute("""
-        SELECT category, COUNT(*) 
-        FROM vacancies 
-        WHERE city LIKE '%Тюмен%' 
-        GROUP BY category 
-        ORDER BY COUNT(*) DESC
-    """)
-    categories_stats = cursor.fetchall()
+    # Архив уже есть - заново не упаковываем (NULL не затирает raw_json)
+    for payloads in iter_raw_payloads(profiles):
+        for vacancy in replay(payloads, archive=False):
+            sink.add(vacancy)
+            passed += 1
+        checked += len(payloads)
     
-    cursor.close()
-    conn.close()
+    # Новые вакансии архивируются как при обходе
+    for payloads in iter_rejected_items(profiles):
+        for vacancy in replay(payloads, archive=True):
+            sink.add(vacancy)
+            passed += 1
+        checked += len(payloads)
+    sink.flush()
+    
+    if parser.cache:
+        parser.cache.close()
+    return checked, passed, checked - passed
+
+def tyumen_db_stats():
+    """Статистика по Тюмени в БД: всего и по категориям"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COUNT(*) FROM vacancies WHERE city LIKE '%Тюмен%'")
+        total_tyumen = cursor.fetchone()[0]
+        
+        cursor.execute("""
+            SELECT category, COUNT(*) 
+            FROM vacancies 
+            WHERE city LIKE '%Тюмен%' 
+            GROUP BY category 
+            ORDER BY COUNT(*) DESC
+        """)
+        categories_stats = cursor.fetchall()
+        
+        cursor.close()
     
-    return new_count, duplicate_count, error_count, total_tyumen, categories_stats
+    return total_tyumen, categories_stats
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Парсер вакансий Тюмени (офисные + IT)")
+    arg_parser.add_argument('--full', action='store_true',
+                            help="полный обход за 30 дней вместо вакансий с прошлого запуска")
+    arg_parser.add_argument('--refresh-days', type=int, default=None,
+                            help="перезагрузить вакансии, обновленные в БД больше N дней назад")
+    arg_parser.add_argument('--workers', type=int, default=0,
+                            help="процессов для очистки и классификации (по умолчанию - в основном процессе)")
+    arg_parser.add_argument('--reprocess', action='store_true',
+                            help="разобрать архив исходного JSON и отсеянных кандидатов текущими "
+                                 "фильтрами и правилами и выйти (без сети: детали IT - из архива "
+                                 "или локального кэша, иначе сниппет)")
+    args = arg_parser.parse_args()
+    
+    if args.reprocess:
+        checked, passed, rejected = reprocess_archive(args.workers)
+        print(f"✅ Архив разобран заново: {checked} вакансий, записано {passed}, "
+              f"не проходят текущие фильтры {rejected} (оставлены как были)")
+        raise SystemExit(0)
+    
     print(f"🕒 {datetime.now()} - Парсер Тюмень (офисные + IT)")
     print("📍 Город: Тюмень")
     print("🎯 Категории: офисные, административные, IT/технические (только начинающие)")
@@ -500,13 +711,63 @@ if __name__ == "__main__":
     print("💼 Уровень: без опыта, junior, младший специалист")
     print("=" * 70)
     
-    parser = TyumenOfficeITJobs()
-    vacancies = parser.get_tyumen_vacancies_strict()
+    try:
+        known_ids = load_known_ids(args.refresh_days)
+        print(f"🗂️ Уже в БД: {len(known_ids)} вакансий - детали для них не загружаем")
+    except Exception as e:
+        print(f"⚠️ Не удалось загрузить известные hh_id: {e}")
+        known_ids = set()
+    
+    # Секции vacancies текущего и следующих месяцев - до первой вставки
+    try:
+        created = ensure_partitions()
+        if created:
+            print(f"🗓️ Созданы секции: {', '.join(created)}")
+    except Exception as e:
+        print(f"⚠️ Не удалось проверить секции vacancies: {e}")
+    
+    # Инкрементальный режим: по каждому типу запроса - с прошлого успешного запуска
+    run_started = datetime.now()
+    date_from_by_type = {}
+    if not args.full:
+        try:
+            for category_type in SEARCH_QUERIES:
+                date_from_by_type[category_type] = incremental_date_from(
+                    f"tyumen_{category_type}", days=30)
+        except Exception as e:
+            print(f"⚠️ Не удалось прочитать состояние обхода, делаем полный: {e}")
+            date_from_by_type = {}
+    
+    parser = TyumenOfficeITJobs(known_ids=known_ids, process_workers=args.workers)
+    refresh = bool(args.refresh_days)
+    
+    # Пишем в БД пачками прямо по ходу обхода - падение не теряет уже найденное
+    sink = BatchSink(lambda batch: save_to_db_strict(batch, refresh=refresh))
+    categories_found = {}
+    formats_found = {}
+    top_vacancies = []  # куча из 10 самых релевантных
+    found_count = 0
+    
+    for vac in parser.get_tyumen_vacancies_strict(date_from_by_type):
+        sink.add(vac)
+        found_count += 1
+        
+        # Статистика из найденных
+        categories_found[vac['category']] = categories_found.get(vac['category'], 0) + 1
+        formats_found[vac['work_format']] = formats_found.get(vac['work_format'], 0) + 1
+        
+        entry = (vac['relevance_score'], -found_count, vac)
+        if len(top_vacancies) < 10:
+            heapq.heappush(top_vacancies, entry)
+        else:
+            heapq.heappushpop(top_vacancies, entry)
+    sink.flush()
     
-    print(f"\n📊 Найдено подходящих вакансий: {len(vacancies)}")
+    print(f"\n📊 Найдено подходящих вакансий: {found_count}")
     
-    if vacancies:
-        new_count, duplicate_count, error_count, total_tyumen, categories_stats = save_to_db_strict(vacancies)
+    if found_count:
+        new_count, duplicate_count, error_count = sink.counts()
+        total_tyumen, categories_stats = tyumen_db_stats()
         
         print(f"\n💾 Результаты сохранения:")
         print(f"  Новых: {new_count}")
@@ -514,17 +775,6 @@ if __name__ == "__main__":
         print(f"  Ошибок: {error_count}")
         print(f"  Всего по Тюмени в БД: {total_tyumen}")
         
-        # Статистика из найденных
-        categories_found = {}
-        formats_found = {}
-        
-        for vac in vacancies:
-            cat = vac['category']
-            fmt = vac['work_format']
-            
-            categories_found[cat] = categories_found.get(cat, 0) + 1
-            formats_found[fmt] = formats_found.get(fmt, 0) + 1
-        
         print(f"\n📊 Категории найденных:")
         for cat, count in sorted(categories_found.items(), key=lambda x: x[1], reverse=True):
             print(f"  {cat}: {count}")
@@ -535,7 +785,7 @@ if __name__ == "__main__":
         
         # Топ по релевантности
         print(f"\n🏆 Топ-10 по релевантности:")
-        sorted_vacancies = sorted(vacancies, key=lambda x: x['relevance_score'], reverse=True)[:10]
+        sorted_vacancies = [vac for _, _, vac in sorted(top_vacancies, reverse=True)]
         for i, vac in enumerate(sorted_vacancies, 1):
             salary = ""
             if vac['salary_from'] or vac['salary_to']:
@@ -543,4 +793,19 @@ if __name__ == "__main__":
             print(f"  {i}. [{vac['relevance_score']}/10] {vac['category']}: {vac['name'][:55]}{salary}")
             
     else:
-        print("❌ Подходящих вакансий не найдено")
\ No newline at end of file
+        print("❌ Подходящих вакансий не найдено")
+    
+    # Отметки двигаем только для типов, обход которых прошел без ошибок
+    for category_type in parser.completed_types:
+        try:
+            set_watermark(f"tyumen_{category_type}", run_started)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить отметку обхода {category_type}, "
+                  f"следующий запуск повторит это окно: {e}")
+    
+    if MEMO and args.workers <= 1:
+        print(f"\n{MEMO.summary()}")
+    
+    if parser.cache:
+        print(f"\n{parser.cache.summary()}")
+        parser.cache.close()
@@ -0,0 +1,107 @@
+from collections import deque
+
+try:
+    import ahocorasick
+except ImportError:  # без pyahocorasick работает такой же автомат на чистом Python
+    ahocorasick = None
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """Автомат Ахо-Корасик: все ключевые слова из всех списков за один проход по тексту
+
+    Строится один раз из любого набора списков, scan() возвращает множества
+    найденных слов - дальше фильтры, категории и релевантность работают
+    с пересечениями множеств вместо циклов `kw in text` по каждому списку.
+    Поиск регистронезависимый: шаблоны и текст приводятся к нижнему регистру.
+
+    Целое слово - вхождение, по краям которого нет букв и цифр: пробел,
+    знак препинания или край текста ("python," и "(sql)" считаются словами).
+    """
+
+    def __init__(self, *keyword_lists):
+        self.patterns = sorted({kw.lower() for keywords in keyword_lists for kw in keywords if kw})
+
+        entries = [(pattern, (pattern, len(pattern))) for pattern in self.patterns]
+
+        if ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for key, value in entries:
+                self.automaton.add_word(key, value)
+            self.automaton.make_automaton()
+        else:
+            self.automaton = None
+            self._build(entries)
+
+    def _build(self, entries):
+        # Бор: goto[state][char] -> state, out[state] -> найденные в этом состоянии слова
+        goto = [{}]
+        out = [()]
+        for key, value in entries:
+            state = 0
+            for char in key:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    out.append(())
+                state = next_state
+            out[state] = out[state] + (value,)
+
+        # Ссылки неудач обходом в ширину. Переходы по ним сразу вписываются
+        # в goto (полный автомат), поэтому в scan() на символ - один поиск в dict
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            out[state] = out[state] + out[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = goto[fail[state]].get(char, 0)
+                queue.append(child)
+            for char, fallback in goto[fail[state]].items():
+                goto[state].setdefault(char, fallback)
+
+        self.goto = goto
+        self.out = out
+
+    def _occurrences(self, text):
+        """-> [(позиция последнего символа, (шаблон, длина))] всех вхождений"""
+        if self.automaton is not None:
+            return self.automaton.iter(text)
+
+        occurrences = []
+        goto = self.goto
+        out = self.out
+        state = 0
+        for position, char in enumerate(text):
+            state = goto[state].get(char, 0)
+            if out[state]:
+                occurrences.extend((position, value) for value in out[state])
+        return occurrences
+
+    def scan(self, text):
+        """-> (найденные подстроки, найденные целыми словами)"""
+        found = set()
+        words = set()
+        if not text:
+            return found, words
+
+        text = text.lower()
+        last = len(text) - 1
+        for end, (pattern, length) in self._occurrences(text):
+            found.add(pattern)
+            if pattern in words:
+                continue
+            start = end - length + 1
+            if (start == 0 or not _is_word_char(text[start - 1])) and \
+                    (end == last or not _is_word_char(text[end + 1])):
+                words.add(pattern)
+        return found, words
+
+    def find(self, text):
+        """Множество ключевых слов, встречающихся в тексте как подстроки"""
+        return self.scan(text)[0]
@@ -1,84 +1,102 @@
-import requests
-import psycopg2
-import time
-import re
-from datetime import datetime, timedelta
-from config import DB_CONFIG, KEYWORDS, GEO_CONFIG
+import argparse
+from functools import partial
+from datetime import datetime
+from config import KEYWORDS, COMPANY_CONFIG, MEMO_CONFIG, RAW_PAYLOAD_CONFIG
+from hh_client import DetailFetcher, HHSession
+from detail_cache import open_default_cache
+from category_rules import RuleWatcher
+from classification_memo import ClassificationMemo, content_key, fingerprint
+from text_normalizer import FIELD_LIMITS, company_key, html_to_text, normalize_text, skill_names
+from relevance import RelevanceScorer, rescore_table
+from search_planner import SearchPlanner
+from currency import RATES
+from partitions import ensure_partitions
+from pipeline import BatchSink, ProcessStage, batched, buffered
+from storage import (connection, incremental_date_from, insert_vacancy_rows, iter_raw_payloads,
+                     iter_rejected_items, load_known_ids, pack_raw_payload, save_rejected_items,
+                     set_watermark, validate_vacancy_row)
 
-class HHParser:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'HH-Parser/1.0',
-            'Accept': 'application/json'
-        })
-    
-    def clean_text(self, text):
-        """Простая и надежная очистка через encode/decode"""
-        if not text:
-            return ""
-        
-        try:
-            cleaned_text = text.encode('utf-8', 'ignore').decode('utf-8')
-            cleaned_text = re.sub(r'[^\w\s\.\,\-\+\!\?\:\;\(\)\"\']', '', cleaned_text)
-            return cleaned_text.strip()
-        except:
-            return ""
-    def clean_text_safe(self, text, max_length=2000):
-        """УЛЬТРА-безопасная очистка для БД"""
-        if not text:
-            return ""
+# Профиль поиска для отметки инкрементального обхода
+CRAWL_PROFILE = 'russia_remote'
 
-        try:
-            # 🔒 Убираем ВСЕ невалидные Unicode-символы (включая \u3164)
-            text = text.encode('utf-8', 'ignore').decode('utf-8')
+# Расширенный список профессий для фильтра по названию
+TARGET_KEYWORDS = [
+    'python', 'sql', 'excel', 'n8n', 'airflow', 'power bi', 'tableau',
+    'data', 'аналитик', 'анализ', 'данн', 'etl', 'dash', 'дашборд',
+    'qa', 'тестировщик', 'тестирование', 'testing', 
+    '1с','1С', 'бухгалтер', 'оператор', 'специалист',
+    'архивариус', 'делопроизводитель', 'документац', 'архив',
+    'confluence', 'автоматизац', 'rpa', 'workflow',
+    'менеджер', 'администратор', 'координатор', 'помощник'
+]
+TARGET_KEYWORD_SET = frozenset(kw.lower() for kw in TARGET_KEYWORDS)
 
-            # Жёсткая очистка
-            cleaned = re.sub(r'[^\w\s\.\,\-\+\!\?\(\)\:\;\@\#\%\&\=\*\\\/]', '', text)
-            cleaned = re.sub(r'\s+', ' ', cleaned)
+# Навыки, которые ищем в тексте описания
+TECH_KEYWORDS = [
+    'python', 'sql', 'excel', 'n8n', 'make.com', 'zapier', 'airflow', 
+    'power bi', 'tableau', 'superset', 'metabase', 'vba', 'pandas',
+    'numpy', 'etl', 'api', 'docker', 'git', 'postgresql', 'mysql',
+    'selenium', 'postman', 'jira', 'confluence','1С'
+]
 
-            return cleaned.strip()[:max_length]
-        except Exception:
-            return text[:max_length] if text else ""
- 
-    def clean_html_tags(self, text):
-        """Очистка текста от HTML тегов"""
-        if not text:
-            return ""
+# Ключевые слова релевантности по уровням, веса уровней - RELEVANCE_PROFILES['main']
+HIGH_PRIORITY_KEYWORDS = ['n8n', 'airflow', 'superset', 'power bi', 'tableau', 'etl', 'dbt']
+MEDIUM_PRIORITY_KEYWORDS = ['python', 'sql', 'pandas', 'vba', 'excel', 'dashboard']
+LOW_PRIORITY_KEYWORDS = ['data', 'analysis', 'автоматизац', 'анализ']
+
+# Правила CATEGORIES и один автомат на все списки: текст вакансии сканируется
+# один раз, фильтр, категория, навыки и релевантность проверяют найденное множество.
+# При изменении config.py или файла правил пересобираются без перезапуска
+RULES = RuleWatcher(
+    KEYWORDS, TARGET_KEYWORDS, TECH_KEYWORDS,
+    HIGH_PRIORITY_KEYWORDS, MEDIUM_PRIORITY_KEYWORDS, LOW_PRIORITY_KEYWORDS
+)
+
+# Релевантность считается пачками одним векторным расчетом (relevance.py)
+SCORER = RelevanceScorer('main', keyword_tiers={
+    'high': HIGH_PRIORITY_KEYWORDS,
+    'medium': MEDIUM_PRIORITY_KEYWORDS,
+    'low': LOW_PRIORITY_KEYWORDS
+})
+
+# Память категорий, релевантности и навыков по содержимому (своя в каждом процессе пула)
+MEMO = ClassificationMemo() if MEMO_CONFIG['enabled'] else None
+SKILLS_VERSION = fingerprint(TECH_KEYWORDS)
+
+class HHParser:
+    def __init__(self, max_workers=None, known_ids=None, process_workers=None):
+        # Все запросы идут через общий лимитер с повтором на 429/503
+        self.session = HHSession('HH-Parser/1.0')
+        self.cache = open_default_cache()
+        self.fetcher = DetailFetcher(self.session, max_workers=max_workers, cache=self.cache)
+        self.planner = SearchPlanner(self.session, max_workers=max_workers)
         
-        text = re.sub(r'(\w+)>', r'<\1>', text)
-        clean_text = re.sub(r'</?[^>]*>', '', text)
+        # hh_id, уже сохраненные в БД: их детали не качаем и не обрабатываем повторно
+        self.known_ids = known_ids if known_ids is not None else set()
+        self.skipped_known = 0
+        self.failed_details = 0
+        self.crawl_completed = False
         
-        html_entities = {
-            '&nbsp;': ' ', '&amp;': '&', '&lt;': '<', 
-            '&gt;': '>', '&quot;': '"', '&apos;': "'"
-        }
-        for entity, replacement in html_entities.items():
-            clean_text = clean_text.replace(entity, replacement)
+        # Отсеянные фильтрами элементы поиска - в архив для --reprocess
+        self.rejected = BatchSink(self.archive_rejected) if RAW_PAYLOAD_CONFIG['store'] else None
         
-        clean_text = re.sub(r'\s+', ' ', clean_text)
-        return clean_text.strip()
+        # Процессы для CPU-стадии classify (--workers), 0/1 - в текущем процессе
+        self.process_workers = process_workers
     
     def extract_skills_from_text(self, text):
         """Извлечение навыков из текста"""
         if not text:
             return "не указаны"
         
-        text_lower = text.lower()
-        tech_keywords = [
-            'python', 'sql', 'excel', 'n8n', 'make.com', 'zapier', 'airflow', 
-            'power bi', 'tableau', 'superset', 'metabase', 'vba', 'pandas',
-            'numpy', 'etl', 'api', 'docker', 'git', 'postgresql', 'mysql',
-            'selenium', 'postman', 'jira', 'confluence','1С'
-        ]
-        
-        found_skills = []
-        for keyword in tech_keywords:
-            if keyword in text_lower:
-                found_skills.append(keyword)
+        found_skills = self.extract_skills(RULES.rules.matcher.find(text))
         
         return ', '.join(found_skills) if found_skills else 'не указаны'
     
+    @staticmethod
+    def extract_skills(found):
+        """Навыки TECH_KEYWORDS среди найденных автоматом подстрок"""
+        return [keyword for keyword in TECH_KEYWORDS if keyword.lower() in found]
+    
     def check_work_format(self, vacancy_item, vacancy_detail):
         """Определяем формат работы"""
         schedule = vacancy_item.get('schedule', {})
@@ -100,314 +118,473 @@ class HHParser:
         # Все остальное - офис (включая гибрид)
         return 'office'
     
-    def parse_salary(self, salary_data):
-        """Корректная обработка зарплаты"""
-        if not salary_data:
-            return None, None
-        
-        salary_from = salary_data.get('from')
-        salary_to = salary_data.get('to')
-        
-        if salary_data.get('currency') != 'RUR':
-            if salary_from:
-                salary_from = salary_from * 70
-            if salary_to:
-                salary_to = salary_to * 70
-        
-        return salary_from, salary_to
+    @staticmethod
+    def parse_salary(salary_data):
+        """Зарплата в рублях по общим курсам (currency.py)"""
+        return RATES.salary(salary_data)
+    
+    @staticmethod
+    def scan_vacancy(vacancy):
+        """Один проход автомата по названию, описанию и навыкам -> (подстроки, целые слова)"""
+        return RULES.rules.scan(f"{vacancy['name']} {vacancy.get('description', '')} {vacancy.get('skills', '')}")
     
-    def categorize_vacancy(self, vacancy):
+    @staticmethod
+    def categorize_vacancy(vacancy, hits=None):
         """Категоризация на основе конфига с приоритетами"""
-        title = vacancy['name'].lower()
-        desc = vacancy.get('description', '').lower()
-        skills = vacancy.get('skills', '').lower()
+        # Ключевые слова категорий считаются только целыми словами
+        _, words = hits or HHParser.scan_vacancy(vacancy)
+        return RULES.rules.categorize(words)
+    
+    @staticmethod
+    def calculate_relevance(vacancies, hits):
+        """Релевантность пачки вакансий с учетом формата работы -> список баллов"""
+        return SCORER.score_batch(vacancies, [found for found, _ in hits])
+    
+    def get_vacancy_details(self, vacancy_id):
+        """Получение детальной информации о вакансии"""
+        return self.fetcher.fetch_one(vacancy_id)
+    
+    @staticmethod
+    def build_vacancy(item, city, work_format, vacancy_detail, archive=True):
+        """Формируем вакансию из элемента поиска и его деталей
+
+        Только нормализованные поля: категорию и релевантность проставляет
+        classify_batch - из памяти классификации или пачкой. archive=False
+        (--reprocess) - исходный JSON уже в архиве, заново не упаковываем.
+        """
+        # Обработка зарплаты
+        salary_from, salary_to = HHParser.parse_salary(item.get('salary'))
         
-        text = f" {title} {desc} {skills} "
+        # Полное описание
+        full_description = ""
+        if vacancy_detail:
+            raw_description = vacancy_detail.get('description', '')
+            full_description = html_to_text(raw_description, 2000)
         
-        from config import CATEGORIES
-        sorted_categories = sorted(CATEGORIES.items(), key=lambda x: x[1]['priority'])
+        # key_skills отдают только детали вакансии, в элементе поиска их нет
+        key_skills = [s['name'] for s in
+                      (vacancy_detail or {}).get('key_skills') or item.get('key_skills', [])]
         
-        for category_name, category_data in sorted_categories:
-            keywords = category_data['keywords']
-            
-            has_keywords = any(f' {kw} ' in text for kw in keywords)
-            
-            if 'exclude' in category_data:
-                has_exclude = any(f' {kw} ' in text for kw in category_data['exclude'])
-                if has_keywords and not has_exclude:
-                    return category_name
-            else:
-                if has_keywords:
-                    return category_name
+        # Все текстовые поля нормализуются здесь один раз и в save_to_db уже не чистятся
+        company = normalize_text(item['employer']['name'], FIELD_LIMITS['company'])
+        vacancy = {
+            'hh_id': int(item['id']),
+            'name': normalize_text(item['name'], FIELD_LIMITS['name']),
+            'company': company,
+            'company_key': company_key(company) if COMPANY_CONFIG['normalize'] else None,
+            'crawl_profile': CRAWL_PROFILE,
+            'salary_from': salary_from,
+            'salary_to': salary_to,
+            'url': item['alternate_url'],
+            'skills': normalize_text(', '.join(key_skills), FIELD_LIMITS['skills']),
+            'skill_names': skill_names(key_skills),
+            'description': full_description,
+            'work_format': work_format,
+            'city': normalize_text(city, FIELD_LIMITS['city']),
+            # Исходный JSON для разбора заново без API (vacancy_details.raw_json)
+            'raw_json': (pack_raw_payload(item, vacancy_detail, CRAWL_PROFILE)
+                         if archive and RAW_PAYLOAD_CONFIG['store'] else None)
+        }
+        return vacancy
+    
+    @staticmethod
+    def check_item(item):
+        """Дешевые фильтры одного элемента поиска -> (item, city, work_format) или None"""
+        # Базовые данные
+        city = item.get('area', {}).get('name', 'Не указан')
         
-        return 'other'
-    
-    def calculate_relevance(self, vacancy, work_format):
-        """Расчет релевантности с учетом локации"""
-        score = 0
-        title = vacancy['name'].lower()
-        desc = vacancy.get('description', '').lower()
-        skills = vacancy.get('skills', '').lower()
+        # 🔥 ФИЛЬТР 1: Формат работы
+        schedule_id = item.get('schedule', {}).get('id', '')
+        work_format = 'remote' if schedule_id == 'remote' else 'office'
         
-        text = f"{title} {desc} {skills}"
+        # ОСНОВНОЙ ФИЛЬТР: Тюмень - все, другие города - только удаленка
+        if city != 'Тюмень' and work_format != 'remote':
+            return None
         
-        high_priority = ['n8n', 'airflow', 'superset', 'power bi', 'tableau', 'etl', 'dbt']
-        medium_priority = ['python', 'sql', 'pandas', 'vba', 'excel', 'dashboard']
-        low_priority = ['data', 'analysis', 'автоматизац', 'анализ']
+        # 🔥 ФИЛЬТР 2: Опыт работы
+        experience_id = item.get('experience', {}).get('id', '')
+        if experience_id not in ['noExperience', 'between1And3']:
+            return None
         
-        for keyword in high_priority:
-            if keyword in text:
-                score += 3
+        # 🔥 ФИЛЬТР 3: Ключевые слова в названии
+        name = item.get('name', '')
         
-        for keyword in medium_priority:
-            if keyword in text:
-                score += 2
-                
-        for keyword in low_priority:
-            if keyword in text:
-                score += 1
+        # Проверяем совпадение с любым ключевым словом
+        has_keyword = not TARGET_KEYWORD_SET.isdisjoint(RULES.rules.matcher.find(name))
+        if not has_keyword:
+            return None
         
-        # Бонус за указание зарплаты
-        if vacancy.get('salary_from') or vacancy.get('salary_to'):
-            score += 2
+        return item, city, work_format
+    
+    def filter_items(self, pages):
+        """Стадия 2: дешевые фильтры по данным поиска -> (item, city, work_format)
         
-        # Бонус за подходящий формат работы
-        if work_format == 'remote':
-            score += 3
-        elif work_format == 'hybrid':
-            score += 2
-        elif work_format == 'office':
-            score += 1
+        Отсеянные элементы копятся в архиве rejected_items (HH_STORE_RAW=1):
+        --reprocess проверит их заново, когда фильтры изменятся.
+        """
+        for page_label, items in pages:
+            print(f"📖 Обрабатывается {page_label}")
             
-        return min(score, 10)
+            for item in items:
+                try:
+                    # 🔥 ФИЛЬТР 0: Уже есть в БД - ON CONFLICT все равно ее выбросит
+                    if int(item['id']) in self.known_ids:
+                        self.skipped_known += 1
+                        continue
+                    
+                    candidate = self.check_item(item)
+                    
+                except Exception as e:
+                    print(f"⚠️ Ошибка обработки вакансии: {e}")
+                    continue
+                
+                if candidate:
+                    yield candidate
+                elif self.rejected is not None:
+                    self.rejected.add((CRAWL_PROFILE, item, None))
+        
+        if self.rejected is not None:
+            self.rejected.flush()
     
-    def get_vacancy_details(self, vacancy_id):
-        """Получение детальной информации о вакансии"""
+    @staticmethod
+    def archive_rejected(rejected):
+        """Пачка отсеянных в rejected_items - ошибка архива обход не останавливает"""
         try:
-            response = self.session.get(
-                f"https://api.hh.ru/vacancies/{vacancy_id}",
-                timeout=10
-            )
-            if response.status_code == 200:
-                return response.json()
+            return save_rejected_items(rejected)
         except Exception as e:
-            print(f"Ошибка получения деталей вакансии {vacancy_id}: {e}")
-        return {}
+            print(f"⚠️ Не удалось сохранить отсеянные элементы поиска: {e}")
+            return 0, 0, len(rejected)
+    
+    def enrich(self, candidates):
+        """Стадия 3: полные описания - параллельно, пачками по несколько на поток"""
+        for batch in batched(candidates, self.fetcher.max_workers * 4):
+            details = self.fetcher.fetch_many([item['id'] for item, _, _ in batch])
+            for item, city, work_format in batch:
+                vacancy_detail = details.get(item['id'])
+                if not vacancy_detail:
+                    # Детали не загрузились: без них вакансию не сохраняем (иначе она
+                    # попадет в known_ids без описания) и отметку обхода не двигаем -
+                    # следующий запуск найдет и загрузит ее снова
+                    self.failed_details += 1
+                    continue
+                yield item, city, work_format, vacancy_detail
     
-    def get_hh_vacancies(self):
-        """Загружаем ВСЕ вакансии одним запросом -> фильтруем на нашей стороне"""
-        url = "https://api.hh.ru/vacancies"
-        all_vacancies = []
+    def classify(self, enriched, archive=True):
+        """Стадия 4: очистка, категория и релевантность пачками -> готовые вакансии
+        
+        С process_workers > 1 пачки обрабатываются в пуле процессов (classify_batch),
+        результаты возвращаются в исходном порядке.
+        """
+        stage = ProcessStage(partial(classify_batch, archive=archive), self.process_workers)
+        for vacancy, error in stage.run(enriched):
+            if error:
+                print(f"⚠️ Ошибка обработки вакансии: {error}")
+                continue
+            print(f"✅ {vacancy['city']}: {vacancy['name'][:50]}... | {vacancy['work_format']}")
+            yield vacancy
+    
+    def get_hh_vacancies(self, date_from=None):
+        """Потоково загружаем ВСЕ вакансии широким запросом -> фильтруем на нашей стороне
+        
+        HH отдает не больше 2000 результатов на запрос, поэтому планировщик
+        дробит 7-дневное окно на подзапросы, каждый из которых помещается в лимит.
+        С date_from (инкрементальный режим) окно начинается с прошлого запуска.
         
-        # ОДИН большой запрос - ВСЕ вакансии России
+        Генератор: страницы, фильтры, детали и классификация работают конвейером
+        через ограниченные очереди, вакансии отдаются по мере готовности.
+        """
+        self.crawl_completed = False
+        self.failed_details = 0
+        found_count = 0
+        
+        # ОДИН большой логический запрос - ВСЕ вакансии России
         params = {
             'text': 'python OR sql OR vba OR excel OR аналитик OR данные OR разработчик OR тестировщик OR 1с OR 1С OR бухгалтер OR оператор OR специалист OR BI аналитик OR n8n OR Airflow OR superset OR Технический писатель',  # Широкий охват
             'area': 113,  # Вся Россия
-            'per_page': 100,  # Максимум на странице
-            'page': 0,
-            'period': 7,  # Только за последние 7 дней (свежие)
         }
         
-        print("🔍 Загружаем ВСЕ подходящие вакансии России за 7 дней...")
+        if date_from:
+            print(f"🔍 Загружаем вакансии России, опубликованные с {date_from:%d.%m.%Y %H:%M}...")
+        else:
+            print("🔍 Загружаем ВСЕ подходящие вакансии России за 7 дней...")
         
         try:
-            response = self.session.get(url, params=params, timeout=15)
-            data = response.json()
+            # Обрабатываем ВСЕ страницы всех подзапросов
+            pages = buffered(self.planner.iter_pages(params, date_from=date_from, days=7))
+            candidates = self.filter_items(pages)
+            enriched = buffered(self.enrich(candidates))
             
-            found = data.get('found', 0)
-            pages = data.get('pages', 1)
+            for vacancy in self.classify(enriched):
+                found_count += 1
+                yield vacancy
             
-            print(f"📨 Найдено вакансий по запросу: {found}")
-            print(f"📄 Страниц для обработки: {pages}")
-            
-            # Обрабатываем ВСЕ страницы
-            for page in range(pages):
-                if page > 0:  # Первую страницу уже загрузили
-                    params['page'] = page
-                    response = self.session.get(url, params=params, timeout=15)
-                    data = response.json()
-                
-                print(f"📖 Обрабатывается страница {page + 1}/{pages}")
-                
-                page_count = 0
-                for item in data.get('items', []):
-                    try:
-                        # Базовые данные
-                        city = item.get('area', {}).get('name', 'Не указан')
-                        vacancy_id = item['id']
-                        
-                        # 🔥 ФИЛЬТР 1: Формат работы
-                        schedule_id = item.get('schedule', {}).get('id', '')
-                        work_format = 'remote' if schedule_id == 'remote' else 'office'
-                        
-                        # ОСНОВНОЙ ФИЛЬТР: Тюмень - все, другие города - только удаленка
-                        if city != 'Тюмень' and work_format != 'remote':
-                            continue
-                        
-                        # 🔥 ФИЛЬТР 2: Опыт работы
-                        experience_id = item.get('experience', {}).get('id', '')
-                        if experience_id not in ['noExperience', 'between1And3']:
-                            continue
-                        
-                        # 🔥 ФИЛЬТР 3: Ключевые слова в названии
-                        name = item.get('name', '').lower()
-                        
-                        # Расширенный список профессий
-                        target_keywords = [
-                            'python', 'sql', 'excel', 'n8n', 'airflow', 'power bi', 'tableau',
-                            'data', 'аналитик', 'анализ', 'данн', 'etl', 'dash', 'дашборд',
-                            'qa', 'тестировщик', 'тестирование', 'testing', 
-                            '1с','1С', 'бухгалтер', 'оператор', 'специалист',
-                            'архивариус', 'делопроизводитель', 'документац', 'архив',
-                            'confluence', 'автоматизац', 'rpa', 'workflow',
-                            'менеджер', 'администратор', 'координатор', 'помощник'
-                        ]
-                        
-                        # Проверяем совпадение с любым ключевым словом
-                        has_keyword = any(keyword in name for keyword in target_keywords)
-                        if not has_keyword:
-                            continue
-                        
-                        # 🔥 ВСЕ фильтры пройдены - сохраняем вакансию
-                        
-                        # Обработка зарплаты
-                        salary_data = item.get('salary')
-                        salary_from = None
-                        salary_to = None
-                        
-                        if salary_data:
-                            salary_from = salary_data.get('from')
-                            salary_to = salary_data.get('to')
-                            
-                            if salary_data.get('currency') != 'RUR':
-                                if salary_from:
-                                    salary_from = salary_from * 70
-                                if salary_to:
-                                    salary_to = salary_to * 70
-                        
-                        # Получаем полное описание
-                        vacancy_detail = self.get_vacancy_details(vacancy_id)
-                        full_description = ""
-                        
-                        if vacancy_detail:
-                            raw_description = vacancy_detail.get('description', '')
-                            full_description = self.clean_html_tags(raw_description)[:2000]
-                        
-                        # Формируем вакансию
-                        vacancy = {
-                            'hh_id': int(vacancy_id),
-                            'name': self.clean_text(item['name']),
-                            'company': self.clean_text(item['employer']['name']),
-                            'salary_from': salary_from,
-                            'salary_to': salary_to,
-                            'url': item['alternate_url'],
-                            'skills': ', '.join([s['name'] for s in item.get('key_skills', [])]),
-                            'description': full_description,
-                            'work_format': work_format,
-                            'city': city
-                        }
-                        
-                        vacancy['category'] = self.categorize_vacancy(vacancy)
-                        vacancy['relevance_score'] = self.calculate_relevance(vacancy, work_format)
-                        
-                        all_vacancies.append(vacancy)
-                        page_count += 1
-                        print(f"✅ {city}: {vacancy['name'][:50]}... | {work_format}")
-                        
-                    except Exception as e:
-                        print(f"⚠️ Ошибка обработки вакансии: {e}")
-                        continue
-                
-                print(f"📊 На странице {page + 1} добавлено: {page_count} вакансий")
-                
-                # Задержка между страницами
-                if page < pages - 1:
-                    time.sleep(0.5)
-            
-            print(f"\n🎯 ИТОГО найдено подходящих вакансий: {len(all_vacancies)}")
+            print(f"\n🎯 ИТОГО найдено подходящих вакансий: {found_count}")
+            print(f"⏭️ Пропущено уже сохраненных в БД: {self.skipped_known}")
+            if self.failed_details:
+                print(f"⚠️ Не загрузились детали {self.failed_details} вакансий - "
+                      f"повторим при следующем запуске")
+            self.crawl_completed = self.planner.failed_pages == 0 and self.failed_details == 0
             
         except Exception as e:
             print(f"❌ Ошибка загрузки: {e}")
             import traceback
             traceback.print_exc()
-        
-        return all_vacancies
 
-def save_to_db(vacancies):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+def classify_batch(batch, archive=True):
+    """Очистка, категория и релевантность пачки (item, city, work_format, детали)
     
-    new_count = 0
-    duplicate_count = 0
-    error_count = 0
+    -> [(вакансия, None) или (None, текст ошибки)] в порядке batch. Функция
+    уровня модуля: с --workers ее выполняют процессы пула, правила категорий
+    каждый процесс перечитывает сам.
     
-    parser = HHParser()  # создаем парсер для очистки
+    Категория, релевантность и навыки из текста берутся из памяти по хэшу
+    нормализованных полей и версии правил, считаются (пачкой) только для
+    нового содержимого.
+    """
+    RULES.refresh()
+    version = RULES.rules.version + SCORER.version + SKILLS_VERSION
+    results = []
+    by_key = {}  # ключ содержимого -> вакансии пачки с таким содержимым
+    for item, city, work_format, vacancy_detail in batch:
+        try:
+            vacancy = HHParser.build_vacancy(item, city, work_format, vacancy_detail, archive)
+        except Exception as e:
+            results.append((None, str(e)))
+            continue
+        results.append((vacancy, None))
+        key = content_key(version, vacancy['name'], vacancy['description'], vacancy['skills'],
+                          vacancy['salary_from'], vacancy['salary_to'], vacancy['work_format'])
+        by_key.setdefault(key, []).append(vacancy)
+    
+    known = MEMO.get_many(list(by_key)) if MEMO else {}
+    new_keys = [key for key in by_key if key not in known]
+    if new_keys:
+        vacancies = [by_key[key][0] for key in new_keys]
+        hits = [HHParser.scan_vacancy(vacancy) for vacancy in vacancies]
+        for vacancy, vacancy_hits in zip(vacancies, hits):
+            vacancy['category'] = HHParser.categorize_vacancy(vacancy, vacancy_hits)
+        scores = HHParser.calculate_relevance(vacancies, hits)
+        computed = {key: (vacancy['category'], score, tuple(HHParser.extract_skills(found)))
+                    for key, vacancy, score, (found, _) in zip(new_keys, vacancies, scores, hits)}
+        if MEMO:
+            MEMO.put_many(computed)
+        known.update(computed)
+    
+    for key, vacancies in by_key.items():
+        category, score, extracted = known[key]
+        for vacancy in vacancies:
+            vacancy['category'] = category
+            vacancy['relevance_score'] = score
+            vacancy['skill_names'] = skill_names(vacancy['skill_names'], extracted)
+    return results
+
+def save_to_db(vacancies, refresh=False):
+    rows = []
+    error_count = 0
     
     for vac in vacancies:
         try:
-            # ИСПОЛЬЗУЕМ ТОЛЬКО clean_text_safe для всех полей
-            clean_vac = (
+            # Текстовые поля уже нормализованы в build_vacancy (normalize_text
+            # идемпотентна) - повторно не чистим, только собираем строку
+            clean_row = (
                 vac['hh_id'],
-                parser.clean_text_safe(vac['name'])[:500],
-                parser.clean_text_safe(vac['company'])[:255], 
+                vac['name'],
+                vac['company'], 
                 vac['salary_from'], 
                 vac['salary_to'], 
                 vac['url'][:500],
-                parser.clean_text_safe(vac['skills'])[:1000],
-                parser.clean_text_safe(vac['description'])[:3000],
-                parser.clean_text_safe(vac['category'])[:50],
+                vac['skills'],
+                vac['description'],
+                vac['category'],
                 vac['relevance_score'], 
-                parser.clean_text_safe(vac['work_format'])[:20], 
-                parser.clean_text_safe(vac['city'])[:100]
+                vac['work_format'], 
+                vac['city'],
+                vac['company_key'],
+                vac['crawl_profile'],
+                vac.get('raw_json')
             )
             
-            cursor.execute("""
-                INSERT INTO vacancies 
-                (hh_id, name, company, salary_from, salary_to, url, skills, 
-                 description, category, relevance_score, work_format, city)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (hh_id) DO NOTHING
-                RETURNING id
-            """, clean_vac)
-            
-            if cursor.fetchone():
-                new_count += 1
-            else:
-                duplicate_count += 1
+            validate_vacancy_row(clean_row)
+            rows.append(clean_row)
                 
         except Exception as e:
             error_count += 1
             print(f"❌ Ошибка сохранения вакансии {vac['hh_id']}: {e}")
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # Одна вставка на всю пачку вместо запроса на каждую вакансию, навыки - в той же транзакции
+    skills = {vac['hh_id']: vac.get('skill_names', ()) for vac in vacancies}
+    with connection() as conn:
+        new_count, duplicate_count, failed = insert_vacancy_rows(conn, rows, refresh=refresh,
+                                                                 skills=skills)
+    for row, e in failed:
+        error_count += 1
+        print(f"❌ Ошибка сохранения вакансии {row[0]}: {e}")
     
     return new_count, duplicate_count, error_count
 
+def reprocess_archive(process_workers=None):
+    """Архив исходного JSON через текущие фильтры, категории и релевантность - без сети
+
+    Стадии те же, что при обходе (filter_items, classify), только страницы
+    поиска и детали берутся из vacancy_details.raw_json. Прошедшие фильтры
+    вакансии перезаписываются пачками как при --refresh-days (итоги и навыки
+    обновляются тем же запросом), не прошедшие остаются в БД как были.
+    
+    Затем так же проверяются отсеянные при обходе элементы поиска (rejected_items).
+    Детали к ним не загружались: берутся из локального кэша деталей, а если
+    их там нет, вакансия ждет обычного обхода.
+    -> (проверено, записано, не прошли фильтры, ждут деталей)
+    """
+    parser = HHParser(process_workers=process_workers)
+    parser.rejected = None  # разбор архива его не пополняет
+    sink = BatchSink(lambda batch: save_to_db(batch, refresh=True))
+    checked = 0
+    passed = 0
+    missing = 0
+    
+    for payloads in iter_raw_payloads({CRAWL_PROFILE}):
+        details = {payload['item']['id']: payload['detail'] or {} for payload in payloads}
+        pages = [(f"архив: {checked + 1}-{checked + len(payloads)}",
+                  [payload['item'] for payload in payloads])]
+        enriched = ((item, city, work_format, details[item['id']])
+                    for item, city, work_format in parser.filter_items(pages))
+        # Архив уже есть - заново не упаковываем (NULL не затирает raw_json)
+        for vacancy in parser.classify(enriched, archive=False):
+            sink.add(vacancy)
+            passed += 1
+        checked += len(payloads)
+    
+    for payloads in iter_rejected_items({CRAWL_PROFILE}):
+        pages = [(f"отсеянные: {checked + 1}-{checked + len(payloads)}",
+                  [payload['item'] for payload in payloads])]
+        enriched = []
+        for item, city, work_format in parser.filter_items(pages):
+            cached = parser.cache.get(item['id']) if parser.cache else None
+            if cached:
+                enriched.append((item, city, work_format, cached[0]))
+            else:
+                missing += 1
+        # Новые вакансии архивируются как при обходе
+        for vacancy in parser.classify(enriched):
+            sink.add(vacancy)
+            passed += 1
+        checked += len(payloads)
+    sink.flush()
+    
+    if parser.cache:
+        parser.cache.close()
+    return checked, passed, checked - passed - missing, missing
+
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Парсер вакансий HH.ru")
+    arg_parser.add_argument('--full', action='store_true',
+                            help="полный обход за 7 дней вместо вакансий с прошлого запуска")
+    arg_parser.add_argument('--refresh-days', type=int, default=None,
+                            help="перезагрузить вакансии, обновленные в БД больше N дней назад")
+    arg_parser.add_argument('--workers', type=int, default=0,
+                            help="процессов для очистки и классификации (по умолчанию - в основном процессе)")
+    arg_parser.add_argument('--rescore', action='store_true',
+                            help="пересчитать релевантность вакансий main.py в БД текущими весами и выйти "
+                                 "(строки hh_parser_tym.py пропускаются - их обновляет его --reprocess)")
+    arg_parser.add_argument('--reprocess', action='store_true',
+                            help="разобрать архив исходного JSON и отсеянных элементов поиска текущими "
+                                 "фильтрами и правилами и выйти (новым вакансиям без деталей в "
+                                 "локальном кэше нужен обычный обход)")
+    args = arg_parser.parse_args()
+    
+    if args.rescore:
+        # Только строки, найденные этим парсером (категории archivist, data_operator
+        # есть и у hh_parser_tym) - без обхода API
+        checked, changed = rescore_table(SCORER, lambda v: HHParser.scan_vacancy(v)[0],
+                                         where="v.crawl_profile = %s", params=(CRAWL_PROFILE,))
+        print(f"✅ Релевантность пересчитана: {checked} вакансий, изменилась у {changed}")
+        
+        # Для профилей hh_parser_tym нужен опыт, а он в БД не хранится
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM vacancies WHERE crawl_profile IS DISTINCT FROM %s",
+                           (CRAWL_PROFILE,))
+            skipped = cursor.fetchone()[0]
+            cursor.close()
+        if skipped:
+            print(f"⚠️ Пропущено {skipped} вакансий других профилей (hh_parser_tym.py и без профиля). "
+                  f"Строки hh_parser_tym.py с архивом исходного JSON пересчитывает "
+                  f"python hh_parser_tym.py --reprocess")
+        raise SystemExit(0)
+    
+    if args.reprocess:
+        checked, passed, rejected, missing = reprocess_archive(args.workers)
+        print(f"✅ Архив разобран заново: {checked} вакансий, записано {passed}, "
+              f"не проходят текущие фильтры {rejected} (оставлены как были), "
+              f"ждут деталей до следующего обхода {missing}")
+        raise SystemExit(0)
+    
     print(f"🕒 {datetime.now()} - Запуск ОПТИМИЗИРОВАННОГО парсера HH.ru")
     print(f"📍 Гео-фильтр: Тюмень - любой формат, другие города - только удаленка")
     print(f"💼 Опыт: без опыта или 1-3 года")
     print("=" * 60)
     
-    parser = HHParser()
-    vacancies = parser.get_hh_vacancies()
+    try:
+        known_ids = load_known_ids(args.refresh_days)
+        print(f"🗂️ Уже в БД: {len(known_ids)} вакансий - детали для них не загружаем")
+    except Exception as e:
+        print(f"⚠️ Не удалось загрузить известные hh_id: {e}")
+        known_ids = set()
+    
+    # Секции vacancies текущего и следующих месяцев - до первой вставки
+    try:
+        created = ensure_partitions()
+        if created:
+            print(f"🗓️ Созданы секции: {', '.join(created)}")
+    except Exception as e:
+        print(f"⚠️ Не удалось проверить секции vacancies: {e}")
     
-    print(f"\n🎯 Найдено подходящих вакансий: {len(vacancies)}")
+    # Инкрементальный режим: только опубликованное с прошлого успешного запуска
+    run_started = datetime.now()
+    date_from = None
+    if not args.full:
+        try:
+            date_from = incremental_date_from(CRAWL_PROFILE, days=7)
+        except Exception as e:
+            print(f"⚠️ Не удалось прочитать состояние обхода, делаем полный: {e}")
     
-    if vacancies:
-        new_count, duplicate_count, error_count = save_to_db(vacancies)
+    parser = HHParser(known_ids=known_ids, process_workers=args.workers)
+    refresh = bool(args.refresh_days)
+    
+    # Пишем в БД пачками прямо по ходу обхода - падение не теряет уже найденное
+    sink = BatchSink(lambda batch: save_to_db(batch, refresh=refresh))
+    formats = {}
+    found_count = 0
+    
+    for vac in parser.get_hh_vacancies(date_from=date_from):
+        sink.add(vac)
+        found_count += 1
+        formats[vac['work_format']] = formats.get(vac['work_format'], 0) + 1
+    sink.flush()
+    
+    print(f"\n🎯 Найдено подходящих вакансий: {found_count}")
+    
+    if found_count:
+        new_count, duplicate_count, error_count = sink.counts()
         print(f"💾 Сохранено: новых {new_count}, дубликатов {duplicate_count}, ошибок {error_count}")
         
         # Статистика по форматам работы
-        formats = {}
-        for vac in vacancies:
-            fmt = vac['work_format']
-            formats[fmt] = formats.get(fmt, 0) + 1
-        
         print("\n📊 Статистика по форматам работы:")
         for fmt, count in formats.items():
             print(f"  {fmt}: {count} вакансий")
     else:
-        print("❌ Подходящих вакансий не найдено")
\ No newline at end of file
+        print("❌ Подходящих вакансий не найдено")
+    
+    # Отметку двигаем только после полного обхода и сохранения
+    if parser.crawl_completed:
+        try:
+            set_watermark(CRAWL_PROFILE, run_started)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить отметку обхода, следующий запуск повторит это окно: {e}")
+    
+    if MEMO and args.workers <= 1:
+        print(f"\n{MEMO.summary()}")
+    
+    if parser.cache:
+        print(f"\n{parser.cache.summary()}")
+        parser.cache.close()
@@ -0,0 +1,624 @@
+"""Миграции уже существующей БД: новые таблицы и их заполнение по сохраненным вакансиям
+
+python migrate.py skills     - справочник навыков и связи vacancy_skills
+python migrate.py search     - колонка search_vector и GIN-индекс для полнотекстового поиска
+python migrate.py company    - ключ работодателя company_key и триграммные индексы pg_trgm
+python migrate.py partitions - перевод vacancies на месячные секции и реестр vacancy_keys
+                               (после skills, search, company и salary; парсеры на это время остановить)
+python migrate.py stats      - пересборка дневных итогов vacancy_stats_daily по vacancies
+python migrate.py browse     - покрывающий индекс постраничного просмотра вакансий
+python migrate.py salary     - зарплата диапазоном salary_rub (GiST) и таблица currency_rates
+python migrate.py profile    - профиль обхода crawl_profile для старых вакансий (по категории)
+python migrate.py split      - вынос текстов из vacancies в vacancy_details, замер до и после
+                               (после partitions; парсеры на это время остановить)
+python migrate.py rejected   - архив отсеянных элементов поиска rejected_items для --reprocess
+python migrate.py crawl      - таблица crawl_state для инкрементального обхода
+
+Новая установка получает те же таблицы из create_table.sql. Миграции
+идемпотентны (IF NOT EXISTS, ON CONFLICT DO NOTHING) и заполняют данные
+пачками по id, каждая пачка - своя транзакция: прерванную миграцию можно
+просто запустить снова.
+"""
+import argparse
+import time
+
+from detail_cache import open_default_cache
+from hh_parser_tym import IT_CATEGORIES, OFFICE_CATEGORIES
+from main import CRAWL_PROFILE, RULES, HHParser
+from partitions import create_partition, ensure_partitions, list_partitions, table_exists
+from storage import (EMPLOYER_SQL, SEARCH_VECTOR_SQL, VACANCY_DETAILS_JOIN, connection,
+                     save_vacancy_skills, unpack_raw_payload, update_company_keys)
+from text_normalizer import company_key, skill_names
+
+SKILLS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS skills (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS vacancy_skills (
+        vacancy_id INTEGER NOT NULL REFERENCES vacancies(id) ON DELETE CASCADE,
+        skill_id INTEGER NOT NULL REFERENCES skills(id),
+        PRIMARY KEY (vacancy_id, skill_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_vacancy_skills_skill ON vacancy_skills(skill_id, vacancy_id);
+    ALTER TABLE IF EXISTS classification_memo ADD COLUMN IF NOT EXISTS skills TEXT[];
+"""
+
+# Генерируемая колонка заполняется одним ALTER (перезапись таблицы под блокировкой),
+# пачки здесь не нужны. Индекс строится уже по заполненной колонке
+SEARCH_SCHEMA = f"""
+    ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED;
+    CREATE INDEX IF NOT EXISTS idx_vacancies_search ON vacancies USING GIN (search_vector);
+"""
+
+COMPANY_SCHEMA = """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS company_key VARCHAR(255);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_company_trgm ON vacancies USING GIN (company gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_name_trgm ON vacancies USING GIN (name gin_trgm_ops);
+"""
+# Индекс по ключу строится после заполнения - так быстрее, чем обновлять его на каждой пачке
+COMPANY_KEY_INDEX = f"""
+    CREATE INDEX IF NOT EXISTS idx_vacancies_employer ON vacancies (({EMPLOYER_SQL}));
+"""
+
+# Новая секционированная таблица собирается рядом со старой (LIKE копирует колонки,
+# значения по умолчанию и генерируемые выражения), старая до переключения не меняется.
+# Остатки прерванной миграции удаляются - ее можно просто запустить снова
+PARTITIONS_SCHEMA = """
+    DROP TABLE IF EXISTS vacancies_new CASCADE;
+    DROP TABLE IF EXISTS vacancy_keys;
+    CREATE TABLE vacancy_keys (
+        id SERIAL PRIMARY KEY,
+        hh_id INTEGER NOT NULL UNIQUE,
+        created_date TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    CREATE INDEX idx_vacancy_keys_date ON vacancy_keys(created_date);
+    CREATE TABLE vacancies_new (LIKE vacancies INCLUDING DEFAULTS INCLUDING GENERATED)
+        PARTITION BY RANGE (created_date);
+    ALTER TABLE vacancies_new ALTER COLUMN id DROP DEFAULT;
+    ALTER TABLE vacancies_new ALTER COLUMN hh_id SET NOT NULL;
+    ALTER TABLE vacancies_new ALTER COLUMN created_date SET NOT NULL;
+    ALTER TABLE vacancies_new ADD PRIMARY KEY (id, created_date);
+    CREATE TABLE vacancies_default PARTITION OF vacancies_new DEFAULT;
+"""
+# Переключение одной транзакцией: навыки ссылаются на реестр, старая таблица удаляется
+PARTITIONS_SWAP = """
+    SELECT setval(pg_get_serial_sequence('vacancy_keys', 'id'), GREATEST(MAX(id), 1)) FROM vacancy_keys;
+    ALTER TABLE vacancy_skills DROP CONSTRAINT IF EXISTS vacancy_skills_vacancy_id_fkey;
+    DELETE FROM vacancy_skills WHERE vacancy_id NOT IN (SELECT id FROM vacancy_keys);
+    ALTER TABLE vacancy_skills ADD CONSTRAINT vacancy_skills_vacancy_id_fkey
+        FOREIGN KEY (vacancy_id) REFERENCES vacancy_keys(id) ON DELETE CASCADE;
+    DROP TABLE vacancies;
+    ALTER TABLE vacancies_new RENAME TO vacancies;
+"""
+# Индексы как в create_table.sql - имена освобождаются только после удаления старой таблицы
+PARTITIONS_INDEXES = f"""
+    CREATE INDEX IF NOT EXISTS idx_vacancies_date ON vacancies(created_date);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_category ON vacancies(category);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_browse
+        ON vacancies (relevance_score DESC, created_date DESC, id DESC)
+        INCLUDE (category, work_format, salary_from, salary_to);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_salary_rub ON vacancies USING GIST (salary_rub);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_work_format ON vacancies(work_format);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_city ON vacancies(city);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_search ON vacancies USING GIN (search_vector);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_company_trgm ON vacancies USING GIN (company gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_name_trgm ON vacancies USING GIN (name gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_vacancies_employer ON vacancies (({EMPLOYER_SQL}));
+"""
+
+# Итоги пересобираются за дни, которые еще есть в vacancies, - более ранние
+# (секции убраны сроком хранения) остаются как были
+STATS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS vacancy_stats_daily (
+        day DATE NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        work_format VARCHAR(20) NOT NULL,
+        city VARCHAR(100) NOT NULL,
+        vacancies INTEGER NOT NULL,
+        salary_count INTEGER NOT NULL,
+        salary_sum BIGINT NOT NULL,
+        PRIMARY KEY (day, category, work_format, city)
+    );
+    LOCK TABLE vacancy_stats_daily IN EXCLUSIVE MODE;
+    DELETE FROM vacancy_stats_daily
+    WHERE day >= (SELECT MIN(created_date)::date FROM vacancies);
+    INSERT INTO vacancy_stats_daily
+        (day, category, work_format, city, vacancies, salary_count, salary_sum)
+    SELECT created_date::date, COALESCE(category, ''), COALESCE(work_format, ''),
+           COALESCE(city, ''), COUNT(*), COUNT(COALESCE(salary_from, salary_to)),
+           COALESCE(SUM(COALESCE(salary_from, salary_to)), 0)
+    FROM vacancies
+    GROUP BY 1, 2, 3, 4;
+"""
+
+# Ведущая колонка та же, поэтому старый индекс по relevance_score больше не нужен
+BROWSE_SCHEMA = """
+    CREATE INDEX IF NOT EXISTS idx_vacancies_browse
+        ON vacancies (relevance_score DESC, created_date DESC, id DESC)
+        INCLUDE (category, work_format, salary_from, salary_to);
+    DROP INDEX IF EXISTS idx_vacancies_score;
+"""
+
+# Колонка считается из уже рублевых salary_from / salary_to (перезапись таблицы),
+# btree по (salary_from, salary_to) фильтру "от N" не помогал и заменяется GiST
+SALARY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS currency_rates (
+        code VARCHAR(3) PRIMARY KEY,
+        rate NUMERIC(14, 6) NOT NULL,
+        updated_at TIMESTAMP DEFAULT NOW()
+    );
+    ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS salary_rub int4range
+        GENERATED ALWAYS AS (CASE
+        WHEN salary_from IS NULL AND salary_to IS NULL THEN NULL
+        WHEN salary_from > salary_to THEN int4range(salary_to, salary_from, '[]')
+        ELSE int4range(salary_from, salary_to, '[]')
+    END) STORED;
+    CREATE INDEX IF NOT EXISTS idx_vacancies_salary_rub ON vacancies USING GIST (salary_rub);
+    DROP INDEX IF EXISTS idx_vacancies_salary;
+"""
+
+# Холодная часть вакансий как в create_table.sql, секции - те же месяцы, что у vacancies
+SPLIT_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS vacancy_details (
+        vacancy_id INTEGER NOT NULL,
+        created_date TIMESTAMP NOT NULL,
+        skills TEXT,
+        description TEXT,
+        raw_json BYTEA,
+        search_vector tsvector,
+        PRIMARY KEY (vacancy_id, created_date)
+    ) PARTITION BY RANGE (created_date);
+    CREATE TABLE IF NOT EXISTS vacancy_details_default PARTITION OF vacancy_details DEFAULT;
+"""
+# Индекс строится по скопированным строкам, колонки уходят из vacancies одной
+# транзакцией. DROP COLUMN только помечает их удаленными - место в секциях
+# освобождает VACUUM FULL после
+SPLIT_DROP = """
+    CREATE INDEX IF NOT EXISTS idx_vacancy_details_search ON vacancy_details USING GIN (search_vector);
+    ALTER TABLE vacancies DROP COLUMN IF EXISTS search_vector;
+    ALTER TABLE vacancies DROP COLUMN IF EXISTS description;
+    ALTER TABLE vacancies DROP COLUMN IF EXISTS skills;
+"""
+# Запросы по узкой части, которым мешали тексты в строках: экран списка
+# далеко от начала и обходы всей таблицы для отчетов
+SPLIT_BENCHMARK = {
+    'экран списка (keyset-порядок, OFFSET 1000)': """
+        SELECT id, name, company, salary_from, salary_to, category, relevance_score
+        FROM vacancies
+        WHERE created_date >= NOW() - INTERVAL '30 days'
+        ORDER BY relevance_score DESC, created_date DESC, id DESC
+        OFFSET 1000 LIMIT 20""",
+    'категории и форматы (обход таблицы)': """
+        SELECT category, work_format, COUNT(*), AVG(COALESCE(salary_from, salary_to))
+        FROM vacancies
+        GROUP BY category, work_format""",
+    'названия по городу (обход таблицы)': """
+        SELECT COUNT(*) FROM vacancies
+        WHERE city = 'Тюмень' AND name ILIKE '%аналитик%'""",
+}
+
+# Отметки инкрементального обхода как в create_table.sql - без них каждый запуск полный
+CRAWL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS crawl_state (
+        profile VARCHAR(100) PRIMARY KEY,
+        last_crawl TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP DEFAULT NOW()
+    );
+"""
+
+# Архив отсеянных элементов поиска как в create_table.sql - заполняется следующими обходами
+REJECTED_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rejected_items (
+        crawl_profile VARCHAR(50) NOT NULL,
+        hh_id INTEGER NOT NULL,
+        payload BYTEA NOT NULL,
+        seen_date TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (crawl_profile, hh_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_rejected_items_seen ON rejected_items(seen_date);
+"""
+
+# Профиль старых строк восстанавливается по категории: у каждого парсера свой набор.
+# Категории, которые дают оба парсера (archivist, data_operator), остаются без
+# профиля - --rescore их не трогает
+PROFILE_BACKFILL = """
+    ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS crawl_profile VARCHAR(50);
+    UPDATE vacancies SET crawl_profile = CASE
+        WHEN category = ANY(%(office)s) THEN 'tyumen_office'
+        WHEN category = ANY(%(it)s) THEN 'tyumen_it_tech'
+        WHEN category = ANY(%(main)s) THEN %(main_profile)s
+    END
+    WHERE crawl_profile IS NULL
+      AND NOT category = ANY(%(shared)s);
+"""
+
+
+def execute_schema(schema):
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(schema)
+        cursor.close()
+
+
+def has_table(name):
+    with connection() as conn:
+        cursor = conn.cursor()
+        exists = table_exists(cursor, name)
+        cursor.close()
+    return exists
+
+
+def detail_key_skills(hh_id, raw_json, cache):
+    """key_skills вакансии из деталей: архив raw_json, иначе локальный кэш деталей"""
+    if raw_json is not None:
+        detail = unpack_raw_payload(raw_json)['detail']
+    else:
+        cached = cache.get(hh_id) if cache else None
+        detail = cached[0] if cached else None
+    return [skill['name'] for skill in (detail or {}).get('key_skills', [])]
+
+
+def iter_vacancy_batches(columns, batch_size, source="vacancies v"):
+    """Пачки строк vacancies v по возрастанию id (keyset: id > последнего), первая колонка - id"""
+    last_id = 0
+    while True:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT v.id, {columns} FROM {source}
+                WHERE v.id > %s
+                ORDER BY v.id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            cursor.close()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def measure_vacancies():
+    """-> ({запрос: лучшее из 3 время в мс}, байт в секциях vacancies)"""
+    timings = {}
+    with connection() as conn:
+        cursor = conn.cursor()
+        for label, query in SPLIT_BENCHMARK.items():
+            runs = []
+            for _ in range(3):
+                started = time.perf_counter()
+                cursor.execute(query)
+                cursor.fetchall()
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[label] = min(runs)
+        cursor.execute("""
+            SELECT COALESCE(SUM(pg_table_size(inhrelid)), 0)
+            FROM pg_inherits WHERE inhparent = 'vacancies'::regclass
+        """)
+        size = cursor.fetchone()[0]
+        cursor.close()
+    return timings, size
+
+
+def vacuum_full(tables):
+    """VACUUM FULL не работает в транзакции - на время включаем autocommit"""
+    with connection() as conn:
+        conn.autocommit = True
+        try:
+            cursor = conn.cursor()
+            for table in tables:
+                print(f"🔁 VACUUM FULL {table}...")
+                cursor.execute(f"VACUUM FULL {table}")
+            cursor.close()
+        finally:
+            conn.autocommit = False
+
+
+def migrate_skills(batch_size):
+    """key_skills из деталей и колонки skills, навыки из описания -> skills / vacancy_skills"""
+    execute_schema(SKILLS_SCHEMA)
+
+    # После python migrate.py split тексты и архив деталей лежат в vacancy_details
+    if has_table('vacancy_details'):
+        columns = "v.hh_id, v.name, COALESCE(d.description, ''), COALESCE(d.skills, ''), d.raw_json"
+        source = VACANCY_DETAILS_JOIN
+    else:
+        columns = "v.hh_id, v.name, COALESCE(v.description, ''), COALESCE(v.skills, ''), NULL"
+        source = "vacancies v"
+    # Колонка skills заполнялась из элемента поиска, где key_skills нет, -
+    # настоящие key_skills берутся из деталей (архив или кэш без обращения к API)
+    cache = open_default_cache()
+    # До python migrate.py partitions реестра vacancy_keys еще нет - связи по id строк
+    by_id = not has_table('vacancy_keys')
+
+    processed = 0
+    linked = 0
+    for rows in iter_vacancy_batches(columns, batch_size, source):
+        skills = {}
+        for vacancy_id, hh_id, name, description, stored_skills, raw_json in rows:
+            if hh_id is None:
+                continue
+            key_skills = detail_key_skills(hh_id, raw_json, cache)
+            found, _ = HHParser.scan_vacancy({'name': name, 'description': description,
+                                              'skills': ', '.join([stored_skills] + key_skills)})
+            skills[vacancy_id if by_id else hh_id] = skill_names(key_skills, stored_skills,
+                                                                 HHParser.extract_skills(found))
+
+        with connection() as conn:
+            linked += save_vacancy_skills(conn, skills, by_id=by_id)
+        processed += len(rows)
+        print(f"🔁 Навыки: обработано {processed} вакансий, связей {linked}")
+
+    if cache:
+        cache.close()
+    print(f"✅ Таблицы навыков заполнены: {processed} вакансий")
+
+
+def migrate_search(batch_size):
+    """search_vector для уже сохраненных вакансий (batch_size не используется)"""
+    if has_table('vacancy_details'):
+        print("✅ search_vector уже в vacancy_details (python migrate.py split)")
+        return
+    print("🔁 Строим search_vector и GIN-индекс, таблица vacancies заблокирована до конца...")
+    execute_schema(SEARCH_SCHEMA)
+    print("✅ Полнотекстовый поиск готов")
+
+
+def migrate_company(batch_size):
+    """company_key по названию работодателя для уже сохраненных вакансий"""
+    execute_schema(COMPANY_SCHEMA)
+
+    processed = 0
+    changed = 0
+    for rows in iter_vacancy_batches("company, company_key", batch_size):
+        updates = []
+        for vacancy_id, company, stored_key in rows:
+            key = company_key(company)
+            if key != stored_key:
+                updates.append((vacancy_id, key))
+        if updates:
+            with connection() as conn:
+                update_company_keys(conn, updates)
+        processed += len(rows)
+        changed += len(updates)
+        print(f"🔁 Работодатели: обработано {processed} вакансий, обновлено {changed}")
+
+    execute_schema(COMPANY_KEY_INDEX)
+    print(f"✅ Ключи работодателей заполнены: {processed} вакансий")
+
+
+def migrate_partitions(batch_size):
+    """Копия vacancies в секционированную таблицу пачками по id, затем переключение"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT EXISTS (SELECT 1 FROM pg_partitioned_table
+                           WHERE partrelid = 'vacancies'::regclass)
+        """)
+        if cursor.fetchone()[0]:
+            print("✅ vacancies уже секционирована")
+            return
+        cursor.execute("""
+            SELECT column_name, is_generated = 'NEVER' FROM information_schema.columns
+            WHERE table_name = 'vacancies'
+            ORDER BY ordinal_position
+        """)
+        table_columns = cursor.fetchall()
+        cursor.execute("""
+            SELECT to_regclass('vacancy_skills') IS NOT NULL, MIN(created_date)
+            FROM vacancies
+        """)
+        has_skills, first_created = cursor.fetchone()
+        cursor.close()
+
+    # Копируются только обычные колонки, search_vector новая таблица считает сама
+    columns = [name for name, stored in table_columns if stored]
+    names = {name for name, _ in table_columns}
+    missing = [migration for migration, ready in (('skills', has_skills),
+                                                  ('search', 'search_vector' in names),
+                                                  ('company', 'company_key' in names),
+                                                  ('salary', 'salary_rub' in names))
+               if not ready]
+    if missing:
+        raise SystemExit("❌ Сначала выполните: " +
+                         ', '.join(f"python migrate.py {migration}" for migration in missing))
+
+    execute_schema(PARTITIONS_SCHEMA)
+    created = ensure_partitions(since=first_created, parent='vacancies_new', prefix='vacancies')
+    print(f"🔁 Создано секций: {len(created)}")
+
+    # Дата создания нужна в ключе секционирования, пустую заменяем временем миграции
+    select_list = ', '.join('COALESCE(created_date, NOW())' if name == 'created_date' else name
+                            for name in columns)
+    copied = 0
+    last_id = 0
+    while True:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                WITH batch AS (
+                    SELECT {select_list} FROM vacancies
+                    WHERE id > %s AND hh_id IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                ),
+                registered AS (
+                    INSERT INTO vacancy_keys (id, hh_id, created_date)
+                    SELECT id, hh_id, created_date FROM batch
+                )
+                INSERT INTO vacancies_new ({', '.join(columns)})
+                SELECT * FROM batch
+                RETURNING id
+            """, (last_id, batch_size))
+            ids = [vacancy_id for (vacancy_id,) in cursor.fetchall()]
+            cursor.close()
+        if not ids:
+            break
+        copied += len(ids)
+        last_id = max(ids)
+        print(f"🔁 Секции: скопировано {copied} вакансий")
+
+    execute_schema(PARTITIONS_SWAP)
+    print("🔁 Таблицы переключены, строим индексы...")
+    execute_schema(PARTITIONS_INDEXES)
+    print(f"✅ vacancies секционирована по месяцам: {copied} вакансий")
+
+
+def migrate_stats(batch_size):
+    """Дневные итоги одним GROUP BY по vacancies (batch_size не используется)"""
+    execute_schema(STATS_SCHEMA)
+    print("✅ Дневные итоги vacancy_stats_daily пересобраны")
+
+
+def migrate_browse(batch_size):
+    """Индекс keyset-просмотра (batch_size не используется)"""
+    execute_schema(BROWSE_SCHEMA)
+    print("✅ Индекс постраничного просмотра готов")
+
+
+def migrate_salary(batch_size):
+    """salary_rub для уже сохраненных вакансий (batch_size не используется)"""
+    print("🔁 Строим salary_rub и GiST-индекс, таблица vacancies заблокирована до конца...")
+    execute_schema(SALARY_SCHEMA)
+    print("✅ Фильтр по зарплате готов")
+
+
+def migrate_profile(batch_size):
+    """crawl_profile уже сохраненных вакансий одним UPDATE (batch_size не используется)"""
+    main_categories = [name for name, _, _ in RULES.rules.rules] + ['other']
+    tyumen_categories = IT_CATEGORIES + OFFICE_CATEGORIES
+    shared = sorted(set(main_categories) & set(tyumen_categories))
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(PROFILE_BACKFILL, {
+            'office': OFFICE_CATEGORIES,
+            'it': IT_CATEGORIES,
+            'main': main_categories,
+            'main_profile': CRAWL_PROFILE,
+            'shared': shared,
+        })
+        updated = cursor.rowcount
+        cursor.close()
+    print(f"✅ Профиль обхода заполнен: {updated} вакансий"
+          f"{f', без профиля остались категории {shared}' if shared else ''}")
+
+
+def migrate_split(batch_size):
+    """Тексты vacancies -> vacancy_details пачками по id, затем удаление колонок и замер"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT EXISTS (SELECT 1 FROM pg_partitioned_table
+                           WHERE partrelid = 'vacancies'::regclass)
+        """)
+        partitioned = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                           WHERE table_name = 'vacancies' AND column_name = 'description')
+        """)
+        has_texts = cursor.fetchone()[0]
+        cursor.close()
+    if not partitioned:
+        raise SystemExit("❌ Сначала выполните: python migrate.py partitions")
+    if not has_texts:
+        print("✅ Тексты уже в vacancy_details")
+        return
+
+    print("🔁 Замер до разделения...")
+    before, size_before = measure_vacancies()
+
+    execute_schema(SPLIT_SCHEMA)
+    with connection() as conn:
+        cursor = conn.cursor()
+        months = [month for _, month in list_partitions(cursor)]
+        for month in months:
+            create_partition(cursor, month, 'vacancy_details')
+        cursor.close()
+    ensure_partitions(parent='vacancy_details')
+
+    # search_vector считается заново: колонки в vacancies может и не быть
+    # (без python migrate.py search). ON CONFLICT - повторный запуск пропускает готовое
+    copied = 0
+    last_id = 0
+    while True:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                WITH batch AS (
+                    SELECT id, created_date, skills, description, {SEARCH_VECTOR_SQL} AS search_vector
+                    FROM vacancies
+                    WHERE id > %s
+                    ORDER BY id
+                    LIMIT %s
+                ),
+                inserted AS (
+                    INSERT INTO vacancy_details (vacancy_id, created_date, skills, description, search_vector)
+                    SELECT * FROM batch
+                    ON CONFLICT DO NOTHING
+                    RETURNING 1
+                )
+                SELECT MAX(id), (SELECT COUNT(*) FROM inserted) FROM batch
+            """, (last_id, batch_size))
+            batch_last_id, inserted = cursor.fetchone()
+            cursor.close()
+        if batch_last_id is None:
+            break
+        copied += inserted
+        last_id = batch_last_id
+        print(f"🔁 Тексты: скопировано {copied} вакансий")
+
+    print("🔁 Строим GIN-индекс и удаляем колонки из vacancies...")
+    execute_schema(SPLIT_DROP)
+    with connection() as conn:
+        cursor = conn.cursor()
+        partitions = [name for name, _ in list_partitions(cursor)] + ['vacancies_default']
+        cursor.close()
+    vacuum_full(partitions)
+
+    print("🔁 Замер после разделения...")
+    after, size_after = measure_vacancies()
+    print(f"\n{'запрос':45} | {'до, мс':>10} | {'после, мс':>10}")
+    for label, elapsed in before.items():
+        print(f"{label:45} | {elapsed:10.1f} | {after[label]:10.1f}")
+    print(f"{'размер секций vacancies, МБ':45} | {size_before / 2**20:10.1f} | {size_after / 2**20:10.1f}")
+    print(f"\n✅ Тексты вынесены в vacancy_details: {copied} вакансий")
+
+
+def migrate_rejected(batch_size):
+    """Таблица rejected_items (batch_size не используется)"""
+    execute_schema(REJECTED_SCHEMA)
+    print("✅ Архив отсеянных элементов поиска готов, заполняется при следующих обходах")
+
+
+def migrate_crawl(batch_size):
+    """Таблица crawl_state (batch_size не используется)"""
+    execute_schema(CRAWL_SCHEMA)
+    print("✅ Состояние обхода готово, отметки появятся после первого полного запуска")
+
+
+MIGRATIONS = {
+    'skills': migrate_skills,
+    'search': migrate_search,
+    'company': migrate_company,
+    'partitions': migrate_partitions,
+    'stats': migrate_stats,
+    'browse': migrate_browse,
+    'salary': migrate_salary,
+    'profile': migrate_profile,
+    'split': migrate_split,
+    'rejected': migrate_rejected,
+    'crawl': migrate_crawl,
+}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Миграции БД парсера вакансий")
+    arg_parser.add_argument('name', choices=list(MIGRATIONS), help="какую миграцию выполнить")
+    arg_parser.add_argument('--batch-size', type=int, default=5000,
+                            help="сколько вакансий обрабатывать за одну транзакцию")
+    args = arg_parser.parse_args()
+
+    MIGRATIONS[args.name](args.batch_size)
@@ -0,0 +1,177 @@
+"""Месячные секции таблиц vacancies и vacancy_details и срок их хранения
+
+python partitions.py ensure                   - создать секции текущего и следующих месяцев
+python partitions.py list                     - секции и число строк в них
+python partitions.py retention [--keep N] [--mode drop|detach|archive]
+
+Парсеры вызывают ensure_partitions при каждом запуске. Секции
+vacancies_default и vacancy_details_default ловят строки вне созданных
+месяцев - обычно они пусты. Срок хранения убирает целые секции старше
+N месяцев у обеих таблиц: DROP, DETACH (остаются отдельными таблицами)
+или перенос в схему archive - без DELETE по миллионам строк. Реестр
+vacancy_keys и связи vacancy_skills не секционированы: при drop записи
+этих месяцев удаляются (DELETE по индексу created_date, навыки - каскадом),
+при detach и archive остаются, чтобы секции можно было вернуть. Архив
+отсеянных элементов поиска rejected_items чистится от записей старше
+того же срока.
+"""
+import argparse
+import re
+from datetime import date
+
+from config import PARTITION_CONFIG
+from storage import connection
+
+# Горячая и холодная части вакансий секционированы по одним и тем же месяцам
+PARTITIONED_TABLES = ('vacancies', 'vacancy_details')
+RETENTION_MODES = ('drop', 'detach', 'archive')
+
+
+def month_start(day, months=0):
+    """Первое число месяца day, сдвинутого на months (может быть отрицательным)"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month, table='vacancies'):
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def table_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s)", (name,))
+    return cursor.fetchone()[0] is not None
+
+
+def list_partitions(cursor, parent='vacancies'):
+    """-> [(имя, первое число месяца)] месячных секций parent по возрастанию"""
+    pattern = re.compile(rf'^{parent}_(\d{{4}})_(\d{{2}})$')
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (parent,))
+    partitions = []
+    for (name,) in cursor.fetchall():
+        match = pattern.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(cursor, month, parent='vacancies', prefix=None):
+    """Секция месяца month, если ее еще нет -> True если создана
+
+    prefix - начало имени секции, если оно не совпадает с parent (миграция
+    собирает секции vacancies_ГГГГ_ММ под временной vacancies_new).
+    """
+    name = partition_name(month, prefix or parent)
+    if table_exists(cursor, name):
+        return False
+    cursor.execute(f"""
+        CREATE TABLE {name} PARTITION OF {parent}
+        FOR VALUES FROM (%s) TO (%s)
+    """, (month, month_start(month, 1)))
+    return True
+
+
+def ensure_partitions(months_ahead=None, since=None, parent=None, prefix=None):
+    """Секции от месяца since (по умолчанию текущего) до months_ahead месяцев вперед
+
+    Без parent - для всех PARTITIONED_TABLES, которые уже есть в БД
+    (vacancy_details появляется после python migrate.py split).
+    """
+    months_ahead = PARTITION_CONFIG['months_ahead'] if months_ahead is None else months_ahead
+    current = month_start(date.today())
+    first = month_start(since or current)
+
+    created = []
+    with connection() as conn:
+        cursor = conn.cursor()
+        parents = [parent] if parent else [table for table in PARTITIONED_TABLES
+                                           if table_exists(cursor, table)]
+        for table in parents:
+            month = first
+            while month <= month_start(current, months_ahead):
+                if create_partition(cursor, month, table, prefix):
+                    created.append(partition_name(month, prefix or table))
+                month = month_start(month, 1)
+        cursor.close()
+    return created
+
+
+def apply_retention(keep_months=None, mode=None):
+    """Убираем секции целиком старше keep_months месяцев -> [имена секций]"""
+    keep_months = PARTITION_CONFIG['retention_months'] if keep_months is None else keep_months
+    mode = mode or PARTITION_CONFIG['retention_mode']
+    if mode not in RETENTION_MODES:
+        raise ValueError(f"режим хранения {mode!r}, ожидался один из {RETENTION_MODES}")
+    horizon = month_start(date.today(), -keep_months)
+
+    removed = []
+    with connection() as conn:
+        cursor = conn.cursor()
+        if mode == 'archive':
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {PARTITION_CONFIG['archive_schema']}")
+
+        parents = [table for table in PARTITIONED_TABLES if table_exists(cursor, table)]
+        for _, month in list_partitions(cursor):
+            if month >= horizon:
+                break
+            # Реестр и связи навыков чистятся только при drop: отсоединенные и
+            # перенесенные в archive секции остаются восстановимыми вместе с ними,
+            # а их hh_id - известными (обход не вставит вакансию заново).
+            # Это DELETE по индексу created_date с каскадом в vacancy_skills
+            if mode == 'drop':
+                cursor.execute("""
+                    DELETE FROM vacancy_keys
+                    WHERE created_date >= %s AND created_date < %s
+                """, (month, month_start(month, 1)))
+            for parent in parents:
+                name = partition_name(month, parent)
+                if not table_exists(cursor, name):
+                    continue
+                if mode == 'drop':
+                    cursor.execute(f"DROP TABLE {name}")
+                else:
+                    cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {name}")
+                    if mode == 'archive':
+                        cursor.execute(f"ALTER TABLE {name} SET SCHEMA {PARTITION_CONFIG['archive_schema']}")
+                removed.append(name)
+
+        # Отсеянные элементы поиска (rejected_items) не секционированы: таблица узкая,
+        # по строке на вакансию, устаревшие удаляются по индексу seen_date
+        if table_exists(cursor, 'rejected_items'):
+            cursor.execute("DELETE FROM rejected_items WHERE seen_date < %s", (horizon,))
+        cursor.close()
+    return removed
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Секции таблиц vacancies и vacancy_details")
+    arg_parser.add_argument('command', choices=['ensure', 'list', 'retention'])
+    arg_parser.add_argument('--keep', type=int, default=None,
+                            help="сколько последних месяцев хранить (по умолчанию из PARTITION_CONFIG)")
+    arg_parser.add_argument('--mode', choices=RETENTION_MODES, default=None,
+                            help="что делать со старыми секциями (по умолчанию из PARTITION_CONFIG)")
+    args = arg_parser.parse_args()
+
+    if args.command == 'ensure':
+        created = ensure_partitions()
+        print(f"✅ Создано секций: {len(created)} {', '.join(created)}")
+    elif args.command == 'list':
+        with connection() as conn:
+            cursor = conn.cursor()
+            for parent in PARTITIONED_TABLES:
+                if not table_exists(cursor, parent):
+                    continue
+                for name, month in list_partitions(cursor, parent):
+                    cursor.execute(f"SELECT COUNT(*) FROM {name}")
+                    print(f"  {name:26} | {month:%m.%Y} | {cursor.fetchone()[0]:7} вакансий")
+                cursor.execute(f"SELECT COUNT(*) FROM {parent}_default")
+                print(f"  {parent + '_default':26} | вне месяцев | {cursor.fetchone()[0]:7} вакансий")
+            cursor.close()
+    else:
+        removed = apply_retention(args.keep, args.mode)
+        mode = args.mode or PARTITION_CONFIG['retention_mode']
+        print(f"✅ Срок хранения ({mode}): убрано секций {len(removed)} {', '.join(removed)}")
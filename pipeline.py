@@ -0,0 +1,129 @@
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from config import PIPELINE_CONFIG
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def buffered(iterable, maxsize=None):
+    """Прогоняет генератор в фоновом потоке через ограниченную очередь
+
+    Пока потребитель занят (качает детали, пишет в БД), производитель уже
+    готовит следующие элементы, но не больше maxsize вперед - память не растет.
+    Исключение производителя пробрасывается потребителю.
+    """
+    buffer = queue.Queue(maxsize=maxsize or PIPELINE_CONFIG['buffer_size'])
+
+    def produce():
+        try:
+            for element in iterable:
+                buffer.put(element)
+        except BaseException as e:
+            buffer.put(_Failure(e))
+        finally:
+            buffer.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    while True:
+        element = buffer.get()
+        if element is _DONE:
+            return
+        if isinstance(element, _Failure):
+            raise element.error
+        yield element
+
+
+def batched(iterable, size):
+    """Разбивает поток на списки по size элементов"""
+    batch = []
+    for element in iterable:
+        batch.append(element)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BatchSink:
+    """Копит вакансии и сохраняет пачками через save_batch(list) -> (новых, дубликатов, ошибок)"""
+
+    def __init__(self, save_batch, batch_size=None):
+        self.save_batch = save_batch
+        self.batch_size = batch_size or PIPELINE_CONFIG['db_batch_size']
+        self.batch = []
+        self.new_count = 0
+        self.duplicate_count = 0
+        self.error_count = 0
+
+    def add(self, vacancy):
+        self.batch.append(vacancy)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        new_count, duplicate_count, error_count = self.save_batch(self.batch)
+        self.new_count += new_count
+        self.duplicate_count += duplicate_count
+        self.error_count += error_count
+        self.batch = []
+
+    def counts(self):
+        return self.new_count, self.duplicate_count, self.error_count
+
+
+class ProcessStage:
+    """CPU-стадия конвейера в пуле процессов: пачки уходят в воркеры, результаты - в исходном порядке
+
+    func(list) -> list того же размера выполняется в процессах пула, поэтому
+    должна быть функцией уровня модуля. Поток режется на крупные пачки по
+    chunk_size - пересылка пачки целиком окупает pickle. Без пула (workers <= 1)
+    и для пачек меньше min_parallel func вызывается в текущем процессе.
+    В работе держится не больше 2 * workers пачек - память не растет.
+    Процессы запускаются через spawn: fork при живых потоках конвейера
+    (очереди, HTTP-сессии) может унести в дочерний процесс захваченные блокировки.
+    """
+
+    def __init__(self, func, workers=None, chunk_size=None, min_parallel=None):
+        self.func = func
+        self.workers = workers or 0
+        if self.workers > 1:
+            self.chunk_size = chunk_size or PIPELINE_CONFIG['process_chunk_size']
+        else:
+            self.chunk_size = chunk_size or PIPELINE_CONFIG['score_batch_size']
+        self.min_parallel = min_parallel or PIPELINE_CONFIG['process_min_batch']
+
+    def run(self, iterable):
+        """Генератор результатов func по одному элементу, в порядке входа"""
+        if self.workers <= 1:
+            for batch in batched(iterable, self.chunk_size):
+                yield from self.func(batch)
+            return
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            pending = deque()
+            for batch in batched(iterable, self.chunk_size):
+                if len(batch) < self.min_parallel:
+                    pending.append(self.func(batch))
+                else:
+                    pending.append(pool.submit(self.func, batch))
+                while len(pending) >= 2 * self.workers:
+                    yield from self._result(pending.popleft())
+            while pending:
+                yield from self._result(pending.popleft())
+
+    @staticmethod
+    def _result(entry):
+        return entry if isinstance(entry, list) else entry.result()
@@ -0,0 +1,185 @@
+import numpy as np
+
+from classification_memo import fingerprint
+from config import PIPELINE_CONFIG, RELEVANCE_PROFILES
+from storage import VACANCY_DETAILS_JOIN, connection, update_relevance_scores
+
+
+class RelevanceScorer:
+    """Релевантность пачки вакансий одним векторным расчетом
+
+    Каждый признак - столбец: слово уровня (high/medium/low), группа слов,
+    указанная зарплата, диапазон зарплаты, формат работы, опыт. Веса столбцов
+    берутся из профиля RELEVANCE_PROFILES и лежат вектором в weights. Пачка
+    превращается в разреженную матрицу попаданий (строка - вакансия, столбец -
+    признак) в координатном виде, балл - ее произведение на вектор весов
+    плюс base, обрезанное до [min, max].
+
+    keyword_tiers: уровень -> слова, каждое найденное слово дает вес уровня.
+    keyword_groups: группа -> (слова, категории или None), вес группы дается
+    один раз, если найдено любое ее слово (и категория вакансии подходит).
+    """
+
+    def __init__(self, profile, keyword_tiers=None, keyword_groups=None):
+        self.profile = RELEVANCE_PROFILES[profile] if isinstance(profile, str) else profile
+        self.columns = []
+        weights = []
+
+        def add_column(name, weight):
+            self.columns.append(name)
+            weights.append(weight)
+            return len(self.columns) - 1
+
+        # Слово из нескольких уровней получает сумму их весов
+        keyword_weights = {}
+        for tier, keywords in (keyword_tiers or {}).items():
+            weight = self.profile['keyword_tiers'].get(tier, 0)
+            for keyword in {kw.lower() for kw in keywords}:
+                keyword_weights[keyword] = keyword_weights.get(keyword, 0) + weight
+        self.keyword_columns = {
+            keyword: add_column(f"kw:{keyword}", weight)
+            for keyword, weight in sorted(keyword_weights.items())
+        }
+
+        self.group_columns = {}      # слово -> [столбцы групп]
+        self.group_categories = {}   # столбец группы -> категории или None (любая)
+        for group, (keywords, categories) in (keyword_groups or {}).items():
+            column = add_column(f"group:{group}", self.profile['keyword_groups'].get(group, 0))
+            self.group_categories[column] = frozenset(categories) if categories is not None else None
+            for keyword in {kw.lower() for kw in keywords}:
+                self.group_columns.setdefault(keyword, []).append(column)
+
+        self.keyword_set = frozenset(self.keyword_columns)
+        self.group_keywords = frozenset(self.group_columns)
+
+        self.salary_column = add_column('salary_specified', self.profile.get('salary_specified', 0))
+        self.band_columns = [
+            (band.get('min'), band.get('max'),
+             add_column(f"salary:{band.get('min')}-{band.get('max')}", band['weight']))
+            for band in self.profile.get('salary_bands', ())
+        ]
+        self.format_columns = {
+            work_format: add_column(f"format:{work_format}", weight)
+            for work_format, weight in self.profile.get('work_format', {}).items()
+        }
+        self.experience_columns = {
+            experience: add_column(f"experience:{experience}", weight)
+            for experience, weight in self.profile.get('experience', {}).items()
+        }
+
+        self.weights = np.array(weights, dtype=np.float64)
+
+        # Версия профиля и списков слов для ключей памяти классификации
+        self.version = fingerprint([self.profile, self.columns, self.group_columns,
+                                    sorted(self.group_categories.items())])
+
+    def hit_matrix(self, vacancies, hits):
+        """-> (строки, столбцы) ненулевых элементов матрицы попаданий пачки
+
+        vacancies - словари с salary_from, salary_to, work_format и, если
+        профиль их учитывает, category и experience; hits - множества
+        найденных в тексте слов той же длины.
+        """
+        keyword_columns = self.keyword_columns
+        keyword_set = self.keyword_set
+        group_keywords = self.group_keywords
+        counts = []
+        columns = []
+        for vacancy, found in zip(vacancies, hits):
+            # Пересечение множеств идет в C, в Python - только найденные слова профиля
+            matched = [keyword_columns[keyword] for keyword in keyword_set.intersection(found)]
+            if group_keywords and not group_keywords.isdisjoint(found):
+                for column in {c for keyword in group_keywords.intersection(found)
+                               for c in self.group_columns[keyword]}:
+                    categories = self.group_categories[column]
+                    if categories is None or vacancy.get('category') in categories:
+                        matched.append(column)
+
+            column = self.format_columns.get(vacancy.get('work_format'))
+            if column is not None:
+                matched.append(column)
+            column = self.experience_columns.get(vacancy.get('experience'))
+            if column is not None:
+                matched.append(column)
+
+            counts.append(len(matched))
+            columns.extend(matched)
+        rows = np.repeat(np.arange(len(vacancies), dtype=np.intp), counts)
+
+        # Зарплатные признаки считаются сразу по столбцу зарплат всей пачки
+        salary_from = np.array([v.get('salary_from') or 0 for v in vacancies], dtype=np.float64)
+        salary_to = np.array([v.get('salary_to') or 0 for v in vacancies], dtype=np.float64)
+
+        row_parts = [rows,
+                     np.flatnonzero((salary_from != 0) | (salary_to != 0))]
+        column_parts = [np.array(columns, dtype=np.intp),
+                        np.full(len(row_parts[1]), self.salary_column, dtype=np.intp)]
+
+        for low, high, column in self.band_columns:
+            mask = salary_from != 0
+            if low is not None:
+                mask &= salary_from >= low
+            if high is not None:
+                mask &= salary_from <= high
+            band_rows = np.flatnonzero(mask)
+            row_parts.append(band_rows)
+            column_parts.append(np.full(len(band_rows), column, dtype=np.intp))
+
+        return np.concatenate(row_parts), np.concatenate(column_parts)
+
+    def score_matrix(self, rows, columns, count):
+        """Баллы по готовой матрице попаданий -> массив numpy"""
+        scores = self.profile.get('base', 0) + np.bincount(
+            rows, weights=self.weights[columns], minlength=count)
+        return np.clip(scores, self.profile.get('min'), self.profile.get('max')).astype(np.int64)
+
+    def score_batch(self, vacancies, hits):
+        """Баллы пачки вакансий -> список int (в порядке vacancies)"""
+        if not vacancies:
+            return []
+        rows, columns = self.hit_matrix(vacancies, hits)
+        return self.score_matrix(rows, columns, len(vacancies)).tolist()
+
+
+def rescore_table(scorer, scan, where="TRUE", params=(), batch_size=None):
+    """Пересчет relevance_score строк vacancies текущими весами -> (проверено, изменено)
+
+    scan(vacancy) -> найденные в тексте слова, как при загрузке; where -
+    условие по vacancies v и vacancy_details d. Строки читаются серверным
+    курсором пачками, оцениваются score_batch, в БД уходят только
+    изменившиеся баллы - одним UPDATE на пачку.
+    """
+    batch_size = batch_size or PIPELINE_CONFIG['rescore_batch_size']
+    fields = ('id', 'name', 'description', 'skills', 'salary_from', 'salary_to',
+              'work_format', 'category', 'relevance_score')
+    checked = 0
+    changed = 0
+
+    with connection() as conn:
+        cursor = conn.cursor(name='rescore_vacancies')
+        cursor.itersize = batch_size
+        cursor.execute(f"""
+            SELECT v.id, v.name, COALESCE(d.description, ''), COALESCE(d.skills, ''),
+                   v.salary_from, v.salary_to, v.work_format, v.category, v.relevance_score
+            FROM {VACANCY_DETAILS_JOIN}
+            WHERE {where}
+        """, params)
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            vacancies = [dict(zip(fields, row)) for row in rows]
+            scores = scorer.score_batch(vacancies, [scan(v) for v in vacancies])
+
+            updates = [(v['id'], score) for v, score in zip(vacancies, scores)
+                       if score != v['relevance_score']]
+            if updates:
+                update_relevance_scores(conn, updates)
+            checked += len(vacancies)
+            changed += len(updates)
+            print(f"🔁 Пересчитано {checked}, изменилось {changed}")
+
+        cursor.close()
+
+    return checked, changed
@@ -0,0 +1,135 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timedelta
+from config import FETCH_CONFIG
+from hh_client import API_URL
+
+# HH отдает не больше 2000 результатов на один запрос (per_page * номер страницы)
+DEPTH_LIMIT = 2000
+
+
+def format_hh_date(moment):
+    """datetime -> ISO 8601 с часовым поясом, как ждет API (2024-05-01T10:00:00+0300)"""
+    return moment.astimezone().strftime('%Y-%m-%dT%H:%M:%S%z')
+
+
+class SearchPlanner:
+    """Делит один логический поиск на подзапросы, каждый из которых влезает в лимит глубины
+
+    Окно date_from..date_to рекурсивно делится пополам, пока found подзапроса
+    больше DEPTH_LIMIT. Первая страница каждого подзапроса получается при
+    разведке и не запрашивается повторно, остальные страницы всех подзапросов
+    качаются параллельно, вакансии на стыках окон отбрасываются по id.
+    """
+
+    def __init__(self, session, max_workers=None, per_page=100, min_window=timedelta(minutes=10)):
+        self.session = session
+        self.max_workers = max_workers or FETCH_CONFIG['max_workers']
+        self.per_page = per_page
+        self.min_window = min_window
+
+        # Сколько страниц не удалось загрузить в последнем обходе - при ошибках
+        # отметку инкрементального обхода двигать нельзя
+        self.failed_pages = 0
+        self.lock = threading.Lock()
+
+    def fetch_page(self, params, page=0):
+        """Одна страница поиска, пустой ответ при ошибке"""
+        page_params = dict(params, page=page, per_page=self.per_page)
+        try:
+            response = self.session.get(f"{API_URL}/vacancies", params=page_params, timeout=15)
+            if response.status_code == 200:
+                return response.json()
+            print(f"⚠️ Страница {page} поиска: HTTP {response.status_code}")
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки страницы {page}: {e}")
+        with self.lock:
+            self.failed_pages += 1
+        return {'found': 0, 'pages': 0, 'items': []}
+
+    def plan(self, params, date_from, date_to):
+        """-> [(sub_params, first_page_data)] - подзапросы, покрывающие все окно"""
+        planned = []
+        frontier = [(date_from, date_to)]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while frontier:
+                probes = {
+                    pool.submit(self.fetch_page, self._window_params(params, start, end)): (start, end)
+                    for start, end in frontier
+                }
+                frontier = []
+
+                for future in as_completed(probes):
+                    start, end = probes[future]
+                    data = future.result()
+                    found = data.get('found', 0)
+
+                    if found > DEPTH_LIMIT and end - start > self.min_window:
+                        middle = start + (end - start) / 2
+                        frontier.extend([(start, middle), (middle, end)])
+                    else:
+                        if found > DEPTH_LIMIT:
+                            print(f"⚠️ Окно {start:%d.%m %H:%M}-{end:%d.%m %H:%M}: {found} вакансий, "
+                                  f"доступны только первые {DEPTH_LIMIT}")
+                        planned.append((self._window_params(params, start, end), data))
+
+        planned.sort(key=lambda sub: sub[0]['date_from'])
+        return planned
+
+    def iter_pages(self, params, date_from=None, date_to=None, days=7):
+        """Генератор (подпись страницы, items) по всем подзапросам без дубликатов"""
+        date_to = date_to or datetime.now()
+        date_from = date_from or date_to - timedelta(days=days)
+        self.failed_pages = 0
+
+        sub_queries = self.plan(params, date_from, date_to)
+        total_found = sum(data.get('found', 0) for _, data in sub_queries)
+        max_pages = DEPTH_LIMIT // self.per_page
+
+        tasks = []
+        for index, (sub_params, data) in enumerate(sub_queries):
+            pages = min(data.get('pages', 1), max_pages)
+            tasks.extend((index, sub_params, page) for page in range(1, pages))
+
+        print(f"📨 Найдено вакансий по запросу: {total_found}")
+        print(f"🧩 Подзапросов: {len(sub_queries)}, страниц для обработки: {len(sub_queries) + len(tasks)}")
+
+        seen_ids = set()
+
+        def unseen(items):
+            fresh = [item for item in items if item['id'] not in seen_ids]
+            seen_ids.update(item['id'] for item in fresh)
+            return fresh
+
+        for index, (_, data) in enumerate(sub_queries):
+            yield f"подзапрос {index + 1}/{len(sub_queries)}, страница 1", unseen(data.get('items', []))
+
+        # В полете не больше 2 страниц на поток: если потребитель отстает,
+        # загрузка тоже притормаживает, а не копит все страницы в памяти
+        pending_tasks = iter(tasks)
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def top_up():
+                while len(in_flight) < self.max_workers * 2:
+                    task = next(pending_tasks, None)
+                    if task is None:
+                        return
+                    index, sub_params, page = task
+                    in_flight[pool.submit(self.fetch_page, sub_params, page)] = (index, page)
+
+            top_up()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, page = in_flight.pop(future)
+                    label = f"подзапрос {index + 1}/{len(sub_queries)}, страница {page + 1}"
+                    yield label, unseen(future.result().get('items', []))
+                top_up()
+
+    def _window_params(self, params, start, end):
+        window = {k: v for k, v in params.items() if k not in ('period', 'page', 'per_page')}
+        window['date_from'] = format_hh_date(start)
+        window['date_to'] = format_hh_date(end)
+        return window
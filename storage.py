@@ -0,0 +1,686 @@
+import atexit
+import json
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+from config import CRAWL_CONFIG, DB_CONFIG, POOL_CONFIG, RAW_PAYLOAD_CONFIG
+
+
+# Порядок полей в кортежах, которые готовят save_to_db / save_to_db_strict, и их типы
+VACANCY_COLUMNS = (
+    'hh_id', 'name', 'company', 'salary_from', 'salary_to', 'url', 'skills',
+    'description', 'category', 'relevance_score', 'work_format', 'city', 'company_key',
+    'crawl_profile', 'raw_json'
+)
+VACANCY_COLUMN_TYPES = (
+    'integer', 'text', 'text', 'integer', 'integer', 'text', 'text',
+    'text', 'text', 'integer', 'text', 'text', 'text',
+    'text', 'bytea'
+)
+
+# Вертикальное разделение: узкая "горячая" vacancies (списки, фильтры, статистика)
+# и "холодная" vacancy_details с текстами и исходным JSON - ее строки читаются
+# только для показанных на экране вакансий. Обе секционированы по месяцам
+DETAIL_COLUMNS = ('skills', 'description', 'raw_json')
+HOT_COLUMNS = tuple(c for c in VACANCY_COLUMNS if c not in DETAIL_COLUMNS)
+
+# Горячая часть с холодной: created_date в условии - соединяются секции одного месяца
+VACANCY_DETAILS_JOIN = """vacancies v LEFT JOIN vacancy_details d
+    ON d.vacancy_id = v.id AND d.created_date = v.created_date"""
+
+
+def search_vector_sql(prefix=''):
+    """Выражение tsvector для полнотекстового поиска по колонкам с префиксом prefix
+
+    russian находит словоформы ("аналитика" -> "аналитик"), simple - слова как
+    есть (названия технологий, аббревиатуры), вес: название > компания и навыки
+    > описание.
+    """
+    return " || ".join(
+        f"setweight(to_tsvector('{config}', COALESCE({prefix}{column}, '')), '{weight}')"
+        for column, weight in (('name', 'A'), ('company', 'B'), ('skills', 'B'), ('description', 'C'))
+        for config in ('russian', 'simple')
+    )
+
+
+# Колонка search_vector в vacancy_details заполняется при записи (см. create_table.sql)
+SEARCH_VECTOR_SQL = search_vector_sql()
+# Запрос поиска считается один раз подзапросом q (выражение в FROM без SELECT недопустимо)
+SEARCH_QUERY_SQL = "websearch_to_tsquery('russian', $1) || websearch_to_tsquery('simple', $1)"
+
+# Поля строки vacancies, из которых складывается дневная статистика vacancy_stats_daily
+_STATS_FIELDS = "hh_id, created_date, category, work_format, city, salary_from, salary_to"
+
+# Пачка передается массивами по колонкам и разворачивается через unnest -
+# так вставка любого размера остается одним подготовленным запросом.
+# vacancies секционирована по месяцам created_date (partitions.py), а уникальный
+# индекс секционированной таблицы обязан включать created_date - поэтому
+# уникальность hh_id держит реестр vacancy_keys. Он же выдает id и created_date
+# новой вакансии: с ним пишется строка vacancy_details, на него ссылается vacancy_skills.
+_VACANCY_INPUT = f"""WITH input AS (
+        SELECT * FROM unnest({', '.join(f'${i + 1}' for i in range(len(VACANCY_COLUMNS)))})
+            AS u({', '.join(VACANCY_COLUMNS)})
+    ),
+    registered AS (
+        INSERT INTO vacancy_keys (hh_id)
+        SELECT hh_id FROM input
+        ON CONFLICT (hh_id) DO NOTHING
+        RETURNING id, hh_id, created_date
+    ),
+    inserted AS (
+        INSERT INTO vacancies (id, created_date, {', '.join(HOT_COLUMNS)})
+        SELECT r.id, r.created_date, {', '.join(f'i.{c}' for c in HOT_COLUMNS)}
+        FROM input i JOIN registered r ON r.hh_id = i.hh_id
+        RETURNING {_STATS_FIELDS}
+    ),
+    inserted_details AS (
+        INSERT INTO vacancy_details (vacancy_id, created_date, {', '.join(DETAIL_COLUMNS)}, search_vector)
+        SELECT r.id, r.created_date, {', '.join(f'i.{c}' for c in DETAIL_COLUMNS)},
+               {search_vector_sql('i.')}
+        FROM input i JOIN registered r ON r.hh_id = i.hh_id
+    )"""
+
+# Что делать с уже сохраненной вакансией: пропустить или (режим --refresh-days) обновить.
+# Результат - (hh_id, вставлена ли), пропущенные строки не возвращаются. Все части
+# запроса видят снимок до него: UPDATE находит только ранее известные hh_id,
+# а previous - их значения до обновления (для статистики)
+_VACANCY_REFRESH = f""",
+    previous AS (
+        SELECT {', '.join(f'v.{c}' for c in _STATS_FIELDS.split(', '))}
+        FROM input i
+        JOIN vacancy_keys k ON k.hh_id = i.hh_id
+        JOIN vacancies v ON v.id = k.id AND v.created_date = k.created_date
+    ),
+    updated AS (
+        UPDATE vacancies AS v SET
+            {', '.join(f'{c} = i.{c}' for c in HOT_COLUMNS[1:])},
+            updated_date = NOW()
+        FROM input i JOIN vacancy_keys k ON k.hh_id = i.hh_id
+        WHERE v.id = k.id AND v.created_date = k.created_date
+        RETURNING {', '.join(f'v.{c}' for c in _STATS_FIELDS.split(', '))}
+    ),
+    updated_details AS (
+        UPDATE vacancy_details AS d SET
+            skills = i.skills,
+            description = i.description,
+            raw_json = COALESCE(i.raw_json, d.raw_json),
+            search_vector = {search_vector_sql('i.')}
+        FROM input i JOIN vacancy_keys k ON k.hh_id = i.hh_id
+        WHERE d.vacancy_id = k.id AND d.created_date = k.created_date
+    )"""
+
+
+def _stats_upsert(changes):
+    """CTE, который добавляет изменения (поля _STATS_FIELDS и sign +1/-1) в vacancy_stats_daily
+
+    Ключи упорядочены - параллельные загрузки блокируют строки статистики в
+    одном порядке. Нулевые итоги (обновление без смены категории) не пишутся.
+    """
+    return f""",
+    changes AS ({changes}),
+    stats AS (
+        INSERT INTO vacancy_stats_daily AS s
+            (day, category, work_format, city, vacancies, salary_count, salary_sum)
+        SELECT created_date::date, COALESCE(category, ''), COALESCE(work_format, ''),
+               COALESCE(city, ''), SUM(sign), COALESCE(SUM(sign) FILTER (WHERE salary IS NOT NULL), 0),
+               COALESCE(SUM(sign * salary), 0)
+        FROM (SELECT *, COALESCE(salary_from, salary_to) AS salary FROM changes) AS c
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(sign) <> 0 OR SUM(sign) FILTER (WHERE salary IS NOT NULL) <> 0
+            OR SUM(sign * salary) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (day, category, work_format, city) DO UPDATE SET
+            vacancies = s.vacancies + EXCLUDED.vacancies,
+            salary_count = s.salary_count + EXCLUDED.salary_count,
+            salary_sum = s.salary_sum + EXCLUDED.salary_sum
+    )"""
+_VACANCY_ARRAY_TYPES = tuple(f"{t}[]" for t in VACANCY_COLUMN_TYPES)
+
+# Столбцы списка вакансий в view_vacancies (порядок важен для распаковки строк),
+# выбираются из VACANCY_DETAILS_JOIN
+VACANCY_LIST_COLUMNS = """v.name, v.company, v.salary_from, v.salary_to, v.url, v.category,
+    d.skills, v.created_date, v.relevance_score, v.hh_id, v.work_format, v.city, d.description"""
+
+# Работодатель вакансии: канонический ключ, а если его нет (HH_COMPANY_KEY=0) - название.
+# Под это выражение есть индекс idx_vacancies_employer
+EMPLOYER_SQL = "COALESCE(company_key, company)"
+
+# Горячие запросы: готовятся на сервере один раз на соединение пула (PREPARE),
+# дальше выполняются через EXECUTE без повторного разбора и планирования.
+# name -> (типы параметров, текст запроса с $1..$n)
+PREPARED_STATEMENTS = {
+    'insert_vacancies_skip': (
+        _VACANCY_ARRAY_TYPES,
+        _VACANCY_INPUT +
+        _stats_upsert(f"SELECT {_STATS_FIELDS}, 1 AS sign FROM inserted") +
+        " SELECT hh_id, true FROM inserted"
+    ),
+    'insert_vacancies_refresh': (
+        _VACANCY_ARRAY_TYPES,
+        _VACANCY_INPUT + _VACANCY_REFRESH +
+        _stats_upsert(f"""SELECT {_STATS_FIELDS}, 1 AS sign FROM inserted
+            UNION ALL SELECT {_STATS_FIELDS}, 1 FROM updated
+            UNION ALL SELECT {_STATS_FIELDS}, -1 FROM previous""") +
+        " SELECT hh_id, true FROM inserted UNION ALL SELECT hh_id, false FROM updated"
+    ),
+    'update_relevance_scores': (
+        ('integer[]', 'integer[]'),
+        """UPDATE vacancies AS v SET relevance_score = u.score
+           FROM unnest($1, $2) AS u(id, score)
+           WHERE v.id = u.id"""
+    ),
+    'select_memo': (
+        ('text[]',),
+        """SELECT content_hash, category, relevance_score, skills
+           FROM classification_memo
+           WHERE content_hash = ANY($1)"""
+    ),
+    'insert_memo': (
+        ('text[]', 'text[]', 'integer[]', 'text[]'),
+        """INSERT INTO classification_memo (content_hash, category, relevance_score, skills)
+           SELECT u.content_hash, u.category, u.relevance_score,
+                  string_to_array(NULLIF(u.skills, ''), E'\\x1f')
+           FROM unnest($1, $2, $3, $4) AS u(content_hash, category, relevance_score, skills)
+           ON CONFLICT (content_hash) DO NOTHING"""
+    ),
+    'upsert_skills': (
+        ('text[]',),
+        """INSERT INTO skills (name)
+           SELECT DISTINCT unnest($1)
+           ON CONFLICT (name) DO NOTHING"""
+    ),
+    'delete_vacancy_skills': (
+        ('integer[]',),
+        """DELETE FROM vacancy_skills
+           WHERE vacancy_id IN (SELECT id FROM vacancy_keys WHERE hh_id = ANY($1))"""
+    ),
+    'insert_vacancy_skills': (
+        ('integer[]', 'text[]'),
+        """INSERT INTO vacancy_skills (vacancy_id, skill_id)
+           SELECT k.id, s.id
+           FROM unnest($1, $2) AS u(hh_id, name)
+           JOIN vacancy_keys k ON k.hh_id = u.hh_id
+           JOIN skills s ON s.name = u.name
+           ON CONFLICT DO NOTHING"""
+    ),
+    # До python migrate.py partitions реестра vacancy_keys нет, связи пишутся по id
+    # строк vacancies (partitions переносит эти id в реестр как есть)
+    'insert_vacancy_skills_by_id': (
+        ('integer[]', 'text[]'),
+        """INSERT INTO vacancy_skills (vacancy_id, skill_id)
+           SELECT u.vacancy_id, s.id
+           FROM unnest($1, $2) AS u(vacancy_id, name)
+           JOIN skills s ON s.name = u.name
+           ON CONFLICT DO NOTHING"""
+    ),
+    'search_vacancies': (
+        ('text', 'integer'),
+        f"""SELECT {VACANCY_LIST_COLUMNS}, ts_rank(d.search_vector, q.query) AS rank
+            FROM {VACANCY_DETAILS_JOIN}
+            CROSS JOIN LATERAL (SELECT {SEARCH_QUERY_SQL} AS query) q
+            WHERE d.search_vector @@ q.query
+            ORDER BY rank DESC, v.created_date DESC
+            LIMIT $2"""
+    ),
+    'update_company_keys': (
+        ('integer[]', 'text[]'),
+        """UPDATE vacancies AS v SET company_key = u.company_key
+           FROM unnest($1, $2) AS u(id, company_key)
+           WHERE v.id = u.id"""
+    ),
+    # Неточный поиск (pg_trgm): $1 <% поле - есть слово, похожее на запрос,
+    # фильтр идет по триграммным GIN-индексам, порядок - по word_similarity
+    'lookup_employers': (
+        ('text', 'integer'),
+        f"""SELECT {EMPLOYER_SQL} AS employer, MIN(company), COUNT(*),
+                   MAX(word_similarity($1, company)) AS similarity
+            FROM vacancies
+            WHERE $1 <% company
+            GROUP BY 1
+            ORDER BY similarity DESC, COUNT(*) DESC
+            LIMIT $2"""
+    ),
+    'employer_vacancies': (
+        ('text', 'integer'),
+        f"""SELECT {VACANCY_LIST_COLUMNS}
+            FROM {VACANCY_DETAILS_JOIN}
+            WHERE {EMPLOYER_SQL} = $1
+            ORDER BY v.created_date DESC
+            LIMIT $2"""
+    ),
+    'lookup_titles': (
+        ('text', 'integer'),
+        f"""SELECT {VACANCY_LIST_COLUMNS}, word_similarity($1, v.name) AS similarity
+            FROM {VACANCY_DETAILS_JOIN}
+            WHERE $1 <% v.name
+            ORDER BY similarity DESC, v.created_date DESC
+            LIMIT $2"""
+    ),
+    'select_currency_rates': (
+        (),
+        "SELECT code, rate FROM currency_rates"
+    ),
+    'upsert_currency_rates': (
+        ('text[]', 'numeric[]'),
+        """INSERT INTO currency_rates (code, rate, updated_at)
+           SELECT code, rate, NOW() FROM unnest($1, $2) AS u(code, rate)
+           ON CONFLICT (code) DO UPDATE SET
+               rate = EXCLUDED.rate,
+               updated_at = NOW()"""
+    ),
+    'select_watermark': (
+        ('text',),
+        "SELECT last_crawl FROM crawl_state WHERE profile = $1"
+    ),
+    'upsert_watermark': (
+        ('text', 'timestamp'),
+        """INSERT INTO crawl_state (profile, last_crawl, updated_at)
+           VALUES ($1, $2, NOW())
+           ON CONFLICT (profile) DO UPDATE SET
+               last_crawl = EXCLUDED.last_crawl,
+               updated_at = NOW()"""
+    ),
+    # Повторно отсеянный элемент заменяет прежний - по одному на вакансию и профиль
+    'upsert_rejected_items': (
+        ('text[]', 'integer[]', 'bytea[]'),
+        """INSERT INTO rejected_items (crawl_profile, hh_id, payload, seen_date)
+           SELECT profile, hh_id, payload, NOW()
+           FROM unnest($1, $2, $3) AS u(profile, hh_id, payload)
+           ON CONFLICT (crawl_profile, hh_id) DO UPDATE SET
+               payload = EXCLUDED.payload,
+               seen_date = NOW()"""
+    ),
+    # Статистика просмотра читает дневные итоги vacancy_stats_daily, а не vacancies:
+    # окно в $1 дней (включая сегодня) - это несколько строк на день
+    'stats_by_category': (
+        ('integer',),
+        """SELECT category, SUM(vacancies), SUM(salary_sum) / NULLIF(SUM(salary_count), 0)
+           FROM vacancy_stats_daily
+           WHERE day > CURRENT_DATE - $1
+           GROUP BY category
+           HAVING SUM(vacancies) > 0
+           ORDER BY SUM(vacancies) DESC"""
+    ),
+    'stats_by_format': (
+        ('integer',),
+        """SELECT work_format, SUM(vacancies)
+           FROM vacancy_stats_daily
+           WHERE day > CURRENT_DATE - $1
+           GROUP BY work_format
+           HAVING SUM(vacancies) > 0
+           ORDER BY SUM(vacancies) DESC"""
+    ),
+    'stats_by_city': (
+        ('integer',),
+        """SELECT city, SUM(vacancies)
+           FROM vacancy_stats_daily
+           WHERE day > CURRENT_DATE - $1
+           GROUP BY city
+           HAVING SUM(vacancies) > 0
+           ORDER BY SUM(vacancies) DESC
+           LIMIT 10"""
+    ),
+}
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Соединение пула, которое помнит, какие запросы на нем уже подготовлены"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Общий пул соединений процесса (создается при первом обращении)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                POOL_CONFIG['min_connections'],
+                POOL_CONFIG['max_connections'],
+                connection_factory=PooledConnection,
+                **DB_CONFIG
+            )
+            atexit.register(close_pool)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def connection():
+    """Соединение из пула: коммит при успехе, откат при исключении, возврат в пул"""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def execute_prepared(cursor, name, params=()):
+    """EXECUTE подготовленного запроса, при первом обращении на соединении - PREPARE"""
+    param_types, query = PREPARED_STATEMENTS[name]
+    conn = cursor.connection
+    if name not in conn.prepared:
+        # Без параметров - PREPARE name AS ...: пустые скобки PostgreSQL не принимает
+        signature = f" ({', '.join(param_types)})" if param_types else ""
+        cursor.execute(f"PREPARE {name}{signature} AS {query}")
+        conn.prepared.add(name)
+
+    if not param_types:
+        cursor.execute(f"EXECUTE {name}")
+    else:
+        # Явные приведения: массив из одних None psycopg2 передает без типа
+        placeholders = ', '.join(f"%s::{t}" for t in param_types)
+        cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+
+
+def validate_vacancy_row(row):
+    """Проверка подготовленной строки до отправки в БД - ValueError с причиной"""
+    if len(row) != len(VACANCY_COLUMNS):
+        raise ValueError(f"ожидалось {len(VACANCY_COLUMNS)} полей, получено {len(row)}")
+    if not isinstance(row[0], int):
+        raise ValueError(f"hh_id должен быть числом: {row[0]!r}")
+    if not row[5]:
+        raise ValueError("пустой url")
+    for value in row:
+        if isinstance(value, str) and '\x00' in value:
+            raise ValueError("NUL-символ в тексте")
+
+
+def insert_vacancy_rows(conn, rows, refresh=False, skills=None):
+    """Вставка пачки строк одним подготовленным INSERT ... SELECT FROM unnest(...) ON CONFLICT
+
+    -> (новых, дубликатов, [(строка, ошибка)]). Если пачка целиком не прошла,
+    строки повторяются по одной под SAVEPOINT - плохие попадают в список
+    ошибок, остальные сохраняются. skills ({hh_id: [навык]}) связываются
+    только с действительно записанными строками. Коммит - на вызывающем.
+    """
+    # Повтор hh_id внутри одной команды ON CONFLICT DO UPDATE не допускает.
+    # Остается первое вхождение - как при построчной вставке, где повтор уже дубликат
+    unique_rows = {}
+    for row in rows:
+        if row[0] not in unique_rows:
+            unique_rows[row[0]] = row
+    batch_duplicates = len(rows) - len(unique_rows)
+    rows = list(unique_rows.values())
+    if not rows:
+        return 0, batch_duplicates, []
+
+    statement = 'insert_vacancies_refresh' if refresh else 'insert_vacancies_skip'
+
+    def columns(batch):
+        return [list(column) for column in zip(*batch)]
+
+    cursor = conn.cursor()
+    failed = []
+    cursor.execute("SAVEPOINT bulk_insert")
+    try:
+        execute_prepared(cursor, statement, columns(rows))
+        results = cursor.fetchall()
+        cursor.execute("RELEASE SAVEPOINT bulk_insert")
+    except psycopg2.Error:
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_insert")
+        results = []
+        for row in rows:
+            cursor.execute("SAVEPOINT single_insert")
+            try:
+                execute_prepared(cursor, statement, columns([row]))
+                results.extend(cursor.fetchall())
+                cursor.execute("RELEASE SAVEPOINT single_insert")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT single_insert")
+                failed.append((row, e))
+    cursor.close()
+
+    # Пропущенные строки RETURNING не возвращает, обновленные дают false
+    new_count = sum(1 for _, inserted in results if inserted)
+    if skills is not None:
+        written = {hh_id: skills.get(hh_id, ()) for hh_id, _ in results}
+        save_vacancy_skills(conn, written, replace=refresh)
+    duplicate_count = len(rows) - len(failed) - new_count + batch_duplicates
+    return new_count, duplicate_count, failed
+
+
+def update_relevance_scores(conn, updates):
+    """Новые баллы пачкой: [(id, relevance_score)] -> один UPDATE ... FROM unnest"""
+    ids, scores = zip(*updates)
+    cursor = conn.cursor()
+    execute_prepared(cursor, 'update_relevance_scores', (list(ids), list(scores)))
+    cursor.close()
+
+
+def update_company_keys(conn, updates):
+    """Ключи работодателей пачкой: [(id, company_key)] -> один UPDATE ... FROM unnest"""
+    ids, keys = zip(*updates)
+    cursor = conn.cursor()
+    execute_prepared(cursor, 'update_company_keys', (list(ids), list(keys)))
+    cursor.close()
+
+
+def pack_raw_payload(item, detail, profile):
+    """Исходный JSON вакансии -> сжатые байты для vacancy_details.raw_json
+
+    item - элемент поиска, detail - детали (или None), profile - профиль
+    обхода, которым вакансия найдена (по нему --reprocess выбирает парсер).
+    """
+    data = json.dumps({'profile': profile, 'item': item, 'detail': detail},
+                      ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(data.encode('utf-8'), RAW_PAYLOAD_CONFIG['compress_level'])
+
+
+def unpack_raw_payload(data):
+    """Обратное к pack_raw_payload -> {'profile': ..., 'item': ..., 'detail': ...}"""
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
+def iter_raw_payloads(profiles, batch_size=None):
+    """Архив исходного JSON пачками -> [payload] вакансий, найденных профилями profiles
+
+    Профиль отбирается в SQL по vacancies.crawl_profile - читаются и
+    распаковываются только архивы этих профилей. Архив читается серверным
+    курсором на своем соединении, поэтому пачки можно сразу записывать
+    обратно через connection().
+    """
+    batch_size = batch_size or RAW_PAYLOAD_CONFIG['reprocess_batch_size']
+    with connection() as conn:
+        cursor = conn.cursor(name='raw_payloads')
+        cursor.itersize = batch_size
+        cursor.execute(f"""
+            SELECT d.raw_json
+            FROM {VACANCY_DETAILS_JOIN}
+            WHERE v.crawl_profile = ANY(%s) AND d.raw_json IS NOT NULL
+        """, (list(profiles),))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [unpack_raw_payload(data) for (data,) in rows]
+        cursor.close()
+
+
+def save_rejected_items(rejected):
+    """Отсеянные кандидаты [(профиль, элемент поиска, детали или None)] одной вставкой
+
+    -> (записано, 0, 0) для BatchSink. Повтор hh_id в пачке (тот же элемент
+    на соседних страницах) оставляет первое вхождение.
+    """
+    unique = {}
+    for profile, item, detail in rejected:
+        key = (profile, int(item['id']))
+        if key not in unique:
+            unique[key] = pack_raw_payload(item, detail, profile)
+    profiles, ids = zip(*unique)
+    with connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, 'upsert_rejected_items',
+                         (list(profiles), list(ids), list(unique.values())))
+        cursor.close()
+    return len(unique), 0, 0
+
+
+def iter_rejected_items(profiles, batch_size=None):
+    """Отсеянные элементы поиска профилей profiles пачками -> [payload] как у iter_raw_payloads
+
+    Вакансии, которые с тех пор сохранены (есть в vacancy_keys), пропускаются -
+    их разбирает iter_raw_payloads.
+    """
+    batch_size = batch_size or RAW_PAYLOAD_CONFIG['reprocess_batch_size']
+    with connection() as conn:
+        cursor = conn.cursor(name='rejected_items')
+        cursor.itersize = batch_size
+        cursor.execute("""
+            SELECT r.payload
+            FROM rejected_items r
+            WHERE r.crawl_profile = ANY(%s)
+              AND NOT EXISTS (SELECT 1 FROM vacancy_keys k WHERE k.hh_id = r.hh_id)
+        """, (list(profiles),))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [unpack_raw_payload(data) for (data,) in rows]
+        cursor.close()
+
+
+def load_currency_rates():
+    """Курсы из таблицы currency_rates: {код валюты HH: рублей за единицу}"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, 'select_currency_rates')
+        rates = {code: float(rate) for code, rate in cursor.fetchall()}
+        cursor.close()
+    return rates
+
+
+def save_currency_rates(rates):
+    """Запись курсов {код: рублей за единицу} в currency_rates"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, 'upsert_currency_rates', (list(rates), list(rates.values())))
+        cursor.close()
+
+
+def load_memo(keys):
+    """Сохраненные результаты классификации: {хэш: (категория, релевантность, навыки)}"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, 'select_memo', (keys,))
+        rows = cursor.fetchall()
+        cursor.close()
+    return {key: (category, score, tuple(skills or ())) for key, category, score, skills in rows}
+
+
+def save_memo(values):
+    """Новые результаты классификации {хэш: (категория, релевантность, навыки)} одной вставкой"""
+    keys = list(values)
+    with connection() as conn:
+        cursor = conn.cursor()
+        # Массив навыков на строку unnest не разворачивает - передаем строкой через \x1f
+        execute_prepared(cursor, 'insert_memo', (
+            keys,
+            [values[key][0] for key in keys],
+            [values[key][1] for key in keys],
+            ['\x1f'.join(values[key][2]) for key in keys]
+        ))
+        cursor.close()
+
+
+def save_vacancy_skills(conn, skills_by_hh_id, replace=False, by_id=False):
+    """Связи вакансий с навыками: {hh_id: [имя навыка]} -> справочник skills и vacancy_skills
+
+    Вакансии ищутся по hh_id, поэтому вызывается после вставки вакансий в той же
+    транзакции. replace (режим --refresh-days) сначала удаляет прежние связи
+    этих вакансий. by_id - ключи словаря уже id строк vacancies (миграция skills
+    на БД без реестра vacancy_keys). Коммит - на вызывающем.
+    """
+    hh_ids = []
+    names = []
+    for hh_id, skills in skills_by_hh_id.items():
+        for name in skills:
+            hh_ids.append(hh_id)
+            names.append(name)
+
+    cursor = conn.cursor()
+    if replace and skills_by_hh_id:
+        execute_prepared(cursor, 'delete_vacancy_skills', (list(skills_by_hh_id),))
+    if names:
+        execute_prepared(cursor, 'upsert_skills', (names,))
+        execute_prepared(cursor, 'insert_vacancy_skills_by_id' if by_id else 'insert_vacancy_skills',
+                         (hh_ids, names))
+    cursor.close()
+    return len(names)
+
+
+def load_known_ids(refresh_days=None):
+    """Множество hh_id, которые уже лежат в БД
+
+    С refresh_days в множество попадают только записи, обновленные за последние
+    N дней - более старые вакансии парсер загрузит заново и перезапишет.
+    Для миллиона id это ~40 МБ в set, поэтому читаем серверным курсором пачками.
+    """
+    with connection() as conn:
+        cursor = conn.cursor(name='known_hh_ids')
+        cursor.itersize = 10000
+
+        if refresh_days:
+            cursor.execute("""
+                SELECT hh_id FROM vacancies
+                WHERE COALESCE(updated_date, created_date) >= NOW() - %s * INTERVAL '1 day'
+            """, (refresh_days,))
+        else:
+            cursor.execute("SELECT hh_id FROM vacancy_keys")
+
+        known_ids = {hh_id for (hh_id,) in cursor}
+        cursor.close()
+
+    return known_ids
+
+
+def get_watermark(profile):
+    """Время начала последнего успешного обхода профиля поиска (None если не было)"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, 'select_watermark', (profile,))
+        row = cursor.fetchone()
+        cursor.close()
+    return row[0] if row else None
+
+
+def set_watermark(profile, moment):
+    """Запоминаем время начала обхода, который успешно завершился"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, 'upsert_watermark', (profile, moment))
+        cursor.close()
+
+
+def incremental_date_from(profile, days):
+    """date_from для инкрементального обхода: прошлый запуск минус запас, но не глубже окна в days"""
+    last_crawl = get_watermark(profile)
+    if last_crawl is None:
+        return None
+    window_start = datetime.now() - timedelta(days=days)
+    date_from = last_crawl - timedelta(minutes=CRAWL_CONFIG['overlap_minutes'])
+    return max(date_from, window_start)
@@ -0,0 +1,181 @@
+import re
+from html.parser import HTMLParser
+
+# Что остается в тексте: буквы, цифры, пробелы, обычная пунктуация и маркер списка.
+# Все остальное (эмодзи, управляющие символы, NUL, суррогаты) заменяется пробелом
+_ALLOWED = r'\w\s.,\-+!?():;@#%&=*\\/"\'$\[\]{}|~`<>•'
+_DISALLOWED = re.compile(f'[^{_ALLOWED}]+')
+
+# Теги, которые начинают новую строку, и маркер пункта списка
+_BLOCK_TAGS = frozenset({
+    'p', 'div', 'br', 'ul', 'ol', 'li', 'table', 'tr', 'section', 'article',
+    'blockquote', 'pre', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr'
+})
+BULLET = '•'
+
+# Сколько HTML отдаем парсеру за раз - между порциями проверяем, не набран ли лимит
+_FEED_CHUNK = 4096
+
+# Длина имени навыка в таблице skills
+SKILL_MAX_LENGTH = 100
+
+# Организационно-правовые формы: в ключе работодателя не учитываются
+LEGAL_FORMS = (
+    'общество с ограниченной ответственностью', 'публичное акционерное общество',
+    'непубличное акционерное общество', 'закрытое акционерное общество',
+    'открытое акционерное общество', 'акционерное общество',
+    'индивидуальный предприниматель', 'ооо', 'оао', 'зао', 'пао', 'ао', 'нао', 'ип',
+    'ано', 'нко', 'фгуп', 'гуп', 'муп', 'llc', 'ltd', 'inc', 'gmbh', 'corp'
+)
+_LEGAL_FORM = re.compile(
+    r'\b(?:' + '|'.join(sorted(map(re.escape, LEGAL_FORMS), key=len, reverse=True)) + r')\b')
+# Кавычки, точки, дефисы и прочее между словами названия
+_KEY_SEPARATORS = re.compile(r'[\W_]+')
+
+# Ограничения длины полей таблицы vacancies
+FIELD_LIMITS = {
+    'name': 500,
+    'company': 255,
+    'company_key': 255,
+    'skills': 1000,
+    'description': 3000,
+    'category': 50,
+    'work_format': 20,
+    'city': 100
+}
+
+
+def _finish(text, max_length):
+    """Схлопываем пробелы в строках, убираем пустые строки, обрезаем без висящего пробела"""
+    if '\n' in text:
+        text = '\n'.join(filter(None, (' '.join(line.split()) for line in text.split('\n'))))
+    else:
+        text = ' '.join(text.split())
+    if max_length is not None and len(text) > max_length:
+        text = text[:max_length].rstrip()
+    return text
+
+
+def normalize_text(text, max_length=None):
+    """Очистка простого текста для БД: фильтр символов, пробелы, длина
+
+    Переводы строк сохраняются (структура описаний), пустые строки убираются.
+    Идемпотентна: для уже нормализованного текста (в том числе результата
+    html_to_text) ничего не меняет, поэтому поля, подготовленные парсером,
+    при сохранении повторно не чистятся.
+    """
+    if not text:
+        return ""
+    return _finish(_DISALLOWED.sub(' ', text), max_length)
+
+
+class _HTMLText(HTMLParser):
+    """Потоковый HTML -> текст: блоки и пункты списков становятся строками
+
+    Текст нормализуется по мере поступления кусков, сущности раскрывает сам
+    HTMLParser (convert_charrefs). Как только набрано budget символов,
+    дальнейшие данные игнорируются и done сигнализирует остановить подачу.
+    """
+
+    def __init__(self, budget=None):
+        super().__init__(convert_charrefs=True)
+        self.budget = budget
+        self.lines = []
+        self.line = []
+        self.length = 0
+        self.space_pending = False
+        self.done = False
+
+    def _break(self):
+        if self.line:
+            self.lines.append(''.join(self.line))
+            self.length += 1  # перевод строки
+            self.line = []
+        self.space_pending = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done or tag not in _BLOCK_TAGS:
+            return
+        self._break()
+        if tag == 'li':
+            self.line.append(BULLET)
+            self.length += len(BULLET)
+            self.space_pending = True
+
+    def handle_endtag(self, tag):
+        if not self.done and tag in _BLOCK_TAGS:
+            self._break()
+
+    def handle_data(self, data):
+        if self.done:
+            return
+        data = _DISALLOWED.sub(' ', data)
+        words = data.split()
+        if not words:
+            self.space_pending = self.space_pending or bool(data)
+            return
+
+        # Соседние куски склеиваются без пробела: <b>Py</b>thon -> Python
+        chunk = ' '.join(words)
+        if self.line and (self.space_pending or data[0].isspace()):
+            chunk = ' ' + chunk
+        self.line.append(chunk)
+        self.length += len(chunk)
+        self.space_pending = data[-1].isspace()
+
+        if self.budget is not None and self.length >= self.budget:
+            self.done = True
+
+    def text(self):
+        self._break()
+        return '\n'.join(self.lines)
+
+
+def html_to_text(markup, max_length=None):
+    """HTML описания -> нормализованный текст со структурой
+
+    Абзацы и блоки - отдельные строки, пункты списков - строки с маркером "•".
+    Разбор идет порциями и прекращается, как только набран max_length
+    символов, поэтому длинные описания не разбираются целиком.
+    """
+    if not markup:
+        return ""
+
+    parser = _HTMLText(max_length)
+    for start in range(0, len(markup), _FEED_CHUNK):
+        parser.feed(markup[start:start + _FEED_CHUNK])
+        if parser.done:
+            break
+    else:
+        parser.close()
+
+    return _finish(parser.text(), max_length)
+
+
+def company_key(name):
+    """Канонический ключ работодателя: без кавычек, пунктуации и ОПФ, нижний регистр
+
+    ООО "Ромашка", «Ромашка» АО и Ромашка, ООО дают один ключ "ромашка".
+    Опечатки ключ не исправляет - их находит триграммный поиск в просмотре.
+    Если кроме ОПФ в названии ничего нет, ключом остается само название.
+    """
+    words = _KEY_SEPARATORS.sub(' ', normalize_text(name).lower().replace('ё', 'е'))
+    key = ' '.join(_LEGAL_FORM.sub(' ', words).split()) or ' '.join(words.split())
+    return key[:FIELD_LIMITS['company_key']].rstrip()
+
+
+def skill_names(*groups):
+    """Навыки из списков и строк через запятую -> уникальные имена для таблицы skills
+
+    Имя навыка - нормализованный текст в нижнем регистре ("Power BI" и
+    "power  bi" - один навык), порядок - первого появления.
+    """
+    names = {}
+    for group in groups:
+        if isinstance(group, str):
+            group = group.split(',')
+        for skill in group:
+            name = normalize_text(skill, SKILL_MAX_LENGTH).lower()
+            if name:
+                names.setdefault(name, None)
+    return list(names)
@@ -1,7 +1,16 @@
-import psycopg2
 import webbrowser
 from datetime import datetime, timedelta
-from config import DB_CONFIG
+from storage import VACANCY_DETAILS_JOIN, VACANCY_LIST_COLUMNS, connection, execute_prepared
+from text_normalizer import skill_names
+
+# Сколько строк описания показывать в списке вакансий
+DESCRIPTION_PREVIEW_LINES = 4
+# Сколько вакансий на одном экране постраничного просмотра
+PAGE_SIZE = 20
+# Сколько самых релевантных совпадений показывать в полнотекстовом поиске
+SEARCH_RESULT_LIMIT = 100
+# Сколько похожих работодателей предлагать на выбор
+EMPLOYER_LOOKUP_LIMIT = 15
 
 def format_salary(salary_from, salary_to):
     """Форматирование зарплаты для отображения"""
@@ -50,45 +59,194 @@ def show_vacancies():
     except:
         min_salary = 0
     
-    # Получение данных из БД
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+    # Навыки ищутся по таблице vacancy_skills (индекс), а не LIKE по тексту skills
+    required_skills = skill_names(input("Навыки через запятую, нужны все (Enter = любые): "))
     
-    query = """
-        SELECT name, company, salary_from, salary_to, url, category, 
-               skills, created_date, relevance_score, hh_id, work_format, city
-        FROM vacancies 
-        WHERE created_date >= %s
-    """
+    # Условия выборки по узкой таблице vacancies (алиас v), строки читаются
+    # постранично (VacancyPages)
+    where = "v.created_date >= %s"
     params = [datetime.now() - timedelta(days=days)]
     
     if category != 'all':
-        query += " AND category = %s"
+        where += " AND v.category = %s"
         params.append(category)
     
     if work_format_filter != 'all':
-        query += " AND work_format = %s"
+        where += " AND v.work_format = %s"
         params.append(work_format_filter)
     
+    # Нижняя или верхняя граница вилки не ниже min_salary ("от 50 000" без верхней
+    # границы при min_salary 80 000 не подходит). Пересечение с [min_salary, ∞) -
+    # предварительный отбор по GiST-индексу, у [] диапазона upper - это salary_to + 1
     if min_salary > 0:
-        query += " AND (salary_from >= %s OR salary_to >= %s)"
-        params.extend([min_salary, min_salary])
+        where += (" AND v.salary_rub && int4range(%s, NULL)"
+                  " AND (lower(v.salary_rub) >= %s OR upper(v.salary_rub) > %s)")
+        params.extend([min_salary, min_salary, min_salary])
     
-    query += " ORDER BY relevance_score DESC, created_date DESC"
+    if required_skills:
+        where += """ AND v.id IN (
+            SELECT vs.vacancy_id
+            FROM vacancy_skills vs
+            JOIN skills s ON s.id = vs.skill_id
+            WHERE s.name = ANY(%s)
+            GROUP BY vs.vacancy_id
+            HAVING COUNT(*) = %s
+        )"""
+        params.extend([required_skills, len(required_skills)])
     
-    cursor.execute(query, params)
-    vacancies = cursor.fetchall()
+    pages = VacancyPages(where, params)
     
-    print(f"\n📊 Найдено вакансий: {len(vacancies)}")
+    print(f"\n📊 Найдено вакансий: {pages.total}")
     print("=" * 90)
     
-    if not vacancies:
+    if not pages.total:
         print("❌ Вакансии не найдены по заданным критериям")
         return
     
-    # Отображение вакансий
-    for i, vac in enumerate(vacancies, 1):
-        name, company, salary_from, salary_to, url, category, skills, created, score, hh_id, work_format, city = vac
+    browse_pages(pages)
+
+class VacancyPages:
+    """Постраничная выборка: keyset по (relevance_score, created_date, id) по убыванию
+
+    Каждая страница - отдельный запрос "после ключа последней строки" (или "до
+    ключа первой" для предыдущей) с LIMIT, строки идут через именованный
+    серверный курсор по одному экрану. Между страницами соединение
+    возвращается в пул. Переход на страницу N ищет ее ключ через OFFSET по
+    одной таблице vacancies, то есть пропускает все предыдущие строки выборки.
+    С фильтрами по дате, категории и формату это index-only scan по
+    idx_vacancies_browse. Фильтр по зарплате (salary_rub нет в индексе)
+    читает строки таблицы, фильтр по навыкам добавляет подзапрос к
+    vacancy_skills. Описание и навыки из vacancy_details читаются только
+    для строк экрана.
+    """
+    
+    ORDER = "v.relevance_score DESC, v.created_date DESC, v.id DESC"
+    ORDER_REVERSED = "v.relevance_score, v.created_date, v.id"
+    
+    def __init__(self, where, params, page_size=None):
+        self.where = where
+        self.params = list(params)
+        self.page_size = page_size or PAGE_SIZE
+        self.page = 0
+        self.rows = []
+        
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM vacancies v WHERE {where}", self.params)
+            self.total = cursor.fetchone()[0]
+            cursor.close()
+        self.pages = max(1, -(-self.total // self.page_size))
+        if self.total:
+            self.rows = self._fetch()
+    
+    @staticmethod
+    def _key(row):
+        # Строка - VACANCY_LIST_COLUMNS и id: (relevance_score, created_date, id)
+        return row[8], row[7], row[13]
+    
+    def _fetch(self, key=None, backward=False):
+        """Экран строк после key (или до key при backward) в порядке ORDER"""
+        where = self.where
+        params = list(self.params)
+        if key is not None:
+            where += f" AND (v.relevance_score, v.created_date, v.id) {'>' if backward else '<'} (%s, %s, %s)"
+            params.extend(key)
+        
+        with connection() as conn:
+            cursor = conn.cursor(name='vacancy_page')
+            cursor.itersize = self.page_size
+            cursor.execute(f"""
+                SELECT {VACANCY_LIST_COLUMNS}, v.id
+                FROM {VACANCY_DETAILS_JOIN}
+                WHERE {where}
+                ORDER BY {self.ORDER_REVERSED if backward else self.ORDER}
+                LIMIT %s
+            """, params + [self.page_size])
+            rows = cursor.fetchmany(self.page_size)
+            cursor.close()
+        return rows[::-1] if backward else rows
+    
+    @property
+    def start(self):
+        """Номер первой строки страницы в выборке (с 1)"""
+        return self.page * self.page_size + 1
+    
+    def next(self):
+        if self.page + 1 >= self.pages:
+            return False
+        self.rows = self._fetch(self._key(self.rows[-1]))
+        self.page += 1
+        return True
+    
+    def prev(self):
+        if self.page == 0:
+            return False
+        self.rows = self._fetch(self._key(self.rows[0]), backward=True)
+        self.page -= 1
+        return True
+    
+    def jump(self, page):
+        """Страница с номером page (с 1)"""
+        if not 1 <= page <= self.pages:
+            return False
+        key = None
+        if page > 1:
+            # Ключ последней строки предыдущей страницы
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT v.relevance_score, v.created_date, v.id
+                    FROM vacancies v
+                    WHERE {self.where}
+                    ORDER BY {self.ORDER}
+                    OFFSET %s LIMIT 1
+                """, self.params + [(page - 1) * self.page_size - 1])
+                key = cursor.fetchone()
+                cursor.close()
+            if key is None:
+                return False
+        self.rows = self._fetch(key)
+        self.page = page - 1
+        return True
+
+def browse_pages(pages):
+    """Экран за экраном: n - дальше, p - назад, g <номер> - на страницу"""
+    while True:
+        print(f"\n📄 Страница {pages.page + 1} из {pages.pages}")
+        print("=" * 90)
+        print_vacancy_list(pages.rows, pages.start)
+        
+        while True:
+            try:
+                choice = input("\nn - дальше, p - назад, g <страница>, номер вакансии - открыть, "
+                               "d <номер> - описание, 0 - выход: ").strip().lower()
+                
+                if choice == '0':
+                    return
+                if choice == 'n':
+                    if pages.next():
+                        break
+                    print("❌ Это последняя страница")
+                elif choice == 'p':
+                    if pages.prev():
+                        break
+                    print("❌ Это первая страница")
+                elif choice.startswith('g'):
+                    if pages.jump(int(choice[1:])):
+                        break
+                    print(f"❌ Страницы с 1 по {pages.pages}")
+                else:
+                    vacancy_action(choice, pages.rows, pages.start)
+            
+            except ValueError:
+                print("❌ Введите корректный номер")
+            except Exception as e:
+                print(f"❌ Ошибка: {e}")
+
+def print_vacancy_list(vacancies, start=1):
+    """Список вакансий (строки в порядке VACANCY_LIST_COLUMNS), номера с start"""
+    for i, vac in enumerate(vacancies, start):
+        name, company, salary_from, salary_to, url, category, skills, created, score, hh_id, work_format, city, description = vac[:13]
         
         salary_str = format_salary(salary_from, salary_to)
         location_str = format_work_format(work_format, city)
@@ -101,83 +259,153 @@ def show_vacancies():
         if skills:
             print(f"   🛠️  {skills[:100]}{'...' if len(skills) > 100 else ''}")
         
+        # Описание хранится построчно (абзацы, пункты списков) - показываем начало
+        if description:
+            lines = description.split('\n')
+            for line in lines[:DESCRIPTION_PREVIEW_LINES]:
+                print(f"   {line[:120]}")
+            if len(lines) > DESCRIPTION_PREVIEW_LINES:
+                print(f"   ... (полностью: d {i})")
+        
         print(f"   🔗 {url}")
         print(f"   📅 {created.strftime('%d.%m.%Y %H:%M')}")
         print("-" * 90)
+
+def vacancy_action(choice, vacancies, start=1):
+    """Номер - открыть ссылку, d <номер> - полное описание (номера как в списке)"""
+    describe = choice.lower().startswith('d')
+    vacancy_num = int(choice[1:] if describe else choice) - start
+    if not 0 <= vacancy_num < len(vacancies):
+        print("❌ Неверный номер вакансии")
+        return
     
-    # Интерактивный выбор для открытия ссылки
+    selected_vacancy = vacancies[vacancy_num]
+    if describe:
+        print(f"\n📄 {selected_vacancy[0]}")
+        print(selected_vacancy[12] or "описание отсутствует")
+    else:
+        print(f"Открываю: {selected_vacancy[0]}")
+        webbrowser.open(selected_vacancy[4])  # URL находится на 5-й позиции
+
+def choose_vacancy(vacancies):
+    """Интерактивный выбор для открытия ссылки"""
     while True:
         try:
-            choice = input("\nВведите номер вакансии для открытия (0 для выхода): ").strip()
+            choice = input("\nВведите номер вакансии для открытия, d <номер> - описание (0 для выхода): ").strip()
             
             if choice == '0':
                 break
             
-            vacancy_num = int(choice)
-            if 1 <= vacancy_num <= len(vacancies):
-                selected_vacancy = vacancies[vacancy_num - 1]
-                url = selected_vacancy[4]  # URL находится на 5-й позиции
-                
-                print(f"Открываю: {selected_vacancy[0]}")
-                webbrowser.open(url)
-            else:
-                print("❌ Неверный номер вакансии")
+            vacancy_action(choice, vacancies)
                 
         except ValueError:
             print("❌ Введите корректный номер")
         except Exception as e:
             print(f"❌ Ошибка при открытии ссылки: {e}")
+
+def search_vacancies():
+    """Полнотекстовый поиск по названию, компании, навыкам и описанию"""
+    print("\n🔎 Запрос как в поисковике: python airflow, \"бизнес аналитик\", sql -1с, excel or vba")
+    text = input("Поиск: ").strip()
+    if not text:
+        return
+    
+    # GIN-индекс по search_vector, порядок - ts_rank (совпадение в названии весит больше)
+    with connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, 'search_vacancies', (text, SEARCH_RESULT_LIMIT))
+        vacancies = cursor.fetchall()
+        cursor.close()
     
-    cursor.close()
-    conn.close()
+    print(f"\n📊 Найдено вакансий: {len(vacancies)}"
+          f"{f' (показаны {SEARCH_RESULT_LIMIT} лучших)' if len(vacancies) == SEARCH_RESULT_LIMIT else ''}")
+    print("=" * 90)
+    
+    if not vacancies:
+        print("❌ Ничего не найдено")
+        return
+    
+    print_vacancy_list(vacancies)
+    choose_vacancy(vacancies)
+
+def lookup_similar():
+    """Неточный поиск (pg_trgm): работодатель с вариантами написания или похожие названия"""
+    mode = input("\nИскать: 1 - работодателя, 2 - похожие названия вакансий: ").strip()
+    if mode not in ('1', '2'):
+        print("❌ Неверный выбор")
+        return
+    text = input("Название (можно с опечатками): ").strip()
+    if not text:
+        return
+    
+    with connection() as conn:
+        cursor = conn.cursor()
+        if mode == '2':
+            execute_prepared(cursor, 'lookup_titles', (text, SEARCH_RESULT_LIMIT))
+            vacancies = cursor.fetchall()
+            cursor.close()
+        else:
+            execute_prepared(cursor, 'lookup_employers', (text, EMPLOYER_LOOKUP_LIMIT))
+            employers = cursor.fetchall()
+            cursor.close()
+    
+    if mode == '1':
+        if not employers:
+            print("❌ Похожих работодателей не найдено")
+            return
+        
+        # Варианты написания одного работодателя (ООО "X", X АО) собраны по company_key
+        print()
+        for i, (_, company, count, similarity) in enumerate(employers, 1):
+            print(f"{i:2}. {company:40} | {count:4} вакансий | сходство {similarity:.2f}")
+        try:
+            employer_num = int(input("\nНомер работодателя (0 - назад): ").strip() or "0")
+        except ValueError:
+            employer_num = 0
+        if not 1 <= employer_num <= len(employers):
+            return
+        
+        with connection() as conn:
+            cursor = conn.cursor()
+            execute_prepared(cursor, 'employer_vacancies',
+                             (employers[employer_num - 1][0], SEARCH_RESULT_LIMIT))
+            vacancies = cursor.fetchall()
+            cursor.close()
+    
+    print(f"\n📊 Найдено вакансий: {len(vacancies)}")
+    print("=" * 90)
+    
+    if not vacancies:
+        print("❌ Ничего не найдено")
+        return
+    
+    print_vacancy_list(vacancies)
+    choose_vacancy(vacancies)
 
 def show_statistics():
     """Показать статистику по вакансиям с гео-информацией"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    
-    # Статистика по категориям
-    cursor.execute("""
-        SELECT 
-            category,
-            COUNT(*) as count,
-            AVG(COALESCE(salary_from, salary_to)) as avg_salary
-        FROM vacancies 
-        WHERE created_date >= NOW() - INTERVAL '7 days'
-        GROUP BY category
-        ORDER BY count DESC
-    """)
-    
-    stats = cursor.fetchall()
-    
-    # Статистика по форматам работы
-    cursor.execute("""
-        SELECT 
-            work_format,
-            COUNT(*) as count
-        FROM vacancies 
-        WHERE created_date >= NOW() - INTERVAL '7 days'
-        GROUP BY work_format
-        ORDER BY count DESC
-    """)
-    
-    format_stats = cursor.fetchall()
-    
-    # Статистика по городам
-    cursor.execute("""
-        SELECT 
-            city,
-            COUNT(*) as count
-        FROM vacancies 
-        WHERE created_date >= NOW() - INTERVAL '7 days'
-        GROUP BY city
-        ORDER BY count DESC
-        LIMIT 10
-    """)
-    
-    city_stats = cursor.fetchall()
-    
-    print("\n📈 СТАТИСТИКА ЗА ПОСЛЕДНИЕ 7 ДНЕЙ:")
+    try:
+        days = max(1, int(input("За сколько дней статистика? (Enter = 7): ") or "7"))
+    except ValueError:
+        days = 7
+    
+    # Запросы подготовлены на соединении пула и читают дневные итоги vacancy_stats_daily
+    # (см. PREPARED_STATEMENTS в storage.py) - окно хоть в год не обходит vacancies
+    with connection() as conn:
+        cursor = conn.cursor()
+        
+        execute_prepared(cursor, 'stats_by_category', (days,))
+        stats = cursor.fetchall()
+        
+        execute_prepared(cursor, 'stats_by_format', (days,))
+        format_stats = cursor.fetchall()
+        
+        execute_prepared(cursor, 'stats_by_city', (days,))
+        city_stats = cursor.fetchall()
+        
+        cursor.close()
+    
+    print(f"\n📈 СТАТИСТИКА ЗА ПОСЛЕДНИЕ {days} ДНЕЙ:")
     print("=" * 50)
     
     total_vacancies = 0
@@ -196,9 +424,6 @@ def show_statistics():
         print(f"  {city:20} | {count:3} вакансий")
     
     print(f"\nВсего вакансий: {total_vacancies}")
-    
-    cursor.close()
-    conn.close()
 
 if __name__ == "__main__":
     while True:
@@ -206,7 +431,9 @@ if __name__ == "__main__":
         print("🎯 СИСТЕМА МОНИТОРИНГА ВАКАНСИЙ")
         print("1 - Просмотр вакансий")
         print("2 - Статистика")
-        print("3 - Выход")
+        print("3 - Поиск по тексту")
+        print("4 - Работодатель / похожие названия")
+        print("5 - Выход")
         
         choice = input("Выберите действие: ").strip()
         
@@ -215,6 +442,10 @@ if __name__ == "__main__":
         elif choice == '2':
             show_statistics()
         elif choice == '3':
+            search_vacancies()
+        elif choice == '4':
+            lookup_similar()
+        elif choice == '5':
             print("До свидания!")
             break
         else: